@@ -0,0 +1,129 @@
+import logging
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, List
+
+from sqlalchemy.orm import Session as SqlSession
+
+from .. import crud, models, schemas
+from ..celery_worker import SUMMARY_REFRESH_INTERVAL
+from ..core.kg_graph import get_graph_db
+from ..core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# --- Precomputed classroom summaries ---
+# Teacher dashboards read per-classroom summaries that a periodic task
+# (tasks.refresh_classroom_summaries) recomputes every SUMMARY_REFRESH_INTERVAL
+# seconds, and grading and approvals refresh their classroom's summaries soon
+# after (tasks.refresh_classroom_summary, debounced), instead of scanning every
+# submission (and the knowledge graph) on each page load. A summary is served
+# as stored, with headers saying when it was computed; a classroom without one
+# yet is computed on first request.
+#
+#   analytics  per-coursework averages and grade distribution
+#   gradebook  every student's final score per coursework
+#   mastery    per-concept class average from the students' knowledge graphs
+
+SUMMARY_KINDS = ("analytics", "gradebook", "mastery")
+SUMMARY_STALE_AFTER = 2 * SUMMARY_REFRESH_INTERVAL # A missed refresh or two
+MASTERY_THRESHOLD = 0.7 # Same cut-off the planner uses for weak concepts
+
+def class_concept_mastery(student_ids: List[int]) -> List[Dict]:
+    """Average KNOWS score per concept over the given students, weakest first."""
+    if not student_ids:
+        return []
+    neo_session = get_graph_db()
+    try:
+        result = neo_session.run(
+            """
+            MATCH (s:Student)-[r:KNOWS]->(c:Concept)
+            WHERE s.student_id IN $student_ids
+            RETURN c.name AS concept,
+                   avg(r.score) AS average_score,
+                   count(s) AS students_assessed,
+                   sum(CASE WHEN r.score < $threshold THEN 1 ELSE 0 END) AS students_struggling
+            ORDER BY average_score ASC
+            """,
+            student_ids=student_ids,
+            threshold=MASTERY_THRESHOLD
+        )
+        return [
+            {
+                "concept": record["concept"],
+                "average_score": record["average_score"],
+                "students_assessed": record["students_assessed"],
+                "students_struggling": record["students_struggling"],
+            }
+            for record in result
+        ]
+    finally:
+        neo_session.close()
+
+def _gradebook(db: SqlSession, classroom_id: int) -> Dict:
+    data = crud.get_gradebook_data(db, classroom_id)
+    return {
+        "courseworks": [
+            schemas.CourseworkDisplay.model_validate(cw).model_dump(mode="json") for cw in data["courseworks"]
+        ],
+        "students": [
+            {
+                "student": schemas.UserDisplay.model_validate(row["student"]).model_dump(mode="json"),
+                "scores": {str(cw_id): score for cw_id, score in row["scores"].items()},
+            }
+            for row in data["students"]
+        ],
+    }
+
+def _mastery(db: SqlSession, classroom_id: int) -> List[Dict]:
+    students = crud.get_students_in_classroom(db, classroom_id)
+    return class_concept_mastery([student.id for student in students])
+
+_COMPUTE = {
+    "analytics": crud.get_class_analytics,
+    "gradebook": _gradebook,
+    "mastery": _mastery,
+}
+
+def compute_summary(db: SqlSession, classroom_id: int, kind: str) -> models.ClassroomSummary:
+    """Recomputes one summary and stores it."""
+    started = time.perf_counter()
+    with span(f"summary.{kind}", kind="graph" if kind == "mastery" else "db"):
+        data = _COMPUTE[kind](db, classroom_id)
+    compute_ms = (time.perf_counter() - started) * 1000
+    return crud.save_classroom_summary(db, classroom_id, kind, data, compute_ms)
+
+def refresh_classroom(db: SqlSession, classroom_id: int) -> int:
+    """Recomputes every summary of one classroom; returns how many succeeded."""
+    refreshed = 0
+    for kind in SUMMARY_KINDS:
+        try:
+            compute_summary(db, classroom_id, kind)
+            refreshed += 1
+        except Exception as e:
+            # e.g. Neo4j is down: keep serving the previous mastery summary
+            logger.error(f"Could not refresh {kind} summary for classroom {classroom_id}: {e}")
+            db.rollback()
+    return refreshed
+
+def _computed_at(summary: models.ClassroomSummary) -> datetime:
+    # SQLite hands back naive datetimes
+    computed_at = summary.computed_at
+    return computed_at.replace(tzinfo=timezone.utc) if computed_at.tzinfo is None else computed_at
+
+def summary_age(summary: models.ClassroomSummary) -> float:
+    return max(0.0, (datetime.now(timezone.utc) - _computed_at(summary)).total_seconds())
+
+def is_stale(summary: models.ClassroomSummary) -> bool:
+    return summary_age(summary) > SUMMARY_STALE_AFTER
+
+def summary_headers(summary: models.ClassroomSummary) -> Dict[str, str]:
+    """Freshness of a served summary, for the response headers."""
+    computed_at = _computed_at(summary)
+    return {
+        "Last-Modified": format_datetime(computed_at, usegmt=True),
+        "X-Summary-Computed-At": computed_at.isoformat(),
+        "X-Summary-Age": str(int(summary_age(summary))),
+        "X-Summary-Stale": "true" if is_stale(summary) else "false",
+    }
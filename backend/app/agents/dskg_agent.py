@@ -4,7 +4,7 @@ from sqlalchemy.orm import Session as SqlSession, joinedload
 from datetime import datetime, timezone
 from .. import models
 from ..core.kg_graph import get_graph_db
-from typing import List
+from typing import Dict, List, Tuple
 import json
 
 logger = logging.getLogger(__name__)
@@ -77,26 +77,19 @@ def _write_remedial_knowledge_to_graph(
         history_entry=history_entry_str
     )
 
-def update_dskg_from_submission(db: SqlSession, submission_id: int):
-    """
-    Main function to update the DSKG based on a graded submission.
-    """
-    logger.info(f"--- DSKG: Updating for submission {submission_id} ---")
-    submission = db.query(models.Submission).options(
+def load_submissions_for_dskg(db: SqlSession, submission_ids: List[int]) -> List[models.Submission]:
+    return db.query(models.Submission).options(
         joinedload(models.Submission.coursework),
         joinedload(models.Submission.answers).joinedload(models.SubmissionAnswer.question).joinedload(models.Question.options)
-    ).get(submission_id)
-
-    if not submission or submission.status != "GRADED":
-        logger.warning(f"DSKG: Submission {submission_id} not found or not graded.")
-        return
+    ).filter(models.Submission.id.in_(submission_ids)).all()
 
-    student_id = submission.student_id
+def concept_scores(submission: models.Submission) -> Dict[str, float]:
+    """Averages the scores a graded submission gives each concept it covers."""
     coursework = submission.coursework
     concepts_to_update = {}  # { "concept_name": [list_of_scores] }
 
     if coursework.coursework_type == 'quiz':
-        logger.info(f"DSKG: Processing quiz submission {submission_id}")
+        logger.info(f"DSKG: Processing quiz submission {submission.id}")
         for answer in submission.answers:
             question = answer.question
             if not question:
@@ -110,7 +103,7 @@ def update_dskg_from_submission(db: SqlSession, submission_id: int):
             for concept in (question.concept_tags or []):
                 concepts_to_update.setdefault(concept, []).append(question_score)
     else:
-        logger.info(f"DSKG: Processing essay submission {submission_id}")
+        logger.info(f"DSKG: Processing essay submission {submission.id}")
         for feedback_item in (submission.ai_feedback or []):
             concept = feedback_item.get('criterion')
             score_val = feedback_item.get('score')
@@ -120,19 +113,20 @@ def update_dskg_from_submission(db: SqlSession, submission_id: int):
                 score = float(score_val) / float(max_points)
                 concepts_to_update.setdefault(concept, []).append(score)
 
-    if not concepts_to_update:
-        logger.info(f"DSKG: No concepts found for submission {submission_id}.")
-        return
+    return {concept: sum(scores) / len(scores) for concept, scores in concepts_to_update.items()}
 
+def write_concept_scores(rows: List[Tuple[int, str, float]]):
+    """Writes many (student_id, concept, score) rows in one Neo4j transaction."""
+    if not rows:
+        return
     neo_session = get_graph_db()
-    with neo_session.begin_transaction() as tx:
-        for concept, scores in concepts_to_update.items():
-            avg_score = sum(scores) / len(scores)
-            _write_knowledge_to_graph(tx, student_id, concept, avg_score)
-            logger.info(f"DSKG: Wrote {student_id} -> {concept} @ {avg_score}")
-    
-    neo_session.close()
-    logger.info(f"--- DSKG: Update complete for {submission_id} ---")
+    try:
+        with neo_session.begin_transaction() as tx:
+            for student_id, concept, avg_score in rows:
+                _write_knowledge_to_graph(tx, student_id, concept, avg_score)
+    finally:
+        neo_session.close()
+    logger.info(f"--- DSKG: Wrote {len(rows)} concept score(s) ---")
 
 def update_dskg_from_remedial(
     student_id: int, 
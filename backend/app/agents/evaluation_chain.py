@@ -1,17 +1,15 @@
 import os
 import json
-import pypdf
-import docx
-import io
 import requests # To download files
 from typing import TypedDict, List, Optional
-from langchain_google_genai import ChatGoogleGenerativeAI
-from langchain_core.prompts import ChatPromptTemplate
 from pydantic import BaseModel, Field
 from langgraph.graph import StateGraph, END
 from .. import schemas, models
 from urllib.parse import urlparse
-from ..core.storage import minio_client, MINIO_BUCKET # Import storage
+from ..core.extraction import UnsupportedFileType
+from ..core.extraction_cache import extract_object_text_cached
+from .prompt_registry import register_prompt, get_chain
+from ..core.tracing import traced_node, span, llm_config
 import logging
 from dotenv import load_dotenv
 import os
@@ -37,42 +35,34 @@ class EvaluationState(TypedDict):
     rubric_text: str # Extracted rubric text
     ai_feedback: GradedRubric 
 
-# --- Initialize the LLM ---
-llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0.0)
-structured_llm = llm.with_structured_output(GradedRubric)
+# --- THE NEW PROMPT (Req #1) ---
+register_prompt("rubric_grader", version=1, schema=GradedRubric, messages=[
+    ("system", 
+     "You are an expert, fair, and objective teaching assistant. "
+     "Your job is to grade a student's submission *strictly* based on the provided rubric. "
+     "Read the rubric carefully to understand the criteria and performance levels. "
+     "Then, read the student's submission. "
+     "For each criterion in the rubric, provide a score and a detailed justification, citing examples from the submission. "
+     "You MUST output a JSON object containing a list of your grades for *all* criteria."),
+    ("human", 
+     "--- GRADING RUBRIC ---\n{rubric}\n\n"
+     "--- STUDENT SUBMISSION ---\n{submission}\n\n"
+     "Please grade the submission based on the rubric and provide your feedback in the required JSON format.")
+])
 
 # --- NEW: Helper function to get text from storage ---
 def get_text_from_url(object_name: str) -> str:
     """Fetches a file from a MinIO object KEY and extracts text."""
-    if minio_client is None:
-        logger.error("MinIO client not initialized.")
-        return "Error: MinIO client not available."
-
     try:
-        # --- THIS IS THE FIX ---
-        # No URL parsing. We are given the object_name (key) directly.
-        response = minio_client.get_object(MINIO_BUCKET, object_name)
-        data = response.read()
-        response.close()
-        response.release_conn()
-        file_bytes = io.BytesIO(data)
-
-        if object_name.endswith(".pdf"):
-            reader = pypdf.PdfReader(file_bytes)
-            return "\n".join(page.extract_text() or "" for page in reader.pages)
-        elif object_name.endswith(".docx"):
-            doc = docx.Document(file_bytes)
-            return "\n".join(para.text for para in doc.paragraphs)
-        elif object_name.endswith(".txt"):
-            return file_bytes.read().decode("utf-8")
-        else:
-            return "Unsupported file type."
-
+        return extract_object_text_cached(object_name)
+    except UnsupportedFileType:
+        return "Unsupported file type."
     except Exception as e:
         logger.error(f"Failed to get text from MinIO object {object_name}: {e}")
         return "Error: Could not read file."
     
 # --- Define Agent Nodes (UPDATED for Req #1) ---
+@traced_node("evaluation.rubric_grader")
 def rubric_grader_node(state: EvaluationState):
     logger.info("--- [AI] Running Rubric Grader Node ---")
     
@@ -86,28 +76,14 @@ def rubric_grader_node(state: EvaluationState):
         logger.error("Rubric text is missing or unreadable.")
         return {"ai_feedback": None}
 
-    # --- THE NEW PROMPT (Req #1) ---
-    prompt = ChatPromptTemplate.from_messages([
-        ("system", 
-         "You are an expert, fair, and objective teaching assistant. "
-         "Your job is to grade a student's submission *strictly* based on the provided rubric. "
-         "Read the rubric carefully to understand the criteria and performance levels. "
-         "Then, read the student's submission. "
-         "For each criterion in the rubric, provide a score and a detailed justification, citing examples from the submission. "
-         "You MUST output a JSON object containing a list of your grades for *all* criteria."),
-        ("human", 
-         "--- GRADING RUBRIC ---\n{rubric}\n\n"
-         "--- STUDENT SUBMISSION ---\n{submission}\n\n"
-         "Please grade the submission based on the rubric and provide your feedback in the required JSON format.")
-    ])
-    
-    chain = prompt | structured_llm
+    chain = get_chain("rubric_grader")
     
     try:
-        ai_result = chain.invoke({
-            "submission": submission_text,
-            "rubric": rubric_text
-        })
+        with span("evaluation.llm", kind="llm"):
+            ai_result = chain.invoke({
+                "submission": submission_text,
+                "rubric": rubric_text
+            }, config=llm_config())
         logger.info(f"--- [AI] Result: {ai_result} ---")
         return {"ai_feedback": ai_result}
     except Exception as e:
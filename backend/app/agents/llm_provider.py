@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+import random
+import threading
+import time
+from functools import lru_cache
+
+from langchain_core.runnables import RunnableLambda
+
+logger = logging.getLogger(__name__)
+
+# --- Provider config ---
+# gemini: the real model
+# record: the real model, every structured output is appended to LLM_RECORDINGS_PATH
+# replay: no network, structured outputs are served from LLM_RECORDINGS_PATH
+LLM_PROVIDER = os.environ.get("LLM_PROVIDER", "gemini")
+LLM_MODEL = os.environ.get("LLM_MODEL", "gemini-2.5-flash")
+LLM_RECORDINGS_PATH = os.environ.get("LLM_RECORDINGS_PATH", "llm_recordings.json")
+# Simulated model latency for replay, e.g. "fixed:0.8", "uniform:0.5:2.0", "lognormal:0.0:0.5"
+LLM_REPLAY_LATENCY = os.environ.get("LLM_REPLAY_LATENCY", "fixed:0")
+LLM_REPLAY_SEED = os.environ.get("LLM_REPLAY_SEED")
+
+def schema_key(schema) -> str:
+    """Recordings are keyed by the structured-output model's qualified name."""
+    return f"{schema.__module__}.{schema.__qualname__}"
+
+def _load_recordings(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+class LatencyModel:
+    """Samples simulated model latency (seconds) from a configured distribution."""
+
+    def __init__(self, spec: str, seed=None):
+        parts = spec.split(":")
+        self.kind = parts[0]
+        self.params = [float(p) for p in parts[1:]]
+        self._random = random.Random(seed)
+        if self.kind not in ("fixed", "uniform", "lognormal"):
+            raise ValueError(f"Unknown latency distribution '{spec}'")
+
+    def sample(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0] if self.params else 0.0
+        if self.kind == "uniform":
+            return self._random.uniform(self.params[0], self.params[1])
+        return self._random.lognormvariate(self.params[0], self.params[1])
+
+class ReplayChatModel:
+    """
+    Offline stand-in for the chat model. Only structured output is supported,
+    which is the only way the agents use the model. Recorded outputs for each
+    schema are served round-robin after a simulated latency.
+    """
+
+    def __init__(self, recordings: dict, latency: LatencyModel):
+        self.recordings = recordings
+        self.latency = latency
+        self._cursors = {}
+        self._lock = threading.Lock()
+
+    def _next_output(self, schema) -> dict:
+        outputs = self.recordings.get(schema_key(schema)) or self.recordings.get(schema.__name__)
+        if not outputs:
+            raise LookupError(f"No recorded outputs for {schema_key(schema)}")
+        with self._lock:
+            cursor = self._cursors.get(schema, 0)
+            self._cursors[schema] = cursor + 1
+        return outputs[cursor % len(outputs)]
+
+    def with_structured_output(self, schema, **kwargs):
+        def _replay(_prompt_value):
+            time.sleep(self.latency.sample())
+            return schema.model_validate(self._next_output(schema))
+        return RunnableLambda(_replay)
+
+class RecordingChatModel:
+    """Wraps the real model and appends every structured output to a recordings file."""
+
+    def __init__(self, model, path: str):
+        self.model = model
+        self.path = path
+        self._lock = threading.Lock()
+
+    def _record(self, schema, output):
+        with self._lock:
+            recordings = _load_recordings(self.path)
+            recordings.setdefault(schema_key(schema), []).append(output.model_dump())
+            with open(self.path, "w", encoding="utf-8") as f:
+                json.dump(recordings, f, indent=2)
+        return output
+
+    def with_structured_output(self, schema, **kwargs):
+        structured = self.model.with_structured_output(schema, **kwargs)
+        return structured | RunnableLambda(lambda output: self._record(schema, output))
+
+def _build_gemini():
+    from langchain_google_genai import ChatGoogleGenerativeAI
+    return ChatGoogleGenerativeAI(model=LLM_MODEL, temperature=0.0)
+
+@lru_cache(maxsize=1)
+def get_llm():
+    """Returns the process-wide chat model for the configured provider."""
+    if LLM_PROVIDER == "replay":
+        logger.info(f"LLM provider: replay from {LLM_RECORDINGS_PATH} (latency {LLM_REPLAY_LATENCY})")
+        return ReplayChatModel(
+            _load_recordings(LLM_RECORDINGS_PATH),
+            LatencyModel(LLM_REPLAY_LATENCY, seed=LLM_REPLAY_SEED)
+        )
+    if LLM_PROVIDER == "record":
+        logger.info(f"LLM provider: gemini, recording to {LLM_RECORDINGS_PATH}")
+        return RecordingChatModel(_build_gemini(), LLM_RECORDINGS_PATH)
+    if LLM_PROVIDER == "gemini":
+        return _build_gemini()
+    raise ValueError(f"Unknown LLM_PROVIDER '{LLM_PROVIDER}'")
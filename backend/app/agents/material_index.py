@@ -0,0 +1,266 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Optional
+
+from pydantic import BaseModel
+
+from ..core.storage import get_object_bytes, put_object_bytes
+from ..core.extraction import ExtractionError, UnsupportedFileType, format_page_ranges
+from ..core.extraction_cache import extract_object_pages_cached
+from ..core.tracing import record_cache, span
+
+logger = logging.getLogger(__name__)
+
+# --- Index config ---
+INDEX_VERSION = 1
+CHUNK_CHARS = 1200     # Target size of a single chunk
+CHUNK_OVERLAP = 150    # Carry-over between neighbouring chunks
+CHARS_PER_TOKEN = 4    # Rough estimate, good enough for budgeting
+BM25_K1 = 1.5
+BM25_B = 0.75
+MMR_LAMBDA = 0.7       # 1.0 = pure relevance, 0.0 = pure diversity
+# Text read per material. Large PDFs are parsed page by page and stop here,
+# so a 400-page textbook costs only the pages it takes to fill the budget.
+MATERIAL_INDEX_MAX_CHARS = int(os.environ.get("MATERIAL_INDEX_MAX_CHARS", "400000"))
+
+# Context budget for quiz generation: a fixed base plus a share per question,
+# capped so prompts stay small even for long quizzes.
+QUIZ_CONTEXT_BASE_TOKENS = 600
+QUIZ_CONTEXT_TOKENS_PER_QUESTION = 350
+QUIZ_CONTEXT_MAX_TOKENS = 4000
+
+_STOPWORDS = {
+    "the", "and", "for", "are", "but", "not", "you", "all", "any", "can", "her", "was",
+    "one", "our", "out", "has", "have", "had", "his", "how", "its", "may", "new", "now",
+    "see", "way", "who", "did", "get", "let", "say", "she", "too", "use", "that", "with",
+    "this", "from", "they", "will", "would", "there", "their", "what", "about", "which",
+    "when", "make", "like", "than", "then", "them", "these", "some", "into", "such",
+    "also", "each", "other", "more", "most", "only", "over", "very", "been", "were",
+    "being", "those", "where", "while", "should", "could", "because", "between",
+}
+
+# --- Index models (persisted as JSON next to the material object) ---
+class IndexedChunk(BaseModel):
+    position: int
+    text: str
+    terms: Dict[str, int]
+    length: int
+
+class MaterialIndex(BaseModel):
+    version: int = INDEX_VERSION
+    object_key: str
+    chunks: List[IndexedChunk]
+
+def tokenize(text: str) -> List[str]:
+    return [
+        t for t in re.findall(r"[a-z0-9]+", text.lower())
+        if len(t) > 2 and t not in _STOPWORDS
+    ]
+
+def _split_into_chunks(text: str) -> List[str]:
+    """Splits text on paragraph boundaries into ~CHUNK_CHARS sized pieces."""
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks = []
+    current = ""
+    for para in paragraphs:
+        # Very long paragraphs (e.g. PDFs without blank lines) get hard-split
+        while len(para) > CHUNK_CHARS:
+            head, para = para[:CHUNK_CHARS], para[CHUNK_CHARS - CHUNK_OVERLAP:]
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(head)
+        if current and len(current) + len(para) + 2 > CHUNK_CHARS:
+            chunks.append(current)
+            current = current[-CHUNK_OVERLAP:] + "\n\n" + para
+        else:
+            current = f"{current}\n\n{para}" if current else para
+    if current:
+        chunks.append(current)
+    return chunks
+
+def index_key_for(object_key: str, pages: Optional[List[int]] = None) -> str:
+    if pages:
+        return f"{object_key}.pages-{format_page_ranges(pages)}.index.json"
+    return f"{object_key}.index.json"
+
+_INDEX_SUFFIX = re.compile(r"(\.pages-[0-9,-]+)?\.index\.json")
+
+def is_index_key_for(object_key: str, key: str) -> bool:
+    """True if `key` is one of object_key's indexes (any page range), never another object."""
+    return key.startswith(object_key) and _INDEX_SUFFIX.fullmatch(key[len(object_key):]) is not None
+
+def build_material_index(object_key: str, text: str) -> MaterialIndex:
+    chunks = []
+    for position, chunk_text in enumerate(_split_into_chunks(text)):
+        terms = tokenize(chunk_text)
+        chunks.append(IndexedChunk(
+            position=position,
+            text=chunk_text,
+            terms=dict(Counter(terms)),
+            length=len(terms)
+        ))
+    return MaterialIndex(object_key=object_key, chunks=chunks)
+
+def get_material_index(object_key: str, pages: Optional[List[int]] = None) -> Optional[MaterialIndex]:
+    """
+    Loads the chunk index stored next to a material object, building and
+    persisting it on first use. `pages` (0-based) restricts a PDF to those
+    pages and gets its own index. Returns None if the material has no text.
+    """
+    index_key = index_key_for(object_key, pages)
+    try:
+        raw = get_object_bytes(index_key)
+        if raw:
+            index = MaterialIndex.model_validate(json.loads(raw))
+            if index.version == INDEX_VERSION:
+                record_cache(hit=True)
+                return index
+            logger.info(f"Material index for {object_key} is outdated. Rebuilding.")
+    except Exception as e:
+        logger.warning(f"Could not load material index for {object_key}: {e}")
+
+    record_cache(hit=False)
+    with span("material_index.extract", kind="extract"):
+        try:
+            text = extract_object_pages_cached(object_key, pages, max_chars=MATERIAL_INDEX_MAX_CHARS)
+        except UnsupportedFileType:
+            return None
+        except ExtractionError as e:
+            logger.error(f"Failed to extract material {object_key}: {e}")
+            return None
+    if not text.strip():
+        return None
+
+    index = build_material_index(object_key, text)
+    try:
+        put_object_bytes(
+            index_key,
+            index.model_dump_json().encode("utf-8"),
+            content_type="application/json"
+        )
+    except Exception as e:
+        # The index is only an optimization, generation can continue without it
+        logger.warning(f"Could not persist material index for {object_key}: {e}")
+    logger.info(f"Built material index for {object_key} ({len(index.chunks)} chunks).")
+    return index
+
+# --- Retrieval ---
+class _Candidate:
+    def __init__(self, order: int, object_key: str, chunk: IndexedChunk):
+        self.order = order
+        self.object_key = object_key
+        self.chunk = chunk
+        self.term_set = set(chunk.terms)
+        self.tokens = max(1, len(chunk.text) // CHARS_PER_TOKEN)
+
+def context_token_budget(num_questions: int) -> int:
+    return min(
+        QUIZ_CONTEXT_MAX_TOKENS,
+        QUIZ_CONTEXT_BASE_TOKENS + QUIZ_CONTEXT_TOKENS_PER_QUESTION * max(1, num_questions)
+    )
+
+def _bm25_scores(candidates: List[_Candidate], query_terms: List[str]) -> List[float]:
+    n = len(candidates)
+    avg_len = sum(c.chunk.length for c in candidates) / n or 1.0
+    df = Counter()
+    for c in candidates:
+        df.update(c.term_set)
+
+    scores = []
+    for c in candidates:
+        score = 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * c.chunk.length / avg_len)
+        for term in query_terms:
+            tf = c.chunk.terms.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (n - df[term] + 0.5) / (df[term] + 0.5))
+            score += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        scores.append(score)
+    return scores
+
+def _salient_terms(candidates: List[_Candidate], limit: int = 40) -> List[str]:
+    """Fallback query when no concepts are given: the most distinctive terms overall."""
+    n = len(candidates)
+    df = Counter()
+    tf = Counter()
+    for c in candidates:
+        df.update(c.term_set)
+        tf.update(c.chunk.terms)
+    weighted = {
+        term: count * math.log(1 + n / df[term])
+        for term, count in tf.items()
+        if df[term] < n or n == 1
+    }
+    return [t for t, _ in sorted(weighted.items(), key=lambda kv: -kv[1])[:limit]]
+
+def _jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+def select_context(
+    indexes: List[MaterialIndex],
+    concepts: Optional[List[str]],
+    num_questions: int,
+    token_budget: Optional[int] = None
+) -> str:
+    """
+    Picks the most relevant yet mutually diverse chunks across all materials
+    (BM25 + maximal marginal relevance) until the token budget is spent.
+    Concepts are served round-robin so each one gets coverage.
+    """
+    token_budget = token_budget or context_token_budget(num_questions)
+    candidates = []
+    for index in indexes:
+        for chunk in index.chunks:
+            candidates.append(_Candidate(len(candidates), index.object_key, chunk))
+    if not candidates:
+        return ""
+
+    queries = [tokenize(c) for c in (concepts or []) if tokenize(c)]
+    if not queries:
+        queries = [_salient_terms(candidates)]
+
+    relevance = []
+    for query_terms in queries:
+        scores = _bm25_scores(candidates, query_terms)
+        top = max(scores) or 1.0
+        relevance.append([s / top for s in scores])
+
+    selected: List[_Candidate] = []
+    used_tokens = 0
+    remaining = set(range(len(candidates)))
+    turn = 0
+    while remaining:
+        query_rel = relevance[turn % len(relevance)]
+        turn += 1
+
+        best, best_score = None, None
+        for i in remaining:
+            cand = candidates[i]
+            if used_tokens + cand.tokens > token_budget:
+                continue
+            redundancy = max((_jaccard(cand.term_set, s.term_set) for s in selected), default=0.0)
+            score = MMR_LAMBDA * query_rel[i] - (1 - MMR_LAMBDA) * redundancy
+            if best_score is None or score > best_score:
+                best, best_score = i, score
+        if best is None:
+            break
+
+        remaining.discard(best)
+        selected.append(candidates[best])
+        used_tokens += candidates[best].tokens
+
+    # Present chunks in reading order, grouped by material
+    selected.sort(key=lambda c: c.order)
+    logger.info(
+        f"Selected {len(selected)}/{len(candidates)} chunks (~{used_tokens}/{token_budget} tokens) "
+        f"from {len(indexes)} material(s)."
+    )
+    return "\n\n---\n\n".join(c.chunk.text for c in selected)
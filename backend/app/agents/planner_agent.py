@@ -4,8 +4,8 @@ from sqlalchemy.orm import Session as SqlSession
 from typing import List
 from ..core.kg_graph import get_graph_db
 from .. import models, crud
-from .evaluation_chain import llm # Re-use your LLM
-from langchain_core.prompts import ChatPromptTemplate
+from .prompt_registry import register_prompt, get_chain
+from ..core.tracing import span, llm_config
 from pydantic import BaseModel
 
 logger = logging.getLogger(__name__)
@@ -23,6 +23,14 @@ class AIQuestion(BaseModel):
 class AIQuiz(BaseModel):
     questions: List[AIQuestion]
 
+register_prompt("remedial_quiz", version=1, schema=AIQuiz, messages=[
+    ("system",
+     "You are a helpful tutor. Create a 3-question multiple-choice quiz "
+     "to help a student practice this single concept: {concept}. "
+     "The questions should be clear and test fundamental understanding."),
+    ("human", "Please generate the 3-question quiz for {concept}.")
+])
+
 # --- TOOL 1: Get Weakest Concepts ---
 def get_weakest_concepts(student_id: int) -> List[str]:
     logger.info(f"Planner: Finding weak concepts for {student_id}")
@@ -47,16 +55,9 @@ def get_weakest_concepts(student_id: int) -> List[str]:
 # --- TOOL 2: Generate Remedial Quiz ---
 def generate_remedial_quiz(concept: str) -> AIQuiz:
     logger.info(f"Planner: Generating remedial quiz for '{concept}'")
-    ai_quiz_gen = llm.with_structured_output(AIQuiz)
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are a helpful tutor. Create a 3-question multiple-choice quiz "
-         "to help a student practice this single concept: {concept}. "
-         "The questions should be clear and test fundamental understanding."),
-        ("human", "Please generate the 3-question quiz for {concept}.")
-    ])
-    chain = prompt | ai_quiz_gen
-    quiz_result = chain.invoke({"concept": concept})
+    chain = get_chain("remedial_quiz")
+    with span("planner.remedial_llm", kind="llm"):
+        quiz_result = chain.invoke({"concept": concept}, config=llm_config())
     return quiz_result
 
 def _save_remedial_quiz(db: SqlSession, student_id: int, concept: str, quiz_data: AIQuiz):
@@ -120,7 +121,8 @@ def run_planner(db: SqlSession, student_id: int):
         return
 
     # 2. Get weakest concepts from DSKG (Neo4j)
-    weak_concepts = get_weakest_concepts(student_id)
+    with span("planner.weak_concepts", kind="graph"):
+        weak_concepts = get_weakest_concepts(student_id)
     if not weak_concepts:
         logger.info(f"Planner: No weak concepts for {student_id}. Good job!")
         return
@@ -132,4 +134,5 @@ def run_planner(db: SqlSession, student_id: int):
     quiz_content = generate_remedial_quiz(target_concept)
     
     # 5. Save quiz to database (PostgreSQL)
-    _save_remedial_quiz(db, student_id, target_concept, quiz_content)
\ No newline at end of file
+    with span("planner.save_quiz", kind="db"):
+        _save_remedial_quiz(db, student_id, target_concept, quiz_content)
\ No newline at end of file
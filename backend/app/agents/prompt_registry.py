@@ -0,0 +1,80 @@
+import logging
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from langchain_core.prompts import ChatPromptTemplate
+
+from .llm_provider import get_llm
+
+logger = logging.getLogger(__name__)
+
+class PromptSpec:
+    """A versioned prompt and the structured-output schema its chain returns."""
+
+    def __init__(self, name: str, version: int, messages: List[Tuple[str, str]], schema):
+        self.name = name
+        self.version = version
+        self.messages = messages
+        self.schema = schema
+        self.prompt = ChatPromptTemplate.from_messages(messages)
+
+    @property
+    def run_name(self) -> str:
+        return f"{self.name}@v{self.version}"
+
+    def build_chain(self, model):
+        return (self.prompt | model.with_structured_output(self.schema)).with_config(
+            run_name=self.run_name,
+            tags=[self.run_name]
+        )
+
+_specs: Dict[str, PromptSpec] = {}
+_chains: Dict[str, object] = {}
+_lock = threading.Lock()
+
+def register_prompt(name: str, version: int, messages: List[Tuple[str, str]], schema) -> PromptSpec:
+    """
+    Registers a prompt at import time. Bump `version` whenever the wording or
+    schema changes so traces and recordings can tell the variants apart.
+    """
+    spec = PromptSpec(name, version, messages, schema)
+    with _lock:
+        existing = _specs.get(name)
+        if existing and existing.version != version:
+            raise ValueError(f"Prompt '{name}' registered twice with versions {existing.version} and {version}")
+        _specs[name] = spec
+        _chains.pop(name, None)
+    return spec
+
+def get_prompt(name: str) -> ChatPromptTemplate:
+    return _specs[name].prompt
+
+def get_chain(name: str, model: Optional[object] = None):
+    """
+    Returns the shared `prompt | model.with_structured_output(schema)` chain.
+    Passing an explicit model (e.g. a fake) builds an unshared chain instead.
+    """
+    spec = _specs[name]
+    if model is not None:
+        return spec.build_chain(model)
+
+    chain = _chains.get(name)
+    if chain is None:
+        with _lock:
+            chain = _chains.get(name)
+            if chain is None:
+                chain = spec.build_chain(get_llm())
+                _chains[name] = chain
+    return chain
+
+def warm_up():
+    """Builds every registered chain once. Called at API and worker startup."""
+    for name in list(_specs):
+        get_chain(name)
+    logger.info(f"Prompt registry ready: {', '.join(s.run_name for s in _specs.values())}")
+
+def registry_info() -> List[dict]:
+    return [
+        {"name": s.name, "version": s.version, "schema": s.schema.__name__, "built": s.name in _chains}
+        for s in _specs.values()
+    ]
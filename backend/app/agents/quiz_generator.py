@@ -0,0 +1,175 @@
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextvars import copy_context
+from typing import Dict, Iterator, List, Optional
+
+from pydantic import BaseModel, Field
+
+from .. import schemas
+from .prompt_registry import register_prompt, get_chain
+from .material_index import get_material_index, select_context
+from ..core.extraction import parse_page_ranges
+from ..core.tracing import span, llm_config
+
+logger = logging.getLogger(__name__)
+
+# Questions requested per model call when generating incrementally
+QUIZ_GEN_BATCH_SIZE = 5
+
+# Materials are fetched and indexed concurrently. The pool is shared by all
+# requests in the process, so it also bounds parallel downloads overall.
+QUIZ_MATERIAL_WORKERS = int(os.environ.get("QUIZ_MATERIAL_WORKERS", "4"))
+QUIZ_MATERIAL_TIMEOUT = float(os.environ.get("QUIZ_MATERIAL_TIMEOUT", "90"))
+_material_pool = ThreadPoolExecutor(max_workers=QUIZ_MATERIAL_WORKERS, thread_name_prefix="quiz-material")
+
+# --- Models for AI structured outputs ---
+class AIOption(BaseModel):
+    option_text: str
+    is_correct: bool
+
+class AIQuestion(BaseModel):
+    question_text: str
+    question_type: str
+    score: int
+    options: List[AIOption]
+    concept_tags: List[str] = Field(description="A list of 1-3 core concepts this question is testing.")
+
+class AIQuiz(BaseModel):
+    questions: List[AIQuestion]
+
+register_prompt("quiz_generation", version=1, schema=AIQuiz, messages=[
+    ("system",
+     "You are a quiz generation expert. Create exactly {num_questions} questions "
+     "based *only* on the provided context material. The questions should match {difficulty} difficulty. "
+     "Include a mix of multiple-choice (one correct answer) and multiple-response (select all that apply) questions. "
+     "Assign 1 point to easy, 2 to medium, 3 to hard. Provide 4 options for each question. "
+     "**Crucially, for each question, you MUST provide a 'concept_tags' list containing 1 to 3 core concepts or topics from the material that the question is testing.**"),
+    ("human",
+     "--- CONTEXT MATERIAL ---\n{context}\n\n"
+     "{avoid}"
+     "Please generate the quiz based *only* on the context above in the required JSON format.")
+])
+
+def to_question_create(q: AIQuestion) -> schemas.QuestionCreate:
+    """Converts a generated question into the schema used to create coursework."""
+    return schemas.QuestionCreate(
+        question_text=q.question_text,
+        question_type=q.question_type,
+        score=q.score,
+        options=[
+            schemas.OptionCreate(
+                option_text=o.option_text,
+                is_correct=o.is_correct
+            ) for o in q.options
+        ],
+        concept_tags=q.concept_tags
+    )
+
+def _load_material_indexes(material_keys: List[str], pages: Optional[List[int]]) -> list:
+    """
+    Loads every material's index in the shared pool. Each file gets
+    QUIZ_MATERIAL_TIMEOUT from the moment it starts (twice that if it is
+    still queued); files that fail or time out are skipped, the rest are
+    returned in request order.
+    """
+    keys = list(dict.fromkeys(material_keys))
+    started: Dict[str, float] = {}
+
+    def _load(key: str):
+        started[key] = time.monotonic()
+        logger.info(f"--- [AI Quiz Gen] Loading material index for key: {key} ---")
+        return get_material_index(key, pages)
+
+    submitted = time.monotonic()
+    # Each file runs in a copy of the caller's context so its spans land on the trace
+    futures = {_material_pool.submit(copy_context().run, _load, key): key for key in keys}
+    indexes = {}
+    pending = set(futures)
+    while pending:
+        deadlines = [
+            started.get(futures[f], submitted + QUIZ_MATERIAL_TIMEOUT) + QUIZ_MATERIAL_TIMEOUT
+            for f in pending
+        ]
+        done, pending = wait(pending, timeout=max(0.0, min(deadlines) - time.monotonic()), return_when=FIRST_COMPLETED)
+        for future in done:
+            key = futures[future]
+            try:
+                index = future.result()
+                if index:
+                    indexes[key] = index
+            except Exception as e:
+                logger.warning(f"--- [AI Quiz Gen] Could not read material file {key}: {e} ---", exc_info=True)
+
+        now = time.monotonic()
+        for future in list(pending):
+            key = futures[future]
+            if now >= started.get(key, submitted + QUIZ_MATERIAL_TIMEOUT) + QUIZ_MATERIAL_TIMEOUT:
+                # The thread cannot be interrupted; whatever it finishes is still cached
+                future.cancel()
+                pending.discard(future)
+                logger.warning(f"--- [AI Quiz Gen] Timed out loading material file {key}. Skipping. ---")
+
+    if len(indexes) < len(keys):
+        logger.warning(f"--- [AI Quiz Gen] Using {len(indexes)}/{len(keys)} material file(s). ---")
+    return [indexes[key] for key in keys if key in indexes]
+
+def load_quiz_context(
+    material_keys: List[str],
+    concepts: Optional[List[str]],
+    num_questions: int,
+    page_ranges: Optional[str] = None
+) -> str:
+    """
+    Loads the chunk index of every material and selects the prompt context.
+    `page_ranges` (e.g. "45-80, 102") limits PDF materials to those pages.
+    """
+    pages = parse_page_ranges(page_ranges)
+    with span("quiz_gen.load_indexes"):
+        indexes = _load_material_indexes(material_keys, pages)
+    with span("quiz_gen.select_context"):
+        return select_context(indexes, concepts, num_questions)
+
+def generate_quiz(
+    context: str,
+    num_questions: int,
+    difficulty: str,
+    avoid_questions: Optional[List[str]] = None,
+    model=None
+) -> AIQuiz:
+    """
+    Runs a single structured generation call. `model` defaults to the shared
+    LLM; pass any chat model with `with_structured_output` (e.g. a fake) instead.
+    """
+    avoid = ""
+    if avoid_questions:
+        avoid = "--- ALREADY GENERATED (do not repeat) ---\n" + "\n".join(f"- {q}" for q in avoid_questions) + "\n\n"
+
+    chain = get_chain("quiz_generation", model=model)
+    with span("quiz_gen.llm", kind="llm"):
+        return chain.invoke({
+            "num_questions": num_questions,
+            "difficulty": difficulty,
+            "context": context,
+            "avoid": avoid
+        }, config=llm_config())
+
+def generate_quiz_batches(
+    context: str,
+    num_questions: int,
+    difficulty: str,
+    batch_size: int = QUIZ_GEN_BATCH_SIZE,
+    model=None
+) -> Iterator[List[schemas.QuestionCreate]]:
+    """Yields converted questions batch by batch until `num_questions` are produced."""
+    generated: List[str] = []
+    while len(generated) < num_questions:
+        wanted = min(batch_size, num_questions - len(generated))
+        result = generate_quiz(context, wanted, difficulty, avoid_questions=generated, model=model)
+        batch = [to_question_create(q) for q in result.questions[:wanted]]
+        if not batch:
+            logger.warning("--- [AI Quiz Gen] Model returned an empty batch. Stopping early. ---")
+            return
+        generated.extend(q.question_text for q in batch)
+        yield batch
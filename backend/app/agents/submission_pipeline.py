@@ -0,0 +1,85 @@
+import logging
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+from sqlalchemy.orm import Session as SqlSession
+
+from .dskg_agent import concept_scores, load_submissions_for_dskg, write_concept_scores
+from ..core.tracing import span
+
+logger = logging.getLogger(__name__)
+
+# --- Post-approval pipeline ---
+# Approving a submission feeds the student's knowledge graph and then the
+# planner. The submission (with its answers, questions and options, or its
+# AI feedback) is loaded once into a read-only snapshot that every stage
+# reads, and each stage is timed:
+#
+#   load snapshots ── write concept scores to Neo4j ── schedule planner
+
+@dataclass(frozen=True)
+class SubmissionSnapshot:
+    submission_id: int
+    student_id: int
+    coursework_id: int
+    coursework_type: str
+    status: str
+    concept_scores: Dict[str, float] = field(default_factory=dict)
+
+@dataclass
+class PipelineResult:
+    snapshots: List[SubmissionSnapshot]
+    planned_students: List[int]
+    stage_ms: Dict[str, float]
+
+def load_submission_snapshots(db: SqlSession, submission_ids: List[int]) -> List[SubmissionSnapshot]:
+    """One query for every submission; scores are computed while the rows are loaded."""
+    return [
+        SubmissionSnapshot(
+            submission_id=s.id,
+            student_id=s.student_id,
+            coursework_id=s.coursework_id,
+            coursework_type=s.coursework.coursework_type,
+            status=s.status,
+            concept_scores=concept_scores(s) if s.status == "GRADED" else {}
+        )
+        for s in load_submissions_for_dskg(db, submission_ids)
+    ]
+
+def run_post_approval_pipeline(
+    db: SqlSession,
+    submission_ids: List[int],
+    schedule_planner: Callable[[int], None]
+) -> PipelineResult:
+    """
+    Runs the post-approval stages for one or many submissions.
+    `schedule_planner(student_id)` is called once for every student with a
+    graded submission among them; the planner itself skips students who
+    still have a remedial quiz to finish.
+    """
+    stage_ms = {}
+
+    with span("pipeline.load_snapshots", kind="db") as record:
+        snapshots = load_submission_snapshots(db, submission_ids)
+    stage_ms["load_snapshots"] = record["duration_ms"]
+
+    graded = [s for s in snapshots if s.status == "GRADED"]
+    for missing in set(submission_ids) - {s.submission_id for s in graded}:
+        logger.warning(f"DSKG: Submission {missing} not found or not graded.")
+    rows = [(s.student_id, c, score) for s in graded for c, score in s.concept_scores.items()]
+    student_ids = sorted({s.student_id for s in graded})
+
+    with span("pipeline.dskg_write", kind="graph") as record:
+        write_concept_scores(rows)
+    stage_ms["dskg_write"] = record["duration_ms"]
+
+    with span("pipeline.schedule_planner") as record:
+        for student_id in student_ids:
+            schedule_planner(student_id)
+    stage_ms["schedule_planner"] = record["duration_ms"]
+
+    logger.info(
+        f"Post-approval pipeline: {len(graded)} submission(s), {len(rows)} concept score(s), "
+        f"planner for {len(student_ids)} student(s); stages {stage_ms}"
+    )
+    return PipelineResult(snapshots=snapshots, planned_students=student_ids, stage_ms=stage_ms)
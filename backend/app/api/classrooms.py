@@ -1,8 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlalchemy.orm import Session
 from typing import List
 from .. import crud, models, schemas, auth
 from ..database import get_db
+from ..core.admission import shed_when_busy
+from ..agents.classroom_summaries import compute_summary, is_stale, summary_headers
+from .. import tasks
 from pydantic import BaseModel
 from typing import Optional
 
@@ -105,9 +108,26 @@ class GradebookResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _serve_summary(db: Session, classroom_id: int, kind: str, request: Request, response: Response):
+    """
+    Returns the precomputed summary (see agents/classroom_summaries.py) with
+    its freshness in the headers. A stale one is still served, and a refresh
+    is queued; only a classroom with no summary yet is computed inline.
+    """
+    summary = crud.get_classroom_summary(db, classroom_id, kind)
+    if summary is None:
+        shed_when_busy(request)
+        summary = compute_summary(db, classroom_id, kind)
+    elif is_stale(summary):
+        tasks.refresh_classroom_summary.delay(classroom_id)
+    response.headers.update(summary_headers(summary))
+    return summary.data
+
 @router.get("/{classroom_id}/gradebook", response_model=GradebookResponse)
 def get_classroom_gradebook(
     classroom_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
@@ -115,8 +135,7 @@ def get_classroom_gradebook(
     if not crud.get_classroom_by_id(db, classroom_id).teacher_id == current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized")
          
-    data = crud.get_gradebook_data(db, classroom_id)
-    return data
+    return _serve_summary(db, classroom_id, "gradebook", request, response)
 
 class GradeDistribution(BaseModel):
     A: int = 0
@@ -137,6 +156,8 @@ class CourseworkAnalytics(BaseModel):
 @router.get("/{classroom_id}/analytics", response_model=List[CourseworkAnalytics])
 def get_classroom_analytics(
     classroom_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
@@ -144,4 +165,25 @@ def get_classroom_analytics(
     if not crud.get_classroom_by_id(db, classroom_id).teacher_id == current_user.id:
          raise HTTPException(status_code=403, detail="Not authorized")
          
-    return crud.get_class_analytics(db, classroom_id)
\ No newline at end of file
+    return _serve_summary(db, classroom_id, "analytics", request, response)
+
+class ConceptMastery(BaseModel):
+    concept: str
+    average_score: float
+    students_assessed: int
+    students_struggling: int # Below the planner's weak-concept threshold
+
+@router.get("/{classroom_id}/mastery", response_model=List[ConceptMastery])
+def get_classroom_mastery(
+    classroom_id: int,
+    request: Request,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_teacher_user)
+):
+    """Per-concept class mastery from the students' knowledge graphs, weakest first."""
+    classroom = crud.get_classroom_by_id(db, classroom_id)
+    if not classroom or classroom.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return _serve_summary(db, classroom_id, "mastery", request, response)
\ No newline at end of file
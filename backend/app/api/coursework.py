@@ -3,38 +3,34 @@ from sqlalchemy.orm import Session
 from typing import List, Optional
 from fastapi import Form, Body
 from datetime import datetime, timezone, timedelta
-import pypdf
 import io
-import docx
-import uuid
 import logging
 import requests
+from starlette.concurrency import run_in_threadpool
 
 from .. import crud, models, schemas, auth
 from ..database import get_db
 from ..agents.quiz_grader import grade_quiz
 from .. import tasks
-from ..core.storage import upload_file_to_storage, get_presigned_url_for_key
+from ..core.storage import store_content_addressed, get_object_info, get_presigned_url_for_key, get_presigned_urls_for_keys, UploadTooLarge
+from ..core.extraction import ExtractionBusy, ExtractionError, UnsupportedFileType, parse_page_ranges
+from ..core.extraction_cache import extract_text_cached, extract_text_cached_async, extract_object_text_cached
+from ..core.admission import should_defer
 
 # --- AI Rubric Parser & Quiz Generator ---
-from ..agents.evaluation_chain import llm, get_text_from_url
-from pydantic import BaseModel, Field
-from langchain_core.prompts import ChatPromptTemplate
+from ..agents.prompt_registry import register_prompt, get_chain
+from ..agents.quiz_generator import load_quiz_context, generate_quiz, to_question_create
+from pydantic import BaseModel
 
 def get_text_from_presigned_url(url: str) -> str:
-    """PDF/text extractor from a presigned URL using requests."""
+    """PDF/DOCX/text extractor from a presigned URL using requests."""
     try:
-        response = requests.get(url, timeout=10)
-        response.raise_for_status()
-        content_type = response.headers.get("content-type", "")
-        if "pdf" in content_type:
-            with io.BytesIO(response.content) as f:
-                reader = pypdf.PdfReader(f)
-                return "\n".join(page.extract_text() or "" for page in reader.pages)
-        elif "text" in content_type:
-            return response.text
-        else:
-            return ""
+        with requests.get(url, timeout=10, stream=True) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            return extract_text_cached(response.raw)
+    except UnsupportedFileType:
+        return ""
     except Exception as e:
         raise RuntimeError(f"Failed to read material file from {url}: {e}")
 
@@ -46,19 +42,15 @@ class ParsedCriterion(BaseModel):
 class ParsedRubric(BaseModel):
     rubric: List[ParsedCriterion]
 
-class AIOption(BaseModel):
-    option_text: str
-    is_correct: bool
-
-class AIQuestion(BaseModel):
-    question_text: str
-    question_type: str
-    score: int
-    options: List[AIOption]
-    concept_tags: List[str] = Field(description="A list of 1-3 core concepts this question is testing.")
-
-class AIQuiz(BaseModel):
-    questions: List[AIQuestion]
+register_prompt("rubric_parser", version=1, schema=ParsedRubric, messages=[
+    ("system",
+     "You are an assistant that parses unstructured text into a JSON rubric. "
+     "Identify each grading criterion and its maximum points. "
+     "Example: 'Clarity (10 pts) and Grammar (5 pts)' should become "
+     "[{{\"criterion\": \"Clarity\", \"max_points\": 10}}, "
+     "{{\"criterion\": \"Grammar\", \"max_points\": 5}}]"),
+    ("human", "Please parse the following rubric text:\n{raw_text}")
+])
 
 class OptionUpdate(BaseModel):
     is_correct: bool
@@ -73,17 +65,25 @@ router = APIRouter(
 # ============================================================
 # Helper: File Upload to MinIO
 # ============================================================
-def handle_file_upload(file: UploadFile, folder: str = "uploads") -> str:
-    """Helper to upload a file to MinIO and return its KEY."""
+def _store_registered(db: Session, file_obj, extension: str, content_type: str) -> str:
+    stored = store_content_addressed(file_obj, extension, content_type)
+    crud.register_stored_object(db, stored.key, stored.sha256, stored.size, content_type)
+    if stored.deduplicated and get_object_info(stored.key) is None:
+        # Garbage-collected between the dedupe check and the registration; the
+        # fresh registration protects it now, so store the bytes again
+        stored = store_content_addressed(file_obj, extension, content_type)
+    return stored.key
+
+def handle_file_upload(db: Session, file: UploadFile) -> str:
+    """
+    Helper to store an upload and return its KEY. Identical bytes map to the
+    same content-addressed object, which is (re)registered for reference counting.
+    """
     try:
-        file_extension = file.filename.split(".")[-1]
-        unique_filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
-        file_key = upload_file_to_storage(
-            file_obj=file.file,
-            file_name=unique_filename,
-            content_type=file.content_type
-        )
-        return file_key
+        file_extension = file.filename.split(".")[-1] if "." in file.filename else ""
+        return _store_registered(db, file.file, file_extension, file.content_type)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"File upload failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"File upload failed: {e}")
@@ -106,83 +106,90 @@ async def create_new_coursework(
 @router.post("/upload-file", response_model=dict)
 async def upload_file(
     file: UploadFile = File(...),
+    db: Session = Depends(get_db),
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
-    file_key = handle_file_upload(file)
+    file_key = await run_in_threadpool(handle_file_upload, db, file)
     return {"file_key": file_key}
 
 # ============================================================
 # AI Quiz Generation Endpoint
 # ============================================================
+def _check_page_ranges(request: schemas.QuizGenerationRequest):
+    try:
+        parse_page_ranges(request.page_ranges)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 @router.post("/generate-quiz-from-files", response_model=schemas.QuizGenerationResponse)
 def generate_quiz_with_ai(
     request: schemas.QuizGenerationRequest,
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
-    ai_quiz_gen = llm.with_structured_output(AIQuiz)
-    context_text = ""
     logger.info("--- [AI Quiz Gen] Starting... ---") 
+    _check_page_ranges(request)
 
-    for key in request.material_file_urls:
-        try:
-            logger.info(f"--- [AI Quiz Gen] Extracting text from key: {key} ---")
-            context_text += get_text_from_url(key) + "\n\n"
-        except Exception as e:
-            logger.warning(f"--- [AI Quiz Gen] Could not read material file {key}: {e} ---", exc_info=True)
+    concepts = list(request.concept_tags or [])
+    if request.topic:
+        concepts.append(request.topic)
+    context_text = load_quiz_context(request.material_file_urls, concepts, request.num_questions, request.page_ranges)
 
     if not context_text.strip():
         logger.warning("--- [AI Quiz Gen] Context text is empty. Aborting. ---")
         raise HTTPException(status_code=400, detail="Could not extract text from any provided material files.")
 
-    logger.info("--- [AI Quiz Gen] Context extracted. Generating prompt... ---")
-    
-    # --- CHANGE 2: UPDATE THE PROMPT ---
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are a quiz generation expert. Create exactly {num_questions} questions "
-         "based *only* on the provided context material. The questions should match {difficulty} difficulty. "
-         "Include a mix of multiple-choice (one correct answer) and multiple-response (select all that apply) questions. "
-         "Assign 1 point to easy, 2 to medium, 3 to hard. Provide 4 options for each question. "
-         "**Crucially, for each question, you MUST provide a 'concept_tags' list containing 1 to 3 core concepts or topics from the material that the question is testing.**"),
-        ("human",
-         "--- CONTEXT MATERIAL ---\n{context}\n\n"
-         "Please generate the quiz based *only* on the context above in the required JSON format.")
-    ])
-
-    chain = prompt | ai_quiz_gen
-
     try:
         logger.info("--- [AI Quiz Gen] Invoking AI model... ---")
-        result = chain.invoke({
-            "num_questions": request.num_questions,
-            "difficulty": request.difficulty,
-            "context": context_text[:10000]
-        })
+        result = generate_quiz(context_text, request.num_questions, request.difficulty)
         logger.info("--- [AI Quiz Gen] AI model returned. Converting questions... ---")
         
-        questions_converted = []
-        for q in result.questions:
-            questions_converted.append(
-                schemas.QuestionCreate(
-                    question_text=q.question_text,
-                    question_type=q.question_type,
-                    score=q.score,
-                    options=[
-                        schemas.OptionCreate(
-                            option_text=o.option_text,
-                            is_correct=o.is_correct
-                        ) for o in q.options
-                    ],
-                    # --- CHANGE 3: SAVE THE NEW TAGS ---
-                    concept_tags=q.concept_tags
-                )
-            )
-
+        questions_converted = [to_question_create(q) for q in result.questions]
         return schemas.QuizGenerationResponse(questions=questions_converted)
     except Exception as e:
         logger.error(f"AI Quiz Gen failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"AI failed to generate quiz: {e}")
 
+# ============================================================
+# AI Quiz Generation Jobs (async, incremental results)
+# ============================================================
+@router.post(
+    "/generate-quiz-jobs",
+    response_model=schemas.QuizGenerationJobDisplay,
+    status_code=status.HTTP_202_ACCEPTED
+)
+def submit_quiz_generation_job(
+    request: schemas.QuizGenerationRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_teacher_user)
+):
+    """Queues quiz generation and returns immediately with a job to poll."""
+    if not request.material_file_urls:
+        raise HTTPException(status_code=400, detail="No material files provided.")
+    _check_page_ranges(request)
+
+    db_job = crud.create_quiz_generation_job(db, request, teacher_id=current_user.id)
+    tasks.run_quiz_generation.delay(db_job.id)
+    return db_job
+
+@router.get("/generate-quiz-jobs/{job_id}", response_model=schemas.QuizGenerationJobDisplay)
+def get_quiz_generation_job(
+    job_id: int,
+    offset: int = 0,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_teacher_user)
+):
+    """
+    Polls a generation job. Questions appear as each batch finishes;
+    pass `offset` to only receive questions not seen yet.
+    """
+    db_job = crud.get_quiz_generation_job(db, job_id)
+    if not db_job or db_job.teacher_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Quiz generation job not found")
+
+    job_data = schemas.QuizGenerationJobDisplay.model_validate(db_job)
+    job_data.questions = job_data.questions[max(0, offset):]
+    return job_data
+
 # ============================================================
 # Get Coursework List
 # ============================================================
@@ -256,23 +263,13 @@ def get_coursework_to_take(
     if existing_submission:
         raise HTTPException(status_code=409, detail="You have already submitted this coursework.", headers={"X-Submission-ID": str(existing_submission.id)})
 
-    if db_coursework.rubric_file_url:
-        try:
-            db_coursework.rubric_file_url = get_presigned_url_for_key(
-                db_coursework.rubric_file_url
-            )
-        except Exception as e:
-            logger.error(f"Failed to generate URL for rubric key: {e}")
-            db_coursework.rubric_file_url = None
-    if db_coursework.material_file_urls:
-        fresh_urls = []
-        for key in db_coursework.material_file_urls:
-            try:
-                fresh_urls.append(get_presigned_url_for_key(key))
-            except Exception:
-                pass 
-        db_coursework.material_file_urls = fresh_urls
-    return db_coursework
+    # Keys are swapped for URLs on the response only, never on the ORM row
+    coursework_data = schemas.CourseworkForStudent.model_validate(db_coursework, from_attributes=True)
+    material_keys = db_coursework.material_file_urls or []
+    urls = get_presigned_urls_for_keys([db_coursework.rubric_file_url, *material_keys])
+    coursework_data.rubric_file_url = urls.get(db_coursework.rubric_file_url)
+    coursework_data.material_file_urls = [urls[key] for key in material_keys if key in urls]
+    return coursework_data
 
 @router.get("/{coursework_id}/details", response_model=schemas.CourseworkDisplay)
 def get_coursework_details(
@@ -294,6 +291,14 @@ def get_coursework_details(
 # Submit Quiz
 # ============================================================
 
+def _admission_status(grading_task) -> str:
+    """
+    Initial status of a new submission: SUBMITTED (grading is enqueued now)
+    or, while its queue or the DB is saturated, DEFERRED (the row is saved and
+    tasks.release_deferred_submissions enqueues it later).
+    """
+    return "DEFERRED" if should_defer(grading_task) else "SUBMITTED"
+
 @router.post(
     "/{coursework_id}/submit-quiz",
     response_model=schemas.SubmissionDetail
@@ -324,10 +329,12 @@ def submit_quiz(
     if existing_submission:
         raise HTTPException(status_code=403, detail="You have already submitted this quiz.")
 
+    initial_status = _admission_status(tasks.run_quiz_grading)
     db_submission = crud.create_quiz_submission(
-        db=db, submission=submission, coursework_id=coursework_id, student_id=current_user.id
+        db=db, submission=submission, coursework_id=coursework_id, student_id=current_user.id, status=initial_status
     )
-    tasks.run_quiz_grading.delay(db_submission.id)
+    if initial_status == "SUBMITTED":
+        tasks.run_quiz_grading.delay(db_submission.id)
 
     return crud.get_submission_detail(db, db_submission.id)
 
@@ -336,41 +343,28 @@ def submit_quiz(
 # Submit Essay / Assignment / Case Study
 # ============================================================
 def handle_file_upload_from_bytes(
+    db: Session,
     file_obj: io.BytesIO, 
     filename: str, 
-    content_type: str, 
-    folder: str = "uploads"
+    content_type: str
 ) -> str:
-    """Helper to upload a file-like object (BytesIO) to MinIO and return its KEY."""
+    """Helper to store a file-like object (BytesIO) and return its KEY."""
     try:
-        file_extension = filename.split(".")[-1]
-        unique_filename = f"{folder}/{uuid.uuid4()}.{file_extension}"
-
-        file_key = upload_file_to_storage(
-            file_obj=file_obj,
-            file_name=unique_filename,
-            content_type=content_type
-        )
-        return file_key
+        file_extension = filename.split(".")[-1] if "." in filename else ""
+        return _store_registered(db, file_obj, file_extension, content_type)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
         logger.error(f"File upload from bytes failed: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=f"File upload failed: {e}")
     
 
-@router.post(
-    "/{coursework_id}/submit-file",
-    response_model=schemas.SubmissionDetail
-)
-async def submit_file(
-    coursework_id: int,
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_student_user)
-):
+def _check_file_submission_allowed(db: Session, coursework_id: int, student: models.User):
+    """Shared checks for file-based submissions (direct or via an upload session)."""
     db_coursework = crud.get_coursework_with_details(db=db, coursework_id=coursework_id)
     if not db_coursework or db_coursework.coursework_type not in ['essay', 'assignment', 'case_study']:
         raise HTTPException(status_code=404, detail="Coursework not found")
-    if not crud.is_student_enrolled(db, current_user.id, db_coursework.classroom_id):
+    if not crud.is_student_enrolled(db, student.id, db_coursework.classroom_id):
         raise HTTPException(status_code=403, detail="You are not enrolled in this class")
 
     now = datetime.now(timezone.utc)
@@ -382,35 +376,35 @@ async def submit_file(
     if due_at and now > due_at:
         raise HTTPException(status_code=403, detail="The deadline has passed")
 
-    existing_submission = crud.get_submission_by_student_and_coursework(db, current_user.id, coursework_id)
+    existing_submission = crud.get_submission_by_student_and_coursework(db, student.id, coursework_id)
     if existing_submission:
         raise HTTPException(status_code=403, detail="You have already submitted this coursework.")
+    return db_coursework
+
+@router.post(
+    "/{coursework_id}/submit-file",
+    response_model=schemas.SubmissionDetail
+)
+async def submit_file(
+    coursework_id: int,
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_student_user)
+):
+    _check_file_submission_allowed(db, coursework_id, current_user)
+    initial_status = _admission_status(tasks.run_ai_evaluation)
     
-    try:
-        file_contents = await file.read()
-    except Exception as e:
-        logger.error(f"Failed to read file stream: {e}")
-        raise HTTPException(status_code=500, detail="Failed to read file.")
-    
+    # The upload stays in Starlette's spooled temp file; both passes stream it in chunks.
+    # Under load only the file is stored; the evaluation task extracts it later.
     text_content = ""
-    filename = file.filename.lower()
-    try:
-        if filename.endswith(".pdf"):
-            reader = pypdf.PdfReader(io.BytesIO(file_contents))
-            text_content = "\n".join(page.extract_text() or "" for page in reader.pages)
-        elif filename.endswith(".docx"):
-            doc = docx.Document(io.BytesIO(file_contents))
-            text_content = "\n".join(para.text for para in doc.paragraphs)
-        elif filename.endswith(".txt"):
-            text_content = file_contents.decode("utf-8")
-    except Exception as e:
-        logger.error(f"Failed to extract text during submission: {e}")
+    if initial_status == "SUBMITTED":
+        try:
+            text_content = await extract_text_cached_async(file.file)
+        except ExtractionError as e:
+            logger.error(f"Failed to extract text during submission: {e}")
+        await file.seek(0)
     
-    file_key = handle_file_upload_from_bytes(
-        io.BytesIO(file_contents), 
-        file.filename, 
-        file.content_type
-    )
+    file_key = await run_in_threadpool(handle_file_upload, db, file)
 
     submission_schema = schemas.EssaySubmissionCreate(
         submission_text=text_content,
@@ -418,9 +412,52 @@ async def submit_file(
     )
 
     db_submission = crud.create_essay_submission(
-        db=db, submission=submission_schema, coursework_id=coursework_id, student_id=current_user.id
+        db=db, submission=submission_schema, coursework_id=coursework_id, student_id=current_user.id, status=initial_status
+    )
+    if initial_status == "SUBMITTED":
+        tasks.run_ai_evaluation.delay(db_submission.id)
+    return crud.get_submission_detail(db, db_submission.id)
+
+@router.post(
+    "/{coursework_id}/submit-upload",
+    response_model=schemas.SubmissionDetail
+)
+def submit_upload(
+    coursework_id: int,
+    payload: schemas.UploadSubmissionCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_student_user)
+):
+    """Submits a file that was uploaded straight to storage via /api/uploads/sessions."""
+    upload = crud.get_upload_session(db, payload.upload_session_id)
+    if not upload or upload.user_id != current_user.id or upload.purpose != "submission":
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    if upload.status not in ("UPLOADED", "READY"):
+        raise HTTPException(status_code=409, detail=f"Upload is not ready to submit (status: {upload.status}).")
+    _check_file_submission_allowed(db, coursework_id, current_user)
+    extracted = upload.status == "READY"
+    # One upload backs one submission: a second submit (or a race with one) finds it SUBMITTED
+    if not crud.claim_upload_session(db, upload.id):
+        raise HTTPException(status_code=409, detail="This upload has already been submitted.")
+
+    # If the extraction task already ran this is a cache hit; otherwise grading extracts it
+    text_content = ""
+    if extracted:
+        try:
+            text_content = extract_object_text_cached(upload.object_key)
+        except ExtractionError as e:
+            logger.error(f"Failed to read extracted text for upload {upload.id}: {e}")
+
+    submission_schema = schemas.EssaySubmissionCreate(
+        submission_text=text_content,
+        submission_file_url=upload.object_key
+    )
+    initial_status = _admission_status(tasks.run_ai_evaluation)
+    db_submission = crud.create_essay_submission(
+        db=db, submission=submission_schema, coursework_id=coursework_id, student_id=current_user.id, status=initial_status
     )
-    tasks.run_ai_evaluation.delay(db_submission.id)
+    if initial_status == "SUBMITTED":
+        tasks.run_ai_evaluation.delay(db_submission.id)
     return crud.get_submission_detail(db, db_submission.id)
 
 
@@ -446,14 +483,12 @@ def get_submission_result(
     elif current_user.role == 'teacher' and db_submission.coursework.classroom.teacher_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized")
     
-    if db_submission and db_submission.submission_file_url:
+    file_url = None
+    if db_submission.submission_file_url:
         try:
-            db_submission.submission_file_url = get_presigned_url_for_key(
-                db_submission.submission_file_url
-            )
+            file_url = get_presigned_url_for_key(db_submission.submission_file_url)
         except Exception as e:
             logger.error(f"Failed to generate URL for submission key: {e}")
-            db_submission.submission_file_url = None
        
     if current_user.role == 'student' and db_submission.status != 'GRADED':
         coursework_data = schemas.CourseworkDisplay.model_validate(db_submission.coursework)
@@ -467,10 +502,13 @@ def get_submission_result(
             student_id=db_submission.student_id, 
             coursework=coursework_data,
             student=student_data,
-            submission_file_url=db_submission.submission_file_url
+            submission_file_url=file_url
         )
         
-    return db_submission
+    # from_attributes here also covers the nested answer schemas, whose Config only annotates it
+    submission_data = schemas.SubmissionDetail.model_validate(db_submission, from_attributes=True)
+    submission_data.submission_file_url = file_url
+    return submission_data
 
 @router.get("/{coursework_id}/submissions", response_model=List[schemas.SubmissionDetail])
 def get_all_submissions(
@@ -499,8 +537,69 @@ def approve_submission(
         
     crud.approve_submission(db, submission_id, approval_data)
     tasks.run_dskg_update.delay(submission_id)
+    tasks.refresh_classroom_summary.delay(db_submission.coursework.classroom_id)
     return crud.get_submission_detail(db, submission_id)
 
+@router.post("/submissions/bulk-approve", response_model=schemas.BulkApprovalResult)
+def bulk_approve_submissions(
+    request: schemas.BulkApprovalRequest,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_teacher_user)
+):
+    """
+    Approves many submissions at once: one UPDATE for every override and one
+    batched DSKG update for all affected students.
+    """
+    overrides = {o.submission_id: o for o in request.overrides}
+    if request.coursework_id is not None:
+        rows = crud.get_teacher_submission_students(
+            db, current_user.id, coursework_id=request.coursework_id, status="PENDING_REVIEW"
+        )
+        if overrides:
+            # Overridden submissions are approved even if already graded
+            rows += crud.get_teacher_submission_students(
+                db, current_user.id, submission_ids=list(overrides), coursework_id=request.coursework_id
+            )
+    elif request.submission_ids:
+        requested = set(request.submission_ids) | set(overrides)
+        rows = crud.get_teacher_submission_students(db, current_user.id, submission_ids=list(requested))
+        if len(rows) != len(requested):
+            raise HTTPException(status_code=404, detail="One or more submissions were not found")
+    else:
+        raise HTTPException(status_code=400, detail="Provide a coursework_id or submission_ids.")
+
+    student_by_submission = dict(rows)
+    if set(overrides) - set(student_by_submission):
+        raise HTTPException(status_code=404, detail="One or more submissions were not found")
+
+    submission_ids = sorted(student_by_submission)
+    approved = crud.bulk_approve_submissions(db, submission_ids, overrides)
+    if submission_ids:
+        tasks.run_dskg_update_batch.delay(submission_ids)
+        for classroom_id in crud.get_classroom_ids_for_submissions(db, submission_ids):
+            tasks.refresh_classroom_summary.delay(classroom_id)
+    logger.info(f"Bulk-approved {approved} submission(s) for teacher {current_user.id}.")
+    return schemas.BulkApprovalResult(
+        approved=approved,
+        students=len(set(student_by_submission.values())),
+        submission_ids=submission_ids
+    )
+
+@router.get("/submissions/{submission_id}/traces", response_model=List[schemas.PipelineTraceDisplay])
+def get_submission_traces(
+    submission_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_teacher_user)
+):
+    """Per-node timings, token counts and cache hits of every pipeline run for a submission."""
+    db_submission = crud.get_submission_detail(db, submission_id)
+    if not db_submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    if db_submission.coursework.classroom.teacher_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    return crud.get_traces_for_submission(db, submission_id)
+
 @router.delete("/{coursework_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_coursework(
     coursework_id: int,
@@ -560,24 +659,13 @@ async def upload_rubric_file(
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
     """Extract text from PDF/DOCX/TXT rubric."""
-    raw_text = ""
     try:
-        contents = await file.read()
-        ext = file.filename.split(".")[-1].lower()
-
-        if ext == "txt":
-            raw_text = contents.decode("utf-8")
-        elif ext == "pdf":
-            with io.BytesIO(contents) as f:
-                reader = pypdf.PdfReader(f)
-                raw_text = "\n".join(page.extract_text() or "" for page in reader.pages)
-        elif ext == "docx":
-            with io.BytesIO(contents) as f:
-                doc = docx.Document(f)
-                raw_text = "\n".join(p.text for p in doc.paragraphs)
-        else:
-            raise HTTPException(status_code=400, detail="Unsupported file type. Upload PDF, DOCX, or TXT.")
-    except Exception as e:
+        raw_text = await extract_text_cached_async(file.file)
+    except UnsupportedFileType as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except ExtractionBusy as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "10"})
+    except ExtractionError as e:
         raise HTTPException(status_code=500, detail=f"Failed to parse file: {e}")
 
     return schemas.RubricParseRequest(raw_text=raw_text)
@@ -589,19 +677,7 @@ def parse_rubric_with_ai(
     current_user: models.User = Depends(auth.get_teacher_user)
 ):
     """Uses an LLM to convert raw rubric text into structured JSON."""
-    structured_rubric_parser = llm.with_structured_output(ParsedRubric)
-
-    prompt = ChatPromptTemplate.from_messages([
-        ("system",
-         "You are an assistant that parses unstructured text into a JSON rubric. "
-         "Identify each grading criterion and its maximum points. "
-         "Example: 'Clarity (10 pts) and Grammar (5 pts)' should become "
-         "[{{\"criterion\": \"Clarity\", \"max_points\": 10}}, "
-         "{{\"criterion\": \"Grammar\", \"max_points\": 5}}]"),
-        ("human", "Please parse the following rubric text:\n{raw_text}")
-    ])
-
-    chain = prompt | structured_rubric_parser
+    chain = get_chain("rubric_parser")
 
     try:
         result = chain.invoke({"raw_text": request.raw_text})
@@ -0,0 +1,53 @@
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
+import tempfile
+import logging
+
+from ..core.storage import MAX_UPLOAD_SIZE, storage_backend, upload_file_to_storage, UploadTooLarge
+from ..core.storage_backends import LocalStorage
+
+logger = logging.getLogger(__name__)
+
+# Serves the signed links the local storage backend hands out in place of
+# MinIO presigned URLs. With STORAGE_BACKEND=minio every request is a 404.
+router = APIRouter(
+    prefix="/api/files",
+    tags=["files"]
+)
+
+def _check_signature(method: str, key: str, expires: int, signature: str) -> LocalStorage:
+    if not isinstance(storage_backend, LocalStorage):
+        raise HTTPException(status_code=404, detail="Not found")
+    if not storage_backend.verify(method, key, expires, signature):
+        raise HTTPException(status_code=403, detail="Link expired or invalid")
+    return storage_backend
+
+@router.get("/{key:path}")
+def download_file(key: str, expires: int, signature: str):
+    backend = _check_signature("GET", key, expires, signature)
+    info = backend.stat(key)
+    if info is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    # FileResponse streams from disk and answers Range requests
+    return FileResponse(backend.local_path(key), media_type=info.content_type or "application/octet-stream")
+
+@router.put("/{key:path}")
+async def upload_file(key: str, expires: int, signature: str, request: Request):
+    """Target of presigned PUT URLs (see api/uploads.py) when storage is local."""
+    _check_signature("PUT", key, expires, signature)
+
+    size = 0
+    with tempfile.SpooledTemporaryFile(max_size=1024 * 1024) as spool:
+        async for chunk in request.stream():
+            size += len(chunk)
+            if size > MAX_UPLOAD_SIZE:
+                raise HTTPException(status_code=413, detail=f"Upload exceeds the maximum size of {MAX_UPLOAD_SIZE} bytes.")
+            spool.write(chunk)
+        spool.seek(0)
+        content_type = request.headers.get("content-type", "application/octet-stream")
+        try:
+            await run_in_threadpool(upload_file_to_storage, spool, key, content_type)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=413, detail=str(e))
+    return {"file_key": key}
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from typing import List
 from .. import models, schemas, auth, crud
 from ..database import get_db
+from ..core.admission import shed_when_busy
 from ..core.kg_graph import get_graph_db
 from pydantic import BaseModel
 from ..agents.dskg_agent import update_dskg_from_remedial
@@ -84,7 +85,7 @@ def get_my_remedial_quizzes(
     ).all()
     return quizzes
 
-@router.get("/me/dskg", response_model=List[DSKGNode])
+@router.get("/me/dskg", response_model=List[DSKGNode], dependencies=[Depends(shed_when_busy)])
 def get_my_dskg(
     current_user: models.User = Depends(auth.get_current_active_user)
 ):
@@ -93,7 +94,7 @@ def get_my_dskg(
 # --- END OF FIX ---
 
 # --- Teacher-facing API ---
-@router.get("/{student_id}/dskg", response_model=DSKGProfileResponse) # <-- FIX: Changed response model
+@router.get("/{student_id}/dskg", response_model=DSKGProfileResponse, dependencies=[Depends(shed_when_busy)]) # <-- FIX: Changed response model
 def get_student_dskg(
     student_id: int,
     db: Session = Depends(get_db),
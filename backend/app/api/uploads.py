@@ -0,0 +1,149 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy.orm import Session
+from datetime import datetime, timezone, timedelta
+import os
+import uuid
+import logging
+
+from .. import crud, models, schemas, auth, tasks
+from ..database import get_db
+from ..core.storage import (
+    MAX_UPLOAD_SIZE, copy_object, delete_object, get_object_info, get_presigned_put_url, read_object_head
+)
+from ..core.extraction import SNIFF_BYTES, sniff_file_type
+from ..core.admission import should_shed
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(
+    prefix="/api/uploads",
+    tags=["uploads"]
+)
+
+# --- Upload session config ---
+# The client PUTs the file straight to storage with a presigned URL, then
+# confirms it here; the API never sees the bytes. The PUT URL stays valid
+# until the session expires, so keep the TTL short.
+UPLOAD_SESSION_TTL = timedelta(minutes=int(os.environ.get("UPLOAD_SESSION_TTL_MINUTES", "5")))
+# Confirmed uploads are copied here, out of reach of the client's PUT URL
+CHECKED_PREFIX = "uploads/checked/"
+ALLOWED_EXTENSIONS = {"pdf", "docx", "txt"}
+PURPOSE_ROLES = {"submission": "student", "rubric": "teacher", "material": "teacher"}
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands datetimes back naive
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+def _get_own_session(db: Session, session_id: int, user: models.User) -> models.UploadSession:
+    upload = crud.get_upload_session(db, session_id)
+    if not upload or upload.user_id != user.id:
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return upload
+
+def _discard(object_key: str):
+    try:
+        delete_object(object_key)
+    except Exception as e:
+        logger.warning(f"Could not delete upload {object_key}: {e}")
+
+def _reject(db: Session, upload: models.UploadSession, object_key: str, status_code: int, detail: str):
+    """Fails the session and removes the object so rejected bytes do not linger in storage."""
+    crud.update_upload_session(db, upload.id, "FAILED", error=detail)
+    _discard(object_key)
+    raise HTTPException(status_code=status_code, detail=detail)
+
+# ============================================================
+# Open an Upload Session (returns a presigned PUT URL)
+# ============================================================
+@router.post("/sessions", response_model=schemas.UploadSessionDisplay, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    upload: schemas.UploadSessionCreate,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    required_role = PURPOSE_ROLES.get(upload.purpose)
+    if required_role is None:
+        raise HTTPException(status_code=400, detail=f"Unknown upload purpose '{upload.purpose}'")
+    if current_user.role != required_role:
+        raise HTTPException(status_code=403, detail=f"Not authorized: Requires {required_role} role")
+    if required_role == "teacher" and not current_user.is_approved:
+        raise HTTPException(status_code=401, detail="Teacher account is pending approval")
+
+    extension = upload.filename.rsplit(".", 1)[-1].lower() if "." in upload.filename else ""
+    if extension not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Unsupported file type. Upload PDF, DOCX, or TXT.")
+    if upload.size <= 0:
+        raise HTTPException(status_code=400, detail="File is empty.")
+    if upload.size > MAX_UPLOAD_SIZE:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the maximum size of {MAX_UPLOAD_SIZE} bytes.")
+
+    object_key = f"uploads/{uuid.uuid4()}.{extension}"
+    try:
+        upload_url = get_presigned_put_url(object_key, expires_in=UPLOAD_SESSION_TTL)
+    except Exception as e:
+        logger.error(f"Could not presign upload URL: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail="Could not start the upload.")
+
+    db_session = crud.create_upload_session(
+        db, upload, user_id=current_user.id, object_key=object_key,
+        expires_at=datetime.now(timezone.utc) + UPLOAD_SESSION_TTL
+    )
+    display = schemas.UploadSessionDisplay.model_validate(db_session)
+    display.upload_url = upload_url
+    return display
+
+# ============================================================
+# Confirm an Upload (checks the stored object, enqueues extraction)
+# ============================================================
+@router.post("/sessions/{session_id}/complete", response_model=schemas.UploadSessionDisplay)
+def complete_upload_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    upload = _get_own_session(db, session_id, current_user)
+    if upload.status != "PENDING":
+        # Confirming twice is harmless; report where the session is
+        return upload
+
+    info = get_object_info(upload.object_key)
+    if info is None:
+        if datetime.now(timezone.utc) > _as_utc(upload.expires_at):
+            crud.update_upload_session(db, upload.id, "EXPIRED", error="Upload URL expired before the file arrived.")
+            raise HTTPException(status_code=410, detail="Upload session expired. Please upload the file again.")
+        raise HTTPException(status_code=409, detail="The file has not been uploaded yet.")
+
+    # The PUT URL may still be valid: check a copy the client cannot write
+    # to, so the bytes cannot be swapped once they have passed the checks
+    checked_key = CHECKED_PREFIX + upload.object_key.rsplit("/", 1)[-1]
+    copy_object(upload.object_key, checked_key)
+    _discard(upload.object_key)
+    info = get_object_info(checked_key)
+    if info is None:
+        raise HTTPException(status_code=409, detail="The file has not been uploaded yet.")
+
+    size, _ = info
+    if size > MAX_UPLOAD_SIZE:
+        _reject(db, upload, checked_key, 413, f"Upload exceeds the maximum size of {MAX_UPLOAD_SIZE} bytes.")
+    if size != upload.expected_size:
+        _reject(db, upload, checked_key, 400, f"Uploaded size ({size} bytes) does not match the declared size ({upload.expected_size} bytes).")
+    # Only the header is read here; the extraction task does the full check
+    if sniff_file_type(read_object_head(checked_key, SNIFF_BYTES)) == "unknown":
+        _reject(db, upload, checked_key, 400, "Unsupported file type. Upload PDF, DOCX, or TXT.")
+
+    crud.update_upload_session(db, upload.id, "UPLOADED", size=size, object_key=checked_key)
+    crud.register_stored_object(db, checked_key, size=size, content_type=upload.content_type)
+    # Submission files are extracted again by grading anyway, so that
+    # pre-extraction is the first thing to go during a submission burst
+    if upload.purpose != "submission" or not should_shed("upload_extraction"):
+        tasks.run_upload_extraction.delay(upload.id)
+    db.refresh(upload)
+    return upload
+
+@router.get("/sessions/{session_id}", response_model=schemas.UploadSessionDisplay)
+def get_upload_session(
+    session_id: int,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(auth.get_current_active_user)
+):
+    return _get_own_session(db, session_id, current_user)
\ No newline at end of file
@@ -1,9 +1,11 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from datetime import datetime, timedelta
 from typing import Optional
+import os
+import secrets
 from sqlalchemy.orm import Session # Import Session
 from . import schemas, models, crud, database
 
@@ -13,6 +15,8 @@ ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+# Shared secret for the ops endpoints (/metrics, /ops/queues); unset disables them
+OPS_TOKEN = os.environ.get("OPS_TOKEN")
 
 # --- HASHING/TOKEN CREATION (No Change) ---
 def verify_password(plain_password, hashed_password):
@@ -98,4 +102,24 @@ def get_student_user(
             status_code=status.HTTP_403_FORBIDDEN, 
             detail="Not authorized: Requires student role"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+# --- OPS ENDPOINTS ---
+def require_ops_token(request: Request):
+    """
+    Dependency for /metrics and /ops/queues, which expose queue and pipeline
+    internals: callers (Prometheus, the autoscaler) send
+    'Authorization: Bearer <OPS_TOKEN>'.
+    """
+    if not OPS_TOKEN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Ops endpoints are disabled: set OPS_TOKEN"
+        )
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not secrets.compare_digest(token.encode(), OPS_TOKEN.encode()):
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid ops token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
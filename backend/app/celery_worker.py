@@ -1,22 +1,114 @@
+import os
+
 from celery import Celery
+from kombu import Queue
 
 # 1. Initialize Celery
-# 'app.main' is the path to our FastAPI app (for context, though not strictly needed here)
-# 'broker' tells Celery to use Redis on localhost port 6379
+# The broker and result backend default to a local Redis; set
+# CELERY_BROKER_URL / CELERY_RESULT_BACKEND in deployed environments.
+CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_RESULT_BACKEND = os.environ.get("CELERY_RESULT_BACKEND", CELERY_BROKER_URL)
+
 celery_app = Celery(
     "tasks",
-    broker="redis://localhost:6379/0",
-    backend="redis://localhost:6379/0" # Also use Redis to store task results
+    broker=CELERY_BROKER_URL,
+    backend=CELERY_RESULT_BACKEND, # Also use Redis to store task results
+    # Sends .delay() to Celery or, with TASK_BACKEND=local, an in-process pool
+    task_cls="app.core.dispatch:DispatchTask"
 )
 
-# 2. Point Celery to our tasks file (which we will create next)
+# 2. Point Celery to our tasks file
 celery_app.autodiscover_tasks(["app.tasks"])
 
-# 3. Optional: Configure Celery
+# 3. Workload-isolated queues
+# Each kind of work gets its own queue and its own workers, so millisecond
+# quiz grading never waits behind minute-long LLM calls. Worker-side settings
+# (concurrency, prefetch) are applied by scripts/run_worker.py; task-side
+# settings (time limits, acks_late) are applied to every task routed there.
+# acks_late redelivers a task if its worker dies mid-run, so it is only on
+# for queues whose tasks are safe to run twice. drain_sla (seconds) is how
+# fast a backlog should clear; scripts/autoscaler.py sizes workers to it.
+QUEUE_PROFILES = {
+    # Quiz scoring: pure CPU + DB, idempotent, must stay instant
+    "grading": {"concurrency": 4, "prefetch": 4, "soft_time_limit": 30, "time_limit": 60, "acks_late": True, "drain_sla": 300},
+    # Model calls: slow and I/O bound, so more processes and no prefetching
+    "llm": {"concurrency": 8, "prefetch": 1, "soft_time_limit": 600, "time_limit": 660, "acks_late": True, "drain_sla": 1800},
+    # Neo4j knowledge-graph writes append history, so no redelivery
+    "graph": {"concurrency": 2, "prefetch": 1, "soft_time_limit": 120, "time_limit": 180, "acks_late": False, "drain_sla": 600},
+    # Remedial planning (one LLM call per weak concept, creates coursework)
+    "planning": {"concurrency": 2, "prefetch": 1, "soft_time_limit": 300, "time_limit": 360, "acks_late": False, "drain_sla": 1800},
+    # Everything else, e.g. extraction of direct uploads
+    "default": {"concurrency": 2, "prefetch": 1, "soft_time_limit": 120, "time_limit": 180, "acks_late": True, "drain_sla": 600},
+}
+
+TASK_ROUTES = {
+    "app.tasks.run_quiz_grading": "grading",
+    "app.tasks.regrade_quiz_submissions_for_question": "grading",
+    "app.tasks.run_ai_evaluation": "llm",
+    "app.tasks.run_quiz_generation": "llm",
+    "app.tasks.run_dskg_update": "graph",
+    "app.tasks.run_dskg_update_batch": "graph",
+    "app.tasks.task_run_planner": "planning",
+    "app.tasks.run_upload_extraction": "default",
+    "app.tasks.release_deferred_submissions": "default",
+    "app.tasks.refresh_classroom_summaries": "default",
+    "app.tasks.refresh_classroom_summary": "default",
+}
+
+# Per-task exceptions to the queue profile
+TASK_OVERRIDES = {
+    # Generation appends questions to the job as it goes; a rerun would duplicate them
+    "app.tasks.run_quiz_generation": {"acks_late": False},
+}
+
+def _task_annotations() -> dict:
+    annotations = {}
+    for task_name, queue in TASK_ROUTES.items():
+        profile = QUEUE_PROFILES[queue]
+        annotations[task_name] = {
+            "soft_time_limit": profile["soft_time_limit"],
+            "time_limit": profile["time_limit"],
+            "acks_late": profile["acks_late"],
+            **TASK_OVERRIDES.get(task_name, {}),
+        }
+    return annotations
+
+# 4. Periodic tasks
+# Run by Celery beat (python -m scripts.run_worker --beat) or, with
+# TASK_BACKEND=local, by the API's in-process scheduler (core/dispatch.py)
+ADMISSION_RELEASE_INTERVAL = int(os.environ.get("ADMISSION_RELEASE_INTERVAL", "10"))
+SUMMARY_REFRESH_INTERVAL = int(os.environ.get("SUMMARY_REFRESH_INTERVAL", "300"))
+
+BEAT_SCHEDULE = {
+    # Enqueue submissions that admission control deferred during a burst
+    "release-deferred-submissions": {
+        "task": "app.tasks.release_deferred_submissions",
+        "schedule": ADMISSION_RELEASE_INTERVAL,
+    },
+    # Recompute the teacher dashboards' classroom summaries
+    "refresh-classroom-summaries": {
+        "task": "app.tasks.refresh_classroom_summaries",
+        "schedule": SUMMARY_REFRESH_INTERVAL,
+    },
+}
+
+# 5. Configure Celery
 celery_app.conf.update(
     task_serializer="json",
     accept_content=["json"],
     result_serializer="json",
     timezone="UTC",
     enable_utc=True,
-)
\ No newline at end of file
+    task_queues=[Queue(name) for name in QUEUE_PROFILES],
+    task_default_queue="default",
+    task_routes={task_name: {"queue": queue} for task_name, queue in TASK_ROUTES.items()},
+    task_annotations=_task_annotations(),
+    # With acks_late, a task whose worker process is killed goes back on the queue
+    task_reject_on_worker_lost=True,
+    # Worker default; run_worker.py passes the per-queue value
+    worker_prefetch_multiplier=1,
+    # Every task is fire-and-forget (state lives in the DB), so nothing reads
+    # results; don't write them to Redis
+    task_ignore_result=True,
+    beat_schedule=BEAT_SCHEDULE,
+)
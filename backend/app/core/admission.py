@@ -0,0 +1,115 @@
+# --- Admission control ---
+# Submissions bunch up in the minutes before a deadline. The API always
+# accepts them durably (the DB row and the stored file), but it only
+# enqueues their grading while the system has room:
+#
+# * queue depth: tasks waiting on the submission's queue (queue_signals.py)
+# * DB pool saturation: share of the connection pool checked out
+#
+# When the submission's queue or the DB pool is over its limit, the row is
+# saved as DEFERRED and tasks.release_deferred_submissions (run on a
+# schedule, see celery_worker.py) enqueues it once there is headroom.
+# Non-critical reads (knowledge-graph profiles, classroom summaries that
+# would have to be computed inline) go through shed_when_busy and get a 503
+# with Retry-After while any limit is exceeded.
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+from fastapi import HTTPException, Request
+from prometheus_client import Counter
+from sqlalchemy.pool import QueuePool
+
+from ..celery_worker import TASK_ROUTES
+from ..database import engine
+from .queue_signals import queue_depths
+from .tracing import registry
+
+logger = logging.getLogger(__name__)
+
+ADMISSION_ENABLED = os.environ.get("ADMISSION_CONTROL", "1") == "1"
+ADMISSION_MAX_QUEUE_DEPTH = int(os.environ.get("ADMISSION_MAX_QUEUE_DEPTH", "200"))
+ADMISSION_MAX_POOL_USAGE = float(os.environ.get("ADMISSION_MAX_POOL_USAGE", "0.8"))
+ADMISSION_CHECK_INTERVAL = float(os.environ.get("ADMISSION_CHECK_INTERVAL", "1"))
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", "30"))
+
+ADMISSION_DECISIONS = Counter(
+    "admission_decisions_total", "Admission control outcomes: deferred/released (by queue), shed (by endpoint or work)",
+    ["decision", "target"], registry=registry
+)
+
+@dataclass
+class AdmissionState:
+    queue_depths: Dict[str, int] = field(default_factory=dict)
+    pool_usage: Optional[float] = None
+    checked_at: float = 0.0
+
+    @property
+    def db_saturated(self) -> bool:
+        return self.pool_usage is not None and self.pool_usage >= ADMISSION_MAX_POOL_USAGE
+
+    def headroom(self, queue: str) -> int:
+        """How many more tasks the queue takes before deferring kicks in."""
+        if self.db_saturated:
+            return 0
+        return max(0, ADMISSION_MAX_QUEUE_DEPTH - self.queue_depths.get(queue, 0))
+
+    @property
+    def under_pressure(self) -> bool:
+        return self.db_saturated or any(
+            depth >= ADMISSION_MAX_QUEUE_DEPTH for depth in self.queue_depths.values()
+        )
+
+def db_pool_usage() -> Optional[float]:
+    """Share of the pool's connections in use, or None for pools without a fixed size."""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return None
+    max_overflow = getattr(pool, "_max_overflow", 0)
+    if max_overflow < 0:
+        return None
+    return pool.checkedout() / (pool.size() + max_overflow)
+
+_state = AdmissionState()
+_state_lock = threading.Lock()
+
+def admission_state(refresh: bool = False) -> AdmissionState:
+    """The current signals, re-read at most every ADMISSION_CHECK_INTERVAL seconds."""
+    global _state
+    with _state_lock:
+        if refresh or time.monotonic() - _state.checked_at >= ADMISSION_CHECK_INTERVAL:
+            _state = AdmissionState(queue_depths(), db_pool_usage(), time.monotonic())
+        return _state
+
+def queue_for(task) -> str:
+    return TASK_ROUTES.get(task.name, "default")
+
+def should_defer(task) -> bool:
+    """True if `task` should not be enqueued right now (its work is saved for later release)."""
+    if not ADMISSION_ENABLED:
+        return False
+    queue = queue_for(task)
+    if admission_state().headroom(queue) > 0:
+        return False
+    ADMISSION_DECISIONS.labels("deferred", queue).inc()
+    return True
+
+def should_shed(work: str) -> bool:
+    """True if optional `work` (a label for the metric) should be skipped: any limit is exceeded."""
+    if not ADMISSION_ENABLED or not admission_state().under_pressure:
+        return False
+    ADMISSION_DECISIONS.labels("shed", work).inc()
+    return True
+
+def shed_when_busy(request: Request):
+    """Dependency for non-critical endpoints: refuses them while the system is under pressure."""
+    route = request.scope.get("route")
+    if should_shed(route.path if route else request.url.path):
+        raise HTTPException(
+            status_code=503,
+            detail="The server is busy processing submissions. Please try again shortly.",
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)}
+        )
@@ -0,0 +1,138 @@
+# --- Task dispatch ---
+# Routers and tasks enqueue work with `task.delay(...)` / `apply_async`. The
+# base task class below sends that to the configured backend:
+#
+#   TASK_BACKEND=celery  (default) publish to the broker, run on workers
+#   TASK_BACKEND=local   run on an in-process thread pool; no broker needed
+#
+# Both paths go through the same task class, so deduplication, debouncing
+# (countdown), chained .delay() calls inside tasks and the task metrics
+# behave the same. The local pool uses threads: task work is I/O bound
+# (DB, Neo4j, LLM calls) and CPU-heavy extraction already has its own
+# process pool. Meant for single-node deployments, tests and benchmarks.
+# Periodic tasks (celery_worker.py's beat_schedule) run on start_local_scheduler
+# there instead of Celery beat.
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Optional, Tuple
+
+from celery import Task
+
+logger = logging.getLogger(__name__)
+
+TASK_BACKEND = os.environ.get("TASK_BACKEND", "celery").lower()
+LOCAL_TASK_WORKERS = int(os.environ.get("LOCAL_TASK_WORKERS", "8"))
+
+class LocalExecutor:
+    """Runs tasks on a bounded thread pool; countdowns are timers that submit later."""
+
+    def __init__(self, max_workers: int = LOCAL_TASK_WORKERS):
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="local-task")
+        self._outstanding = 0  # Scheduled, queued or running
+        self._waiting = {}  # ticket -> (task name, queued at); queued for a thread, not yet running
+        self._tickets = itertools.count()
+        self._idle = threading.Condition()
+
+    def submit(self, task: Task, args=None, kwargs=None, countdown: Optional[float] = None) -> Optional[Future]:
+        with self._idle:
+            self._outstanding += 1
+        if countdown and countdown > 0:
+            timer = threading.Timer(countdown, self._enqueue, (task, args or (), kwargs or {}))
+            timer.daemon = True
+            timer.start()
+            return None
+        return self._enqueue(task, args or (), kwargs or {})
+
+    def _enqueue(self, task: Task, args, kwargs) -> Future:
+        ticket = next(self._tickets)
+        with self._idle:
+            self._waiting[ticket] = (task.name, time.time())
+        return self._pool.submit(self._run, ticket, task, args, kwargs)
+
+    def _run(self, ticket: int, task: Task, args, kwargs):
+        with self._idle:
+            self._waiting.pop(ticket, None)
+        try:
+            # apply() runs the task through Celery's tracer, so signals (metrics),
+            # retries and the task's own __call__ (dedupe locks) all apply
+            result = task.apply(args=args, kwargs=kwargs)
+            if result.failed():
+                logger.error(f"Local task {task.name}{tuple(args)} failed: {result.result!r}\n{result.traceback}")
+            return result.result
+        finally:
+            with self._idle:
+                self._outstanding -= 1
+                self._idle.notify_all()
+
+    def waiting_by_task(self) -> Dict[str, Tuple[int, float]]:
+        """Per task name: how many are queued for a thread, and when the oldest was queued."""
+        waiting = {}
+        with self._idle:
+            for name, queued_at in self._waiting.values():
+                count, oldest = waiting.get(name, (0, queued_at))
+                waiting[name] = (count + 1, min(oldest, queued_at))
+        return waiting
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Waits until no task is scheduled, queued or running (including chained ones)."""
+        with self._idle:
+            return self._idle.wait_for(lambda: self._outstanding == 0, timeout)
+
+    def shutdown(self, wait: bool = True):
+        self._pool.shutdown(wait=wait)
+
+_local_executor: Optional[LocalExecutor] = None
+_executor_lock = threading.Lock()
+
+def get_local_executor() -> LocalExecutor:
+    global _local_executor
+    with _executor_lock:
+        if _local_executor is None:
+            _local_executor = LocalExecutor()
+        return _local_executor
+
+def is_local() -> bool:
+    return TASK_BACKEND == "local"
+
+_scheduler_started = False
+
+def start_local_scheduler(schedule: dict):
+    """
+    Submits each entry of a Celery beat_schedule ({"name": {"task": ...,
+    "schedule": seconds}}) to the local executor every `schedule` seconds.
+    Started once per process; a no-op with the Celery backend.
+    """
+    global _scheduler_started
+    from celery import current_app
+
+    with _executor_lock:
+        if not is_local() or _scheduler_started:
+            return
+        _scheduler_started = True
+
+    def _tick(name: str, entry: dict):
+        try:
+            get_local_executor().submit(current_app.tasks[entry["task"]], entry.get("args"), entry.get("kwargs"))
+        except Exception as e:
+            logger.error(f"Scheduled task {name} could not be submitted: {e}")
+        timer = threading.Timer(float(entry["schedule"]), _tick, (name, entry))
+        timer.daemon = True
+        timer.start()
+
+    for name, entry in schedule.items():
+        timer = threading.Timer(float(entry["schedule"]), _tick, (name, entry))
+        timer.daemon = True
+        timer.start()
+        logger.info(f"Local scheduler: {entry['task']} every {entry['schedule']}s")
+
+class DispatchTask(Task):
+    """Base class of every task (set as the app's task_cls in celery_worker.py)."""
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        if not is_local():
+            return super().apply_async(args, kwargs, **options)
+        return get_local_executor().submit(self, args, kwargs, options.get("countdown"))
@@ -0,0 +1,446 @@
+import asyncio
+import codecs
+import hashlib
+import logging
+import mmap
+import multiprocessing
+import os
+import tempfile
+import threading
+import zipfile
+from contextlib import contextmanager
+from concurrent.futures import CancelledError, ProcessPoolExecutor, TimeoutError as FuturesTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from .storage import open_object_stream
+
+logger = logging.getLogger(__name__)
+
+# --- Extraction config ---
+# Bump when extraction output changes so cached results are not reused.
+EXTRACTOR_VERSION = 1
+EXTRACTION_WORKERS = int(os.environ.get("EXTRACTION_WORKERS", "2"))
+EXTRACTION_MAX_PAGES = int(os.environ.get("EXTRACTION_MAX_PAGES", "500"))
+EXTRACTION_MAX_CHARS = int(os.environ.get("EXTRACTION_MAX_CHARS", "2000000"))
+EXTRACTION_TIMEOUT = float(os.environ.get("EXTRACTION_TIMEOUT", "60")) # Parsing time, not time spent waiting
+# Requests that may wait for a free worker before new ones are turned away
+EXTRACTION_MAX_WAITING = int(os.environ.get("EXTRACTION_MAX_WAITING", "8"))
+SLOT_POLL_INTERVAL = 0.05
+STREAM_CHUNK_SIZE = 64 * 1024
+SNIFF_BYTES = 8 * 1024
+
+class ExtractionError(Exception):
+    """Text could not be extracted from the input."""
+
+class UnsupportedFileType(ExtractionError):
+    """The input is not a PDF, DOCX or plain-text file."""
+
+class ExtractionBusy(ExtractionError):
+    """Every extraction worker is busy and EXTRACTION_MAX_WAITING requests already wait."""
+
+# --- Page ranges ---
+def parse_page_ranges(spec: Optional[str]) -> Optional[List[int]]:
+    """
+    Parses a page hint like "45-80, 102" (1-based, inclusive) into sorted
+    0-based page numbers. Returns None for an empty hint; raises ValueError.
+    """
+    if not spec or not spec.strip():
+        return None
+    pages = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, sep, end = part.partition("-")
+        try:
+            first = int(start)
+            last = int(end) if sep else first
+        except ValueError:
+            raise ValueError(f"Invalid page range '{part}'. Use e.g. '1-10, 15'.")
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range '{part}'. Pages start at 1.")
+        pages.update(range(first - 1, min(last, first - 1 + EXTRACTION_MAX_PAGES)))
+    return sorted(pages)[:EXTRACTION_MAX_PAGES] or None
+
+def format_page_ranges(pages: Sequence[int]) -> str:
+    """Inverse of parse_page_ranges: [0, 1, 2, 8] -> "1-3,9"."""
+    ranges = []
+    for page in sorted(set(pages)):
+        if ranges and page == ranges[-1][1] + 1:
+            ranges[-1][1] = page
+        else:
+            ranges.append([page, page])
+    return ",".join(f"{a + 1}-{b + 1}" if a != b else f"{a + 1}" for a, b in ranges)
+
+# --- Type detection (by content, never by filename) ---
+def sniff_file_type(head: bytes) -> str:
+    """
+    Classifies the first SNIFF_BYTES of a file as 'pdf', 'zip', 'text' or
+    'unknown'. A 'zip' may or may not be a DOCX; that needs the whole file.
+    """
+    if b"%PDF-" in head[:1024]:
+        return "pdf"
+    if head.startswith(b"PK\x03\x04"):
+        return "zip"
+    if b"\x00" in head:
+        return "unknown"
+    try:
+        # final=False tolerates a multi-byte character cut off at the sniff boundary
+        codecs.getincrementaldecoder("utf-8")().decode(head, final=False)
+        return "text"
+    except UnicodeDecodeError:
+        return "unknown"
+
+def detect_file_type(path: str) -> str:
+    """Returns 'pdf', 'docx', 'text' or 'unknown' based on the file's bytes."""
+    with open(path, "rb") as f:
+        head = f.read(SNIFF_BYTES)
+
+    file_type = sniff_file_type(head)
+    if file_type == "zip":
+        try:
+            with zipfile.ZipFile(path) as archive:
+                if "word/document.xml" in archive.namelist():
+                    return "docx"
+        except zipfile.BadZipFile:
+            pass
+        return "unknown"
+    return file_type
+
+# --- Extractors (run inside the pool worker process) ---
+def _extract_pdf_pages(
+    path: str,
+    page_numbers: Optional[Sequence[int]],
+    max_chars: int,
+    known_lengths: Optional[Dict[int, int]] = None,
+    max_pages: Optional[int] = None
+) -> Tuple[int, Dict[int, str]]:
+    """
+    Extracts the given 0-based pages (all pages if None) in order, stopping
+    once max_chars is reached. Pages in `known_lengths` are already cached by
+    the caller: they count towards the budget but are not parsed again.
+    Returns (page_count, {page_number: text}) for the pages it parsed.
+    """
+    import pypdf
+    known_lengths = known_lengths or {}
+    # Given a path, pypdf reads the whole file into memory; a read-only map
+    # lets the OS page in only what the parsed pages touch
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        reader = pypdf.PdfReader(mapped)
+        page_count = len(reader.pages)
+        wanted = page_numbers if page_numbers is not None else range(page_count)
+        extracted = {}
+        total = 0
+        for position, page_number in enumerate(wanted):
+            if max_pages is not None and position >= max_pages:
+                logger.info(f"PDF extraction stopped at page limit ({max_pages}).")
+                break
+            if page_number >= page_count:
+                break
+            if page_number in known_lengths:
+                total += known_lengths[page_number] + 1
+            else:
+                text = reader.pages[page_number].extract_text() or ""
+                extracted[page_number] = text
+                total += len(text) + 1
+            if total >= max_chars:
+                break
+        return page_count, extracted
+
+def _extract_pdf(path: str, max_pages: int, max_chars: int) -> str:
+    _, pages = _extract_pdf_pages(path, None, max_chars, max_pages=max_pages)
+    return "\n".join(pages.values())
+
+def _extract_docx(path: str, max_chars: int) -> str:
+    import docx
+    doc = docx.Document(path)
+    parts = []
+    total = 0
+    for para in doc.paragraphs:
+        parts.append(para.text)
+        total += len(para.text) + 1
+        if total >= max_chars:
+            break
+    return "\n".join(parts)
+
+def _extract_text_file(path: str, max_chars: int) -> str:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        return f.read(max_chars)
+
+def _extract_path(path: str, max_pages: int, max_chars: int) -> str:
+    file_type = detect_file_type(path)
+    if file_type == "pdf":
+        text = _extract_pdf(path, max_pages, max_chars)
+    elif file_type == "docx":
+        text = _extract_docx(path, max_chars)
+    elif file_type == "text":
+        text = _extract_text_file(path, max_chars)
+    else:
+        raise UnsupportedFileType("Unsupported file type. Upload PDF, DOCX, or TXT.")
+    return text[:max_chars]
+
+# --- Process pool ---
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """
+    Lazily creates the shared, bounded extraction pool. Celery's prefork
+    children are daemonic and may not spawn processes of their own; they are
+    already isolated from the API, so they extract inline instead.
+    """
+    global _pool
+    if multiprocessing.current_process().daemon:
+        return None
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+    return _pool
+
+class _WorkerSlots:
+    """
+    One slot per pool worker. A job is handed to the pool only once it holds
+    a slot, so nothing sits in the executor's own queue: the timeout measures
+    parsing alone, and abandoning a job never cancels or kills extractions
+    that were merely queued behind it.
+    """
+
+    def __init__(self, size: int):
+        self._free = size
+        self._waiting = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def held(self):
+        """Blocks until a worker is free. For background callers, which wait their turn."""
+        with self._cond:
+            self._waiting += 1
+            try:
+                while self._free == 0:
+                    self._cond.wait()
+                self._free -= 1
+            finally:
+                self._waiting -= 1
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire_async(self, max_waiting: int):
+        """Waits for a worker without blocking the loop; raises ExtractionBusy if the wait is full."""
+        with self._cond:
+            if self._free > 0:
+                self._free -= 1
+                return
+            if self._waiting >= max_waiting:
+                raise ExtractionBusy("The server is busy extracting other files. Please try again shortly.")
+            self._waiting += 1
+        try:
+            while True:
+                await asyncio.sleep(SLOT_POLL_INTERVAL)
+                with self._cond:
+                    if self._free > 0:
+                        self._free -= 1
+                        return
+        finally:
+            with self._cond:
+                self._waiting -= 1
+
+    def release(self):
+        with self._cond:
+            self._free += 1
+            self._cond.notify()
+
+_slots = _WorkerSlots(EXTRACTION_WORKERS)
+
+def spool_to_tempfile(source) -> Tuple[str, str]:
+    """
+    Streams bytes or a binary file-like object to a temp file, hashing it on
+    the way. Returns (path, sha256 hex digest); the caller removes the file.
+    """
+    digest = hashlib.sha256()
+    fd, path = tempfile.mkstemp(prefix="extract-")
+    try:
+        with os.fdopen(fd, "wb") as out:
+            if isinstance(source, (bytes, bytearray, memoryview)):
+                digest.update(source)
+                out.write(source)
+            else:
+                while True:
+                    chunk = source.read(STREAM_CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    out.write(chunk)
+    except Exception:
+        os.remove(path)
+        raise
+    return path, digest.hexdigest()
+
+def sha256_file(path: str) -> str:
+    """Hashes a file on local disk through a memory map, without reading it into Python."""
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return hashlib.sha256().hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            return hashlib.sha256(mapped).hexdigest()
+
+def _recycle_pool(pool: ProcessPoolExecutor):
+    """
+    A running pool task cannot be cancelled, so a timed-out or abandoned
+    extraction takes its pool down with it: the workers are terminated and
+    the next call starts a fresh pool. Other extractions that were in flight
+    on the old pool are collateral and retried once on the new one (see
+    _recycled_under).
+    """
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+    for process in list((pool._processes or {}).values()):
+        process.terminate()
+    pool.shutdown(wait=False, cancel_futures=True)
+    logger.warning("Extraction pool recycled after a timed-out or cancelled extraction.")
+
+def _abandon(pool: ProcessPoolExecutor, future):
+    if not future.cancel():
+        _recycle_pool(pool)
+
+# How an extraction fails when another one recycled the pool under it
+_POOL_RECYCLED_ERRORS = (BrokenProcessPool, CancelledError, RuntimeError)
+
+def _recycled_under(pool: ProcessPoolExecutor, error: Exception) -> bool:
+    """True if `error` came from `pool` being recycled, not from this extraction."""
+    return isinstance(error, _POOL_RECYCLED_ERRORS) and _pool is not pool
+
+def _resolve_limits(max_pages, max_chars, timeout):
+    return (
+        max_pages or EXTRACTION_MAX_PAGES,
+        max_chars or EXTRACTION_MAX_CHARS,
+        timeout or EXTRACTION_TIMEOUT,
+    )
+
+def _run_in_pool(fn, args: tuple, timeout: float):
+    try:
+        if _get_pool() is None:
+            return fn(*args)
+        with _slots.held():
+            for attempt in (1, 2):
+                pool = _get_pool()
+                try:
+                    future = pool.submit(fn, *args)
+                    return future.result(timeout=timeout)
+                except FuturesTimeoutError:
+                    _abandon(pool, future)
+                    raise ExtractionError(f"Extraction timed out after {timeout}s")
+                except _POOL_RECYCLED_ERRORS as e:
+                    if attempt == 2 or not _recycled_under(pool, e):
+                        raise
+                    logger.info("Extraction interrupted by a pool recycle; retrying on the new pool.")
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Failed to extract text: {e}") from e
+
+def extract_spooled(
+    path: str,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> str:
+    """Extracts text from a file already on local disk using the extraction pool."""
+    max_pages, max_chars, timeout = _resolve_limits(max_pages, max_chars, timeout)
+    return _run_in_pool(_extract_path, (path, max_pages, max_chars), timeout)
+
+def extract_pdf_pages(
+    path: str,
+    page_numbers: Optional[Sequence[int]] = None,
+    max_chars: Optional[int] = None,
+    known_lengths: Optional[Dict[int, int]] = None,
+    timeout: Optional[float] = None
+) -> Tuple[int, Dict[int, str]]:
+    """
+    Budget-aware, page-level PDF extraction in the pool (see _extract_pdf_pages).
+    Only as many pages are parsed as it takes to fill max_chars.
+    """
+    _, max_chars, timeout = _resolve_limits(None, max_chars, timeout)
+    if page_numbers is not None:
+        page_numbers = list(page_numbers)[:EXTRACTION_MAX_PAGES]
+    return _run_in_pool(
+        _extract_pdf_pages, (path, page_numbers, max_chars, known_lengths, EXTRACTION_MAX_PAGES), timeout
+    )
+
+async def extract_spooled_async(
+    path: str,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    timeout: Optional[float] = None
+) -> str:
+    """
+    Event-loop friendly extract_spooled for async handlers. Parsing never
+    runs on the loop; if the request is cancelled or times out, the pool
+    work is cancelled too. When every worker is busy and
+    EXTRACTION_MAX_WAITING requests already wait, raises ExtractionBusy
+    instead of queueing.
+    """
+    max_pages, max_chars, timeout = _resolve_limits(max_pages, max_chars, timeout)
+    if _get_pool() is None:
+        try:
+            return await asyncio.wait_for(asyncio.to_thread(_extract_path, path, max_pages, max_chars), timeout)
+        except ExtractionError:
+            raise
+        except asyncio.TimeoutError:
+            raise ExtractionError(f"Extraction timed out after {timeout}s")
+        except Exception as e:
+            raise ExtractionError(f"Failed to extract text: {e}") from e
+
+    await _slots.acquire_async(EXTRACTION_MAX_WAITING)
+    try:
+        for attempt in (1, 2):
+            pool = _get_pool()
+            future = None
+            try:
+                future = pool.submit(_extract_path, path, max_pages, max_chars)
+                return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+            except asyncio.TimeoutError:
+                _abandon(pool, future)
+                raise ExtractionError(f"Extraction timed out after {timeout}s")
+            except asyncio.CancelledError:
+                if future is not None and not future.cancelled():
+                    # The request was cancelled, not the pool work
+                    _abandon(pool, future)
+                    raise
+                if attempt == 2 or not _recycled_under(pool, CancelledError()):
+                    raise
+                logger.info("Extraction interrupted by a pool recycle; retrying on the new pool.")
+            except _POOL_RECYCLED_ERRORS as e:
+                if attempt == 2 or not _recycled_under(pool, e):
+                    raise
+                logger.info("Extraction interrupted by a pool recycle; retrying on the new pool.")
+    except ExtractionError:
+        raise
+    except Exception as e:
+        raise ExtractionError(f"Failed to extract text: {e}") from e
+    finally:
+        _slots.release()
+
+def extract_text(source, **limits) -> str:
+    """
+    Extracts text from bytes or a binary stream (UploadFile.file, an HTTP
+    response, ...). The input is streamed to a temp file, its type is
+    detected from the content and parsing runs in the extraction pool.
+    Limits: max_pages, max_chars, timeout. Raises UnsupportedFileType or
+    ExtractionError.
+    """
+    path, _ = spool_to_tempfile(source)
+    try:
+        return extract_spooled(path, **limits)
+    finally:
+        os.remove(path)
+
+def extract_text_from_object(object_key: str, **limits) -> str:
+    """Streams an object out of storage and extracts its text."""
+    with open_object_stream(object_key) as stream:
+        return extract_text(stream, **limits)
@@ -0,0 +1,300 @@
+# --- Content-addressed cache of extracted text ---
+# Entries live in object storage under extracted-text/v<EXTRACTOR_VERSION>/<sha256>.txt,
+# so identical bytes (a re-uploaded syllabus, a material reused across quizzes)
+# are parsed once. Bumping EXTRACTOR_VERSION invalidates every entry.
+# PDFs read under a character budget get a per-page store instead
+# (<sha256>.pages.json) that fills up as later calls ask for other pages.
+#
+#   python -m app.core.extraction_cache stats
+#   python -m app.core.extraction_cache purge [--all]
+import argparse
+import asyncio
+import json
+import logging
+import os
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+from prometheus_client import Counter
+
+from .extraction import (
+    EXTRACTOR_VERSION, EXTRACTION_MAX_CHARS, EXTRACTION_MAX_PAGES,
+    detect_file_type, extract_pdf_pages, extract_spooled, extract_spooled_async,
+    sha256_file, spool_to_tempfile
+)
+from .storage import (
+    delete_object, get_object_bytes, get_object_sha256, list_objects,
+    local_object_path, open_object_stream, put_object_bytes, set_object_sha256
+)
+from .tracing import record_cache, registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_PREFIX = "extracted-text/"
+
+# Served on /metrics; record_cache also attributes hits and misses to the current span
+CACHE_EVENTS = Counter(
+    "extraction_cache_events_total", "Extracted-text cache lookups and writes (hit, miss, store, error)",
+    ["event"], registry=registry
+)
+
+def _count(event: str):
+    CACHE_EVENTS.labels(event).inc()
+
+def cache_key(digest: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    key = f"{CACHE_PREFIX}v{EXTRACTOR_VERSION}/{digest}"
+    # Non-default limits produce different text, so they get their own entry
+    if (max_pages or EXTRACTION_MAX_PAGES) != EXTRACTION_MAX_PAGES or (max_chars or EXTRACTION_MAX_CHARS) != EXTRACTION_MAX_CHARS:
+        key += f".p{max_pages or EXTRACTION_MAX_PAGES}.c{max_chars or EXTRACTION_MAX_CHARS}"
+    return key + ".txt"
+
+def _read_cached(key: str) -> Optional[str]:
+    try:
+        data = get_object_bytes(key)
+    except Exception as e:
+        logger.warning(f"Extraction cache read failed for {key}: {e}")
+        _count("error")
+        return None
+    return data.decode("utf-8") if data is not None else None
+
+def _store(key: str, text: str):
+    try:
+        put_object_bytes(key, text.encode("utf-8"), content_type="text/plain; charset=utf-8")
+        _count("store")
+    except Exception as e:
+        # Caching is best effort, the caller already has the text
+        logger.warning(f"Extraction cache write failed for {key}: {e}")
+        _count("error")
+
+def _extract_file_cached(path: str, digest: str, max_pages: Optional[int] = None, max_chars: Optional[int] = None, timeout=None) -> str:
+    key = cache_key(digest, max_pages, max_chars)
+    cached = _read_cached(key)
+    if cached is not None:
+        _count("hit"); record_cache(hit=True)
+        return cached
+
+    _count("miss"); record_cache(hit=False)
+    text = extract_spooled(path, max_pages=max_pages, max_chars=max_chars, timeout=timeout)
+    _store(key, text)
+    return text
+
+def _extract_with_digest(source, max_pages: Optional[int] = None, max_chars: Optional[int] = None, timeout=None):
+    path, digest = spool_to_tempfile(source)
+    try:
+        return _extract_file_cached(path, digest, max_pages, max_chars, timeout), digest
+    finally:
+        os.remove(path)
+
+def extract_text_cached(source, max_pages: Optional[int] = None, max_chars: Optional[int] = None, timeout=None) -> str:
+    """Like extraction.extract_text, but returns cached text for bytes seen before."""
+    text, _ = _extract_with_digest(source, max_pages, max_chars, timeout)
+    return text
+
+async def extract_text_cached_async(source, max_pages: Optional[int] = None, max_chars: Optional[int] = None, timeout=None) -> str:
+    """extract_text_cached for async handlers: spooling and storage I/O run in threads, parsing in the pool."""
+    path, digest = await asyncio.to_thread(spool_to_tempfile, source)
+    try:
+        key = cache_key(digest, max_pages, max_chars)
+        cached = await asyncio.to_thread(_read_cached, key)
+        if cached is not None:
+            _count("hit"); record_cache(hit=True)
+            return cached
+
+        _count("miss"); record_cache(hit=False)
+        text = await extract_spooled_async(path, max_pages=max_pages, max_chars=max_chars, timeout=timeout)
+        await asyncio.to_thread(_store, key, text)
+        return text
+    finally:
+        os.remove(path)
+
+@contextmanager
+def _object_file(object_key: str) -> Iterator[Tuple[str, str]]:
+    """Yields (path, sha256) for a stored object, spooling it only if storage is remote."""
+    path = local_object_path(object_key)
+    if path:
+        # Local storage: hash and parse the stored file in place, no temp copy
+        yield path, sha256_file(path)
+        return
+    with open_object_stream(object_key) as stream:
+        path, digest = spool_to_tempfile(stream)
+    try:
+        yield path, digest
+    finally:
+        os.remove(path)
+
+def _lookup_sha256(object_key: str) -> Optional[str]:
+    try:
+        return get_object_sha256(object_key)
+    except Exception as e:
+        logger.warning(f"Could not stat {object_key}: {e}")
+        return None
+
+def _record_sha256(object_key: str, digest: str):
+    # Objects uploaded straight to storage carry no hash yet; record it so
+    # the next lookup skips the download
+    try:
+        set_object_sha256(object_key, digest)
+    except Exception as e:
+        logger.warning(f"Could not record sha256 for {object_key}: {e}")
+
+def extract_object_text_cached(object_key: str, **limits) -> str:
+    """
+    Extracts a stored object's text. Objects uploaded with a recorded SHA-256
+    are served with one small read of the cache entry, without downloading
+    the original.
+    """
+    digest = _lookup_sha256(object_key)
+    if digest:
+        cached = _read_cached(cache_key(digest, limits.get("max_pages"), limits.get("max_chars")))
+        if cached is not None:
+            _count("hit"); record_cache(hit=True)
+            return cached
+
+    with _object_file(object_key) as (path, digest_read):
+        text = _extract_file_cached(path, digest_read, **limits)
+    if not digest:
+        _record_sha256(object_key, digest_read)
+    return text
+
+# --- Page-level store (budgeted PDF reads) ---
+def page_store_key(digest: str) -> str:
+    return f"{CACHE_PREFIX}v{EXTRACTOR_VERSION}/{digest}.pages.json"
+
+def _read_page_store(digest: str) -> Optional[dict]:
+    raw = _read_cached(page_store_key(digest))
+    if raw is None:
+        return None
+    try:
+        store = json.loads(raw)
+        return {"page_count": store["page_count"], "pages": {int(n): t for n, t in store["pages"].items()}}
+    except (ValueError, KeyError, AttributeError) as e:
+        logger.warning(f"Ignoring corrupt page store for {digest}: {e}")
+        return None
+
+def _wanted_pages(page_count: int, pages: Optional[Sequence[int]]) -> List[int]:
+    if pages is None:
+        return list(range(min(page_count, EXTRACTION_MAX_PAGES)))
+    return [n for n in pages if n < page_count][:EXTRACTION_MAX_PAGES]
+
+def _assemble(store: dict, pages: Optional[Sequence[int]], max_chars: int) -> Optional[str]:
+    """
+    Joins the wanted pages in order until max_chars is reached. Returns None
+    if a page needed to fill the budget has not been extracted yet.
+    """
+    parts, total = [], 0
+    for n in _wanted_pages(store["page_count"], pages):
+        text = store["pages"].get(n)
+        if text is None:
+            return None
+        parts.append(text)
+        total += len(text) + 1
+        if total >= max_chars:
+            break
+    return "\n".join(parts)[:max_chars]
+
+def extract_object_pages_cached(
+    object_key: str,
+    pages: Optional[Sequence[int]] = None,
+    max_chars: Optional[int] = None,
+    timeout=None
+) -> str:
+    """
+    Extracts up to max_chars of a stored object's text, reading a PDF page by
+    page (only the 0-based `pages`, if given) and stopping once the budget is
+    met. Extracted pages are kept in the page store, so a later call for more
+    text or other pages only parses what is still missing. Other file types
+    go through the regular whole-file cache.
+    """
+    max_chars = max_chars or EXTRACTION_MAX_CHARS
+    digest = _lookup_sha256(object_key)
+    store = _read_page_store(digest) if digest else None
+    if store is not None:
+        text = _assemble(store, pages, max_chars)
+        if text is not None:
+            _count("hit"); record_cache(hit=True)
+            return text
+
+    with _object_file(object_key) as (path, digest_read):
+        if not digest:
+            _record_sha256(object_key, digest_read)
+        if detect_file_type(path) != "pdf":
+            if pages is not None:
+                logger.info(f"Ignoring page ranges for non-PDF object {object_key}.")
+            return _extract_file_cached(path, digest_read, max_chars=max_chars, timeout=timeout)
+
+        if store is None and digest != digest_read:
+            store = _read_page_store(digest_read)
+            if store is not None:
+                text = _assemble(store, pages, max_chars)
+                if text is not None:
+                    _count("hit"); record_cache(hit=True)
+                    return text
+
+        _count("miss"); record_cache(hit=False)
+        known: Dict[int, str] = store["pages"] if store else {}
+        if store is not None:
+            # Known page count: skip pages past the end before touching the file
+            pages = _wanted_pages(store["page_count"], pages)
+        page_count, extracted = extract_pdf_pages(
+            path, pages, max_chars,
+            known_lengths={n: len(t) for n, t in known.items()},
+            timeout=timeout
+        )
+
+    store = {"page_count": page_count, "pages": {**known, **extracted}}
+    if extracted:
+        _store(page_store_key(digest_read), json.dumps({
+            "page_count": page_count,
+            "pages": {str(n): t for n, t in sorted(store["pages"].items())}
+        }))
+    logger.info(
+        f"Extracted {len(extracted)} new page(s) of {page_count} from {object_key} "
+        f"({len(known)} already cached)."
+    )
+    return _assemble(store, pages, max_chars) or ""
+
+# --- Statistics & maintenance ---
+def cache_stats() -> dict:
+    """
+    Entry counts and sizes per extractor version. Hit, miss, store and error
+    counts are on /metrics (extraction_cache_events_total), summed over every
+    API and worker process.
+    """
+    versions = {}
+    for key, size in list_objects(CACHE_PREFIX):
+        version = key[len(CACHE_PREFIX):].split("/", 1)[0]
+        entry = versions.setdefault(version, {"objects": 0, "bytes": 0})
+        entry["objects"] += 1
+        entry["bytes"] += size or 0
+    return {"extractor_version": EXTRACTOR_VERSION, "storage": versions}
+
+def purge_cache(all_versions: bool = False) -> int:
+    """Deletes stale entries (older extractor versions), or everything with all_versions."""
+    current = f"{CACHE_PREFIX}v{EXTRACTOR_VERSION}/"
+    removed = 0
+    for key, _ in list(list_objects(CACHE_PREFIX)):
+        if all_versions or not key.startswith(current):
+            delete_object(key)
+            removed += 1
+    logger.info(f"Extraction cache purge removed {removed} object(s).")
+    return removed
+
+def main():
+    parser = argparse.ArgumentParser(description="Extracted-text cache maintenance")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("stats", help="Show entry counts and sizes per extractor version")
+    purge = sub.add_parser("purge", help="Delete entries from older extractor versions")
+    purge.add_argument("--all", action="store_true", help="Delete every entry, including the current version")
+    args = parser.parse_args()
+
+    if args.command == "stats":
+        stats = cache_stats()
+        for version, entry in sorted(stats["storage"].items()):
+            current = " (current)" if version == f"v{stats['extractor_version']}" else ""
+            print(f"{version}{current}: {entry['objects']} object(s), {entry['bytes']} bytes")
+        print("Hit/miss/store/error counts: extraction_cache_events_total on /metrics.")
+    else:
+        print(f"Removed {purge_cache(all_versions=args.all)} object(s).")
+
+if __name__ == "__main__":
+    main()
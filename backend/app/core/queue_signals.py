@@ -0,0 +1,234 @@
+# --- Queue signals (for admission control and worker autoscaling) ---
+# Per queue, computed on demand:
+#
+#   depth                    messages waiting (LLEN on the broker's Redis list;
+#                            with TASK_BACKEND=local, tasks waiting for a thread)
+#   oldest_age_seconds       age of the next message to be consumed (its
+#                            published_at header, set in task_metrics.py)
+#   throughput_per_second    tasks finished per second over the last
+#                            THROUGHPUT_WINDOW seconds, across all workers
+#   avg_runtime_seconds      mean run time of those tasks
+#   projected_drain_seconds  depth / throughput: when the backlog is gone at
+#                            the current rate (new arrivals not included)
+#   required_concurrency     task slots that would drain the current backlog
+#                            within the queue's drain_sla (celery_worker.py)
+#
+# Completions are counted by task_metrics.py into THROUGHPUT_BUCKET-second
+# buckets in Redis (in memory for the local backend), so every worker's
+# tasks show up here no matter which process serves the request.
+# Exposed as JSON on /ops/queues and as gauges on /metrics (both need the
+# OPS_TOKEN bearer token, see auth.require_ops_token); read by
+# scripts/autoscaler.py.
+import json
+import logging
+import math
+import os
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Dict, Optional
+
+import redis
+from prometheus_client import CollectorRegistry, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+from ..celery_worker import QUEUE_PROFILES, TASK_ROUTES
+from .dispatch import get_local_executor, is_local
+from .task_dedupe import get_redis
+
+logger = logging.getLogger(__name__)
+
+THROUGHPUT_WINDOW = int(os.environ.get("QUEUE_THROUGHPUT_WINDOW_SECONDS", "300"))
+THROUGHPUT_BUCKET = 10
+KEY_PREFIX = "queue-stats:"
+
+def queue_for_task(task_name: str) -> str:
+    return TASK_ROUTES.get(task_name, "default")
+
+# --- Depth and oldest message ---
+
+def _local_waiting() -> Dict[str, tuple]:
+    waiting = {queue: (0, None) for queue in QUEUE_PROFILES}
+    for task_name, (count, oldest) in get_local_executor().waiting_by_task().items():
+        queue = queue_for_task(task_name)
+        total, queue_oldest = waiting[queue]
+        waiting[queue] = (total + count, oldest if queue_oldest is None else min(queue_oldest, oldest))
+    return waiting
+
+def queue_depths() -> Dict[str, int]:
+    """Messages waiting per queue; queues that could not be read are left out."""
+    if is_local():
+        return {queue: count for queue, (count, _) in _local_waiting().items()}
+    client = get_redis()
+    if client is None:
+        return {}
+    try:
+        # Kombu's Redis transport keeps each queue as a list named after it
+        pipe = client.pipeline()
+        for queue in QUEUE_PROFILES:
+            pipe.llen(queue)
+        return dict(zip(QUEUE_PROFILES, pipe.execute()))
+    except redis.RedisError as e:
+        logger.warning(f"Could not read queue depths: {e}")
+        return {}
+
+def _published_at(raw: Optional[bytes]) -> Optional[float]:
+    if not raw:
+        return None
+    try:
+        published_at = json.loads(raw)["headers"].get("published_at")
+        return float(published_at) if published_at is not None else None
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return None
+
+def oldest_message_ages() -> Dict[str, Optional[float]]:
+    """Seconds the next message of each queue has waited (None when empty or unknown)."""
+    now = time.time()
+    if is_local():
+        return {
+            queue: (now - oldest if oldest is not None else None)
+            for queue, (_, oldest) in _local_waiting().items()
+        }
+    client = get_redis()
+    if client is None:
+        return {}
+    try:
+        # Producers LPUSH and workers BRPOP, so the oldest message is the last element
+        pipe = client.pipeline()
+        for queue in QUEUE_PROFILES:
+            pipe.lindex(queue, -1)
+        heads = pipe.execute()
+    except redis.RedisError as e:
+        logger.warning(f"Could not read oldest queue messages: {e}")
+        return {}
+    ages = {}
+    for queue, raw in zip(QUEUE_PROFILES, heads):
+        published_at = _published_at(raw)
+        ages[queue] = max(0.0, now - published_at) if published_at is not None else None
+    return ages
+
+# --- Throughput ---
+
+_local_completions = defaultdict(deque)  # queue -> (finished at, runtime)
+_local_lock = threading.Lock()
+
+def record_completion(task_name: str, runtime: float):
+    """Counts one finished task towards its queue's throughput. Never raises."""
+    queue = queue_for_task(task_name)
+    now = time.time()
+    if is_local():
+        with _local_lock:
+            completions = _local_completions[queue]
+            completions.append((now, runtime))
+            while completions and completions[0][0] < now - THROUGHPUT_WINDOW:
+                completions.popleft()
+        return
+    client = get_redis()
+    if client is None:
+        return
+    key = f"{KEY_PREFIX}{queue}:{int(now // THROUGHPUT_BUCKET)}"
+    try:
+        pipe = client.pipeline()
+        pipe.hincrby(key, "done", 1)
+        pipe.hincrbyfloat(key, "runtime", runtime)
+        pipe.expire(key, THROUGHPUT_WINDOW + THROUGHPUT_BUCKET)
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.debug(f"Could not record completion for {queue}: {e}")
+
+def throughput() -> Dict[str, tuple]:
+    """Per queue: (tasks finished per second, mean runtime or None) over THROUGHPUT_WINDOW."""
+    now = time.time()
+    if is_local():
+        with _local_lock:
+            recent = {
+                queue: [runtime for finished, runtime in _local_completions[queue] if finished >= now - THROUGHPUT_WINDOW]
+                for queue in QUEUE_PROFILES
+            }
+        return {
+            queue: (len(runtimes) / THROUGHPUT_WINDOW, sum(runtimes) / len(runtimes) if runtimes else None)
+            for queue, runtimes in recent.items()
+        }
+    client = get_redis()
+    if client is None:
+        return {}
+    current = int(now // THROUGHPUT_BUCKET)
+    buckets = range(current - THROUGHPUT_WINDOW // THROUGHPUT_BUCKET + 1, current + 1)
+    try:
+        pipe = client.pipeline()
+        for queue in QUEUE_PROFILES:
+            for bucket in buckets:
+                pipe.hmget(f"{KEY_PREFIX}{queue}:{bucket}", "done", "runtime")
+        rows = iter(pipe.execute())
+    except redis.RedisError as e:
+        logger.warning(f"Could not read queue throughput: {e}")
+        return {}
+    rates = {}
+    for queue in QUEUE_PROFILES:
+        done, runtime = 0, 0.0
+        for _ in buckets:
+            bucket_done, bucket_runtime = next(rows)
+            done += int(bucket_done or 0)
+            runtime += float(bucket_runtime or 0)
+        rates[queue] = (done / THROUGHPUT_WINDOW, runtime / done if done else None)
+    return rates
+
+# --- Combined ---
+
+def queue_signals() -> Dict[str, dict]:
+    """Every signal for every queue (see the module comment)."""
+    depths, ages, rates = queue_depths(), oldest_message_ages(), throughput()
+    signals = {}
+    for queue, profile in QUEUE_PROFILES.items():
+        depth = depths.get(queue)
+        rate, avg_runtime = rates.get(queue, (None, None))
+        sla = profile["drain_sla"]
+        if depth is None:
+            drain = None
+        elif depth == 0:
+            drain = 0.0
+        else:
+            drain = depth / rate if rate else None  # Nothing finishing: unknown
+        required = None
+        if depth == 0:
+            required = 0
+        elif depth is not None and avg_runtime is not None:
+            required = math.ceil(depth * avg_runtime / sla)
+        signals[queue] = {
+            "depth": depth,
+            "oldest_age_seconds": ages.get(queue),
+            "throughput_per_second": rate,
+            "avg_runtime_seconds": avg_runtime,
+            "projected_drain_seconds": drain,
+            "drain_sla_seconds": sla,
+            "required_concurrency": required,
+        }
+    return signals
+
+class QueueSignalsCollector:
+    """Reads the signals at scrape time; they describe the whole system, not this process."""
+
+    _GAUGES = {
+        "depth": ("celery_queue_depth", "Messages waiting in the queue"),
+        "oldest_age_seconds": ("celery_queue_oldest_message_age_seconds", "Age of the next message to be consumed"),
+        "throughput_per_second": ("celery_queue_throughput_per_second", "Tasks finished per second, recent window"),
+        "avg_runtime_seconds": ("celery_queue_avg_runtime_seconds", "Mean task run time, recent window"),
+        "projected_drain_seconds": ("celery_queue_projected_drain_seconds", "Backlog / throughput"),
+        "drain_sla_seconds": ("celery_queue_drain_sla_seconds", "Target time to drain a backlog"),
+        "required_concurrency": ("celery_queue_required_concurrency", "Task slots needed to drain within the SLA"),
+    }
+
+    def collect(self):
+        signals = queue_signals()
+        for field, (name, documentation) in self._GAUGES.items():
+            gauge = GaugeMetricFamily(name, documentation, labels=["queue"])
+            for queue, values in signals.items():
+                if values[field] is not None:
+                    gauge.add_metric([queue], values[field])
+            yield gauge
+
+signals_registry = CollectorRegistry()
+signals_registry.register(QueueSignalsCollector())
+
+def export_queue_signals() -> bytes:
+    return generate_latest(signals_registry)
@@ -1,129 +1,287 @@
-from minio import Minio
-from minio.error import S3Error
 from datetime import timedelta
-from urllib.parse import urlparse
+from collections import OrderedDict
 import logging
 import io
+import hashlib
 import os
+import tempfile
+import threading
+import time
+from typing import NamedTuple, Optional
 
-# --- THIS IS YOUR MINIO CONFIG ---
-MINIO_ENDPOINT = "127.0.0.1:9000"
-MINIO_ACCESS_KEY = "minioadmin"
-MINIO_SECRET_KEY = "minioadmin"
-MINIO_BUCKET = "lms-uploads"
+from .storage_backends import StorageBackend, create_backend
+
+# --- Storage config ---
+# "minio" (default) or "local" (files under LOCAL_STORAGE_ROOT, see storage_backends.py)
+STORAGE_BACKEND = os.environ.get("STORAGE_BACKEND", "minio")
+MAX_UPLOAD_SIZE = int(os.environ.get("MAX_UPLOAD_SIZE", str(50 * 1024 * 1024)))
+STREAM_CHUNK_SIZE = 64 * 1024
 
 
 logger = logging.getLogger(__name__)
-# Initialize MinIO client
-try:
-    minio_client = Minio(
-        MINIO_ENDPOINT,
-        access_key=MINIO_ACCESS_KEY,
-        secret_key=MINIO_SECRET_KEY,
-        secure=False # Set to True if using HTTPS
-    )
-
-except S3Error as exc:
-    print("Error connecting to MinIO:", exc)
-    minio_client = None
-
-def check_minio_bucket():
-    """
-    Checks if the MinIO bucket exists and creates it if not.
+storage_backend: StorageBackend = create_backend(STORAGE_BACKEND)
+
+def check_storage():
+    """
+    Prepares the configured backend (creates the bucket or directories).
     This should be called during app startup, not on import.
     """
-    if minio_client is None:
-        print("MinIO client not initialized. Cannot check bucket.")
-        return
-        
-    try:
-        found = minio_client.bucket_exists(MINIO_BUCKET)
-        if not found:
-            minio_client.make_bucket(MINIO_BUCKET)
-            print(f"Bucket '{MINIO_BUCKET}' created.")
-        else:
-            print(f"Bucket '{MINIO_BUCKET}' already exists.")
-    except Exception as e:
-        print(f"Error connecting to MinIO during bucket check: {e}")
+    storage_backend.ensure_ready()
+
+class UploadTooLarge(Exception):
+    """The upload exceeded MAX_UPLOAD_SIZE."""
+
+class _LimitedReader:
+    """
+    Wraps a file-like object for streaming uploads: counts and hashes what
+    passes through and aborts once more than `max_size` bytes were read.
+    """
+
+    def __init__(self, file_obj, max_size: int):
+        self._file_obj = file_obj
+        self._max_size = max_size
+        self.size = 0
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._file_obj.read(size)
+        self.size += len(chunk)
+        if self.size > self._max_size:
+            raise UploadTooLarge(f"Upload exceeds the maximum size of {self._max_size} bytes.")
+        self.sha256.update(chunk)
+        return chunk
+
+def _prehash(file_obj, max_size: int):
+    """Hashes a seekable input in place (no copy) and rewinds it. Returns (sha256, size)."""
+    start = file_obj.tell()
+    reader = _LimitedReader(file_obj, max_size)
+    while reader.read(STREAM_CHUNK_SIZE):
+        pass
+    file_obj.seek(start)
+    return reader.sha256.hexdigest(), reader.size
 
-def upload_file_to_storage(file_obj, file_name: str, content_type: str) -> str:
+def upload_file_to_storage(file_obj, file_name: str, content_type: str, max_size: int = None, sha256: str = None) -> str:
     """
-    Uploads a file-like object to MinIO and returns the OBJECT KEY (file_name).
+    Uploads a file-like object to storage and returns the OBJECT KEY (file_name).
+    The object is streamed (multipart on MinIO, a temp file on disk locally),
+    so peak memory does not grow with the file size. Pass `sha256` if the
+    caller already hashed the input.
     """
-    if minio_client is None:
-        raise Exception("MinIO client not initialized.")
+    max_size = max_size or MAX_UPLOAD_SIZE
     
     try:
-        file_data = file_obj.read()
-        minio_client.put_object(
-            MINIO_BUCKET,
-            file_name,
-            io.BytesIO(file_data),
-            length=len(file_data),
-            content_type=content_type
-        )
+        metadata = {"sha256": sha256} if sha256 else None
+        seekable = getattr(file_obj, "seekable", lambda: False)()
+        if seekable and not sha256:
+            # Spooled uploads can be hashed up front so the digest travels as object
+            # metadata; this also rejects oversized files before any bytes are sent.
+            digest, _ = _prehash(file_obj, max_size)
+            # Lets content-addressed caches find this object's hash without downloading it
+            metadata = {"sha256": digest}
+
+        storage_backend.put_object(file_name, _LimitedReader(file_obj, max_size), content_type, metadata)
         # --- CHANGED ---
         # Do NOT return a presigned URL. Return the permanent key.
         return file_name 
+    except UploadTooLarge:
+        raise
     except Exception as e:
-        logger.error(f"MinIO upload failed: {e}", exc_info=True)
+        logger.error(f"Storage upload failed: {e}", exc_info=True)
         raise
 
-def get_presigned_url_for_key(file_name: str, expires_in=timedelta(hours=1)) -> str:
+# --- Content-addressed objects ---
+# Uploads are stored once per distinct content under objects/sha256/<hash>.<ext>;
+# re-uploading the same bytes maps to the existing object. The DB tracks who
+# references each object (models.StoredObject) and scripts/gc_storage.py
+# removes the ones nobody does.
+CONTENT_PREFIX = "objects/sha256/"
+
+class StoredUpload(NamedTuple):
+    key: str
+    sha256: str
+    size: int
+    deduplicated: bool # True if the object already existed and nothing was written
+
+def content_key(digest: str, extension: str) -> str:
+    extension = extension.lower().strip(".")
+    return f"{CONTENT_PREFIX}{digest}.{extension}" if extension else f"{CONTENT_PREFIX}{digest}"
+
+def store_content_addressed(file_obj, extension: str, content_type: str, max_size: int = None) -> StoredUpload:
     """
-    Generates a new presigned URL for a given object key.
-    Handles cases where the input is a full URL from old data.
+    Hashes the upload while streaming it and stores it under its content key,
+    unless an object with the same bytes is already there.
     """
-    if minio_client is None:
-        raise Exception("MinIO client not initialized.")
-    
-    key_to_use = file_name
-    
-    # --- UPDATED FIX ---
-    # Check if the file_name is a full URL (from old DB data)
-    if file_name and file_name.startswith("http"):
+    max_size = max_size or MAX_UPLOAD_SIZE
+    spool = None
+    if not getattr(file_obj, "seekable", lambda: False)():
+        # The key depends on the hash, so one-shot streams are spooled first
+        spool = tempfile.SpooledTemporaryFile(max_size=STREAM_CHUNK_SIZE * 16)
+        reader = _LimitedReader(file_obj, max_size)
+        while True:
+            chunk = reader.read(STREAM_CHUNK_SIZE)
+            if not chunk:
+                break
+            spool.write(chunk)
+        spool.seek(0)
+        file_obj = spool
+    try:
+        digest, size = _prehash(file_obj, max_size)
+        key = content_key(digest, extension)
+        if storage_backend.stat(key) is not None:
+            logger.info(f"Upload deduplicated to existing object {key}.")
+            return StoredUpload(key, digest, size, True)
+        upload_file_to_storage(file_obj, key, content_type, max_size, sha256=digest)
+        return StoredUpload(key, digest, size, False)
+    finally:
+        if spool is not None:
+            spool.close()
+
+def put_object_bytes(file_name: str, data: bytes, content_type: str = "application/octet-stream") -> str:
+    """
+    Stores a small in-memory payload (indexes, caches) under the given key.
+    """
+    return upload_file_to_storage(io.BytesIO(data), file_name, content_type)
+
+def open_object_stream(file_name: str):
+    """
+    Context manager yielding a file-like, streaming view of an object
+    (supports .read(n)). The connection or file is released when the block exits.
+    """
+    return storage_backend.open_stream(file_name)
+
+def get_object_bytes(file_name: str) -> Optional[bytes]:
+    """
+    Reads a whole object into memory. Returns None if the key does not exist.
+    """
+    return storage_backend.get_bytes(file_name)
+
+def local_object_path(file_name: str):
+    """
+    Path of the object on local disk when the backend keeps one (the local
+    backend), else None. Extractors can then read the file in place.
+    """
+    return storage_backend.local_path(file_name)
+
+def get_object_sha256(file_name: str):
+    """Returns the SHA-256 recorded at upload time, or None for older objects."""
+    info = storage_backend.stat(file_name)
+    return info.metadata.get("sha256") if info else None
+
+def list_objects(prefix: str):
+    """Yields (key, size) for every object under a prefix."""
+    return storage_backend.list_objects(prefix)
+
+def delete_object(file_name: str):
+    storage_backend.delete(file_name)
+
+def copy_object(source_name: str, file_name: str):
+    storage_backend.copy(source_name, file_name)
+
+def get_object_info(file_name: str):
+    """Returns (size, content_type) for an object, or None if the key does not exist."""
+    info = storage_backend.stat(file_name)
+    return (info.size, info.content_type) if info else None
+
+def read_object_head(file_name: str, length: int) -> bytes:
+    """Reads only the first `length` bytes of an object (e.g. to sniff its type)."""
+    return storage_backend.read_range(file_name, 0, length)
+
+def set_object_sha256(file_name: str, digest: str):
+    """
+    Records a SHA-256 on an object that was stored without one (presigned
+    uploads, older objects).
+    """
+    info = storage_backend.stat(file_name)
+    if info is None:
+        raise FileNotFoundError(file_name)
+    storage_backend.set_metadata(file_name, {**info.metadata, "sha256": digest})
+
+def get_presigned_put_url(file_name: str, expires_in=timedelta(minutes=15)) -> str:
+    """
+    Generates a presigned PUT URL so a client can upload an object straight
+    to storage without the bytes passing through the API.
+    """
+    return storage_backend.presigned_put_url(file_name, expires_in)
+
+# --- Presigned download URLs ---
+# A URL is reused while it still has PRESIGNED_URL_MIN_REMAINING to live, so
+# repeated page loads skip re-signing and the browser sees a stable URL it can cache.
+PRESIGNED_URL_TTL = timedelta(seconds=int(os.environ.get("PRESIGNED_URL_TTL_SECONDS", "3600")))
+PRESIGNED_URL_MIN_REMAINING = timedelta(seconds=int(os.environ.get("PRESIGNED_URL_MIN_REMAINING_SECONDS", "900")))
+PRESIGNED_URL_CACHE_SIZE = int(os.environ.get("PRESIGNED_URL_CACHE_SIZE", "10000"))
+
+_presigned_urls: "OrderedDict[str, tuple]" = OrderedDict() # key -> (url, expires_at monotonic)
+_presigned_lock = threading.Lock()
+
+def _cached_presigned_urls(file_names, now: float) -> dict:
+    """The cached URLs among `file_names` that still have long enough to live; one lock for all."""
+    urls = {}
+    with _presigned_lock:
+        for file_name in file_names:
+            entry = _presigned_urls.get(file_name)
+            if entry is None:
+                continue
+            url, expires_at = entry
+            if expires_at - now < PRESIGNED_URL_MIN_REMAINING.total_seconds():
+                del _presigned_urls[file_name]
+                continue
+            _presigned_urls.move_to_end(file_name)
+            urls[file_name] = url
+    return urls
+
+def _remember_presigned_urls(urls: dict, expires_at: float):
+    with _presigned_lock:
+        for file_name, url in urls.items():
+            _presigned_urls[file_name] = (url, expires_at)
+            _presigned_urls.move_to_end(file_name)
+        while len(_presigned_urls) > PRESIGNED_URL_CACHE_SIZE:
+            _presigned_urls.popitem(last=False)
+
+def _check_is_key(file_name: str):
+    if file_name.startswith(("http://", "https://")):
+        # Legacy rows stored whole URLs; scripts/normalize_storage_keys.py rewrites them
+        raise ValueError(f"Expected an object key, got a URL: {file_name[:80]}")
+
+def get_presigned_url_for_key(file_name: str, expires_in: timedelta = None) -> str:
+    """
+    Returns a presigned GET URL for an object key. URLs with the default
+    lifetime come from the cache; an explicit `expires_in` always signs anew.
+    """
+    _check_is_key(file_name)
+    if expires_in is not None:
+        return storage_backend.presigned_get_url(file_name, expires_in)
+
+    now = time.monotonic()
+    url = _cached_presigned_urls([file_name], now).get(file_name)
+    if url is None:
         try:
-            # We expect a URL like: http://.../BUCKET_NAME/OBJECT_KEY?query...
-            # The error shows the path includes the bucket name.
-            bucket_search_string = f"/{MINIO_BUCKET}/"
-            
-            if bucket_search_string in file_name:
-                # Get everything *after* the bucket name
-                key_with_query = file_name.split(bucket_search_string, 1)[1]
-                
-                # Strip off any query parameters (like ?X-Amz-Algorithm=...)
-                key_to_use = key_with_query.split("?", 1)[0]
-                
-                logger.info(f"Converted full URL to object key: {key_to_use}")
-            else:
-                # Fallback logic if the bucket name isn't in the path
-                parsed_url = urlparse(file_name)
-                key_to_use = parsed_url.path.lstrip("/")
-                logger.warning(f"Converted URL (no bucket in path) to key: {key_to_use}")
-                
+            url = storage_backend.presigned_get_url(file_name, PRESIGNED_URL_TTL)
         except Exception as e:
-            logger.error(f"Failed to parse old URL {file_name}: {e}", exc_info=True)
-            # Fallback to original name, which will fail but log the error
-            key_to_use = file_name
-    # --- END OF FIX ---
-    
-    try:
-        # Generate presigned URL using the (potentially cleaned) key
-        presigned_url = minio_client.presigned_get_object(
-            MINIO_BUCKET,
-            key_to_use, 
-            expires=expires_in
-        )
-        return presigned_url
-    except S3Error as e:
-        logger.error(
-            f"MinIO S3Error generating URL for key '{key_to_use}'. Original input was '{file_name}'. Error: {e}", 
-            exc_info=True
-        )
-        # Add a clearer exception if parsing failed
-        if key_to_use.startswith("http"):
-             raise Exception(f"CRITICAL: Failed to parse object key from old URL. Key was: {key_to_use}")
-        raise
-    except Exception as e:
-        logger.error(f"MinIO URL generation failed for key '{key_to_use}': {e}", exc_info=True)
-        raise
\ No newline at end of file
+            logger.error(f"URL generation failed for key '{file_name}': {e}", exc_info=True)
+            raise
+        _remember_presigned_urls({file_name: url}, now + PRESIGNED_URL_TTL.total_seconds())
+    return url
+
+def get_presigned_urls_for_keys(file_names) -> dict:
+    """
+    Presigned GET URLs for many keys (duplicates and empty values are
+    skipped): the cache is checked for all of them under one lock and only
+    the misses are signed. Returns {key: url}; keys that could not be signed
+    are left out and logged.
+    """
+    now = time.monotonic()
+    file_names = list(dict.fromkeys(k for k in file_names if k))
+    urls = _cached_presigned_urls(file_names, now)
+    signed = {}
+    for file_name in file_names:
+        if file_name in urls:
+            continue
+        try:
+            _check_is_key(file_name)
+            signed[file_name] = storage_backend.presigned_get_url(file_name, PRESIGNED_URL_TTL)
+        except Exception as e:
+            logger.error(f"Failed to generate URL for key '{file_name}': {e}")
+    if signed:
+        _remember_presigned_urls(signed, now + PRESIGNED_URL_TTL.total_seconds())
+        urls.update(signed)
+    return urls
\ No newline at end of file
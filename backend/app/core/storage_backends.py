@@ -0,0 +1,393 @@
+from abc import ABC, abstractmethod
+from minio import Minio
+from minio.commonconfig import CopySource, REPLACE
+from minio.error import S3Error
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, NamedTuple, Optional, Tuple
+from urllib.parse import quote
+import hashlib
+import hmac
+import json
+import logging
+import mmap
+import os
+import secrets
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# --- THIS IS YOUR MINIO CONFIG ---
+MINIO_ENDPOINT = "127.0.0.1:9000"
+MINIO_ACCESS_KEY = "minioadmin"
+MINIO_SECRET_KEY = "minioadmin"
+MINIO_BUCKET = "lms-uploads"
+# S3 multipart parts must be at least 5 MiB; each upload buffers one part.
+UPLOAD_PART_SIZE = int(os.environ.get("UPLOAD_PART_SIZE", str(5 * 1024 * 1024)))
+
+# --- Local filesystem config ---
+LOCAL_STORAGE_ROOT = os.environ.get("LOCAL_STORAGE_ROOT", "local_storage")
+# Base URL of this API; served downloads are /api/files/<key> links under it
+STORAGE_PUBLIC_URL = os.environ.get("STORAGE_PUBLIC_URL", "http://localhost:8000")
+# Signs served-download links. Every process that issues or serves links must
+# share it; when unset, each process signs with its own random key.
+STORAGE_SIGNING_KEY = os.environ.get("STORAGE_SIGNING_KEY")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+class ObjectInfo(NamedTuple):
+    size: int
+    content_type: Optional[str]
+    metadata: Dict[str, str] # User metadata, e.g. {"sha256": ...}
+
+class StorageBackend(ABC):
+    """
+    What core.storage needs from an object store. Keys are '/'-separated
+    paths such as 'uploads/<uuid>.pdf'.
+    """
+    name = "base"
+
+    @abstractmethod
+    def ensure_ready(self):
+        """Creates the bucket/directories if needed. Called at startup."""
+
+    @abstractmethod
+    def put_object(self, key: str, reader, content_type: str, metadata: Optional[dict] = None):
+        """Stores everything `reader.read(n)` returns until it returns b''."""
+
+    @abstractmethod
+    def open_stream(self, key: str):
+        """Context manager yielding a file-like object with .read(n)."""
+
+    @abstractmethod
+    def get_bytes(self, key: str) -> Optional[bytes]:
+        """The whole object, or None if it does not exist."""
+
+    @abstractmethod
+    def read_range(self, key: str, offset: int, length: int) -> bytes:
+        """`length` bytes starting at `offset`."""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[ObjectInfo]:
+        """Size, content type and user metadata, or None if the object does not exist."""
+
+    @abstractmethod
+    def set_metadata(self, key: str, metadata: dict):
+        """Replaces the user metadata, keeping the content type."""
+
+    @abstractmethod
+    def copy(self, source_key: str, key: str):
+        """Copies an object within the store, content type and metadata included."""
+
+    @abstractmethod
+    def list_objects(self, prefix: str) -> Iterator[Tuple[str, int]]:
+        """(key, size) of every object whose key starts with `prefix`."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Removes the object; deleting a missing key is not an error."""
+
+    @abstractmethod
+    def presigned_get_url(self, key: str, expires: timedelta) -> str:
+        """A link that downloads the object without credentials until `expires` passes."""
+
+    @abstractmethod
+    def presigned_put_url(self, key: str, expires: timedelta) -> str:
+        """A link the client PUTs the object's bytes to, valid for `expires`."""
+
+    def local_path(self, key: str) -> Optional[str]:
+        """Path of the object on this machine's disk, if the backend keeps one."""
+        return None
+
+# --- MinIO / S3 ---
+class MinioStorage(StorageBackend):
+    name = "minio"
+
+    def __init__(self, endpoint: str, access_key: str, secret_key: str, bucket: str, secure: bool = False):
+        self.bucket = bucket
+        self.part_size = UPLOAD_PART_SIZE
+        try:
+            self.client = Minio(endpoint, access_key=access_key, secret_key=secret_key, secure=secure)
+        except S3Error as exc:
+            print("Error connecting to MinIO:", exc)
+            self.client = None
+
+    def _client(self) -> Minio:
+        if self.client is None:
+            raise Exception("MinIO client not initialized.")
+        return self.client
+
+    def ensure_ready(self):
+        if self.client is None:
+            print("MinIO client not initialized. Cannot check bucket.")
+            return
+        try:
+            if not self.client.bucket_exists(self.bucket):
+                self.client.make_bucket(self.bucket)
+                print(f"Bucket '{self.bucket}' created.")
+            else:
+                print(f"Bucket '{self.bucket}' already exists.")
+        except Exception as e:
+            print(f"Error connecting to MinIO during bucket check: {e}")
+
+    def put_object(self, key, reader, content_type, metadata=None):
+        # Unknown length: MinIO streams it as a multipart upload, one part in memory at a time
+        self._client().put_object(
+            self.bucket, key, reader, length=-1, part_size=self.part_size,
+            content_type=content_type, metadata=metadata
+        )
+
+    @contextmanager
+    def open_stream(self, key):
+        response = self._client().get_object(self.bucket, key)
+        try:
+            yield response
+        finally:
+            response.close()
+            response.release_conn()
+
+    def get_bytes(self, key):
+        try:
+            response = self._client().get_object(self.bucket, key)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def read_range(self, key, offset, length):
+        response = self._client().get_object(self.bucket, key, offset=offset, length=length)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def stat(self, key):
+        try:
+            stat = self._client().stat_object(self.bucket, key)
+        except S3Error as e:
+            if e.code == "NoSuchKey":
+                return None
+            raise
+        metadata = {}
+        for name, value in (stat.metadata or {}).items():
+            name = name.lower()
+            if name.startswith("x-amz-meta-"):
+                metadata[name[len("x-amz-meta-"):]] = value
+        return ObjectInfo(stat.size, stat.content_type, metadata)
+
+    def set_metadata(self, key, metadata):
+        # REPLACE drops the old headers, so carry the content type over
+        stat = self._client().stat_object(self.bucket, key)
+        self._client().copy_object(
+            self.bucket, key, CopySource(self.bucket, key),
+            metadata={**metadata, "Content-Type": stat.content_type},
+            metadata_directive=REPLACE
+        )
+
+    def copy(self, source_key, key):
+        self._client().copy_object(self.bucket, key, CopySource(self.bucket, source_key))
+
+    def list_objects(self, prefix):
+        for obj in self._client().list_objects(self.bucket, prefix=prefix, recursive=True):
+            yield obj.object_name, obj.size
+
+    def delete(self, key):
+        self._client().remove_object(self.bucket, key)
+
+    def presigned_get_url(self, key, expires):
+        return self._client().presigned_get_object(self.bucket, key, expires=expires)
+
+    def presigned_put_url(self, key, expires):
+        return self._client().presigned_put_object(self.bucket, key, expires=expires)
+
+# --- Local filesystem ---
+class LocalStorage(StorageBackend):
+    """
+    Objects are plain files under <root>/objects/<key>, with content type
+    and metadata in <root>/meta/<key>.json. Every write goes to a temp file
+    in the target directory and is renamed into place, so readers never see
+    a partial object. Downloads and presigned uploads are served by the API
+    (api/files.py) through HMAC-signed links.
+    """
+    name = "local"
+    _TEMP_PREFIX = ".tmp-"
+
+    def __init__(self, root: str, public_url: str, signing_key: str):
+        self.root = os.path.abspath(root)
+        self.objects_dir = os.path.join(self.root, "objects")
+        self.meta_dir = os.path.join(self.root, "meta")
+        self.public_url = public_url.rstrip("/")
+        self._signing_key = signing_key.encode("utf-8")
+
+    def _safe_join(self, base: str, key: str) -> str:
+        path = os.path.normpath(os.path.join(base, key))
+        if not path.startswith(base + os.sep):
+            raise ValueError(f"Invalid object key: {key!r}")
+        return path
+
+    def _object_path(self, key: str) -> str:
+        return self._safe_join(self.objects_dir, key)
+
+    def _meta_path(self, key: str) -> str:
+        return self._safe_join(self.meta_dir, key) + ".json"
+
+    @contextmanager
+    def _staged_write(self, path: str, chunks):
+        """Writes `chunks` to a temp file next to `path`; renames it into place once the block exits cleanly."""
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=self._TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                for chunk in chunks:
+                    out.write(chunk)
+                out.flush()
+                os.fsync(out.fileno())
+            yield
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def _atomic_write(self, path: str, chunks):
+        with self._staged_write(path, chunks):
+            pass
+
+    def _read_meta(self, key: str) -> dict:
+        try:
+            with open(self._meta_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _write_meta(self, key: str, content_type: Optional[str], metadata: Optional[dict]):
+        payload = json.dumps({"content_type": content_type, "metadata": metadata or {}})
+        self._atomic_write(self._meta_path(key), [payload.encode("utf-8")])
+
+    def ensure_ready(self):
+        os.makedirs(self.objects_dir, exist_ok=True)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        print(f"Local storage ready at '{self.root}'.")
+
+    def put_object(self, key, reader, content_type, metadata=None):
+        def _chunks():
+            while True:
+                chunk = reader.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        # Data is staged first, so a failed read leaves nothing behind; the
+        # metadata lands before the rename, so an object is never visible
+        # without its content type
+        with self._staged_write(self._object_path(key), _chunks()):
+            self._write_meta(key, content_type, metadata)
+
+    @contextmanager
+    def open_stream(self, key):
+        with open(self._object_path(key), "rb") as f:
+            yield f
+
+    @contextmanager
+    def open_mmap(self, key):
+        """Read-only memory map of an object; pages are loaded on demand, nothing is copied."""
+        with open(self._object_path(key), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                yield b""
+                return
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                yield mapped
+
+    def get_bytes(self, key):
+        try:
+            with self.open_mmap(key) as mapped:
+                return bytes(mapped)
+        except FileNotFoundError:
+            return None
+
+    def read_range(self, key, offset, length):
+        with self.open_mmap(key) as mapped:
+            return bytes(mapped[offset:offset + length])
+
+    def stat(self, key):
+        try:
+            size = os.stat(self._object_path(key)).st_size
+        except FileNotFoundError:
+            return None
+        meta = self._read_meta(key)
+        return ObjectInfo(size, meta.get("content_type"), meta.get("metadata") or {})
+
+    def set_metadata(self, key, metadata):
+        if self.stat(key) is None:
+            raise FileNotFoundError(key)
+        self._write_meta(key, self._read_meta(key).get("content_type"), metadata)
+
+    def copy(self, source_key, key):
+        meta = self._read_meta(source_key)
+        # The open handle keeps reading the old file if the source is replaced meanwhile
+        with self.open_stream(source_key) as source:
+            with self._staged_write(self._object_path(key), iter(lambda: source.read(STREAM_CHUNK_SIZE), b"")):
+                self._write_meta(key, meta.get("content_type"), meta.get("metadata"))
+
+    def list_objects(self, prefix):
+        # Walk only the directory the prefix points into
+        start = os.path.dirname(self._safe_join(self.objects_dir, prefix + "x")) if prefix else self.objects_dir
+        for directory, _, files in os.walk(start):
+            for name in files:
+                if name.startswith(self._TEMP_PREFIX):
+                    continue
+                path = os.path.join(directory, name)
+                key = os.path.relpath(path, self.objects_dir).replace(os.sep, "/")
+                if key.startswith(prefix):
+                    yield key, os.path.getsize(path)
+
+    def delete(self, key):
+        for path in (self._object_path(key), self._meta_path(key)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def local_path(self, key):
+        path = self._object_path(key)
+        return path if os.path.exists(path) else None
+
+    # --- Signed links served by api/files.py ---
+    def sign(self, method: str, key: str, expires_at: int) -> str:
+        message = f"{method}\n{key}\n{expires_at}".encode("utf-8")
+        return hmac.new(self._signing_key, message, hashlib.sha256).hexdigest()
+
+    def verify(self, method: str, key: str, expires_at: int, signature: str) -> bool:
+        if expires_at < datetime.now(timezone.utc).timestamp():
+            return False
+        return hmac.compare_digest(self.sign(method, key, expires_at), signature)
+
+    def _signed_url(self, method: str, key: str, expires: timedelta) -> str:
+        expires_at = int((datetime.now(timezone.utc) + expires).timestamp())
+        signature = self.sign(method, key, expires_at)
+        return f"{self.public_url}/api/files/{quote(key)}?expires={expires_at}&signature={signature}"
+
+    def presigned_get_url(self, key, expires):
+        return self._signed_url("GET", key, expires)
+
+    def presigned_put_url(self, key, expires):
+        return self._signed_url("PUT", key, expires)
+
+def create_backend(name: str) -> StorageBackend:
+    if name == "minio":
+        return MinioStorage(MINIO_ENDPOINT, MINIO_ACCESS_KEY, MINIO_SECRET_KEY, MINIO_BUCKET)
+    if name == "local":
+        signing_key = STORAGE_SIGNING_KEY
+        if not signing_key:
+            logger.warning(
+                "STORAGE_SIGNING_KEY is not set: signing file links with a random per-process key. "
+                "Links only work against the process that issued them; set a shared secret in production."
+            )
+            signing_key = secrets.token_hex(32)
+        return LocalStorage(LOCAL_STORAGE_ROOT, STORAGE_PUBLIC_URL, signing_key)
+    raise ValueError(f"Unknown STORAGE_BACKEND '{name}' (expected 'minio' or 'local')")
@@ -0,0 +1,165 @@
+# --- Deduplicated task enqueueing ---
+# Tasks declared with base=DedupedTask and a dedupe_key (a format string over
+# the task's positional args, e.g. "grade:submission:{0}") are enqueued at
+# most once per key:
+#
+# * Enqueueing sets a "queued" marker (SET NX with a TTL). While it exists,
+#   further .delay() calls for the same key are dropped before they reach the
+#   broker. The tasks read their inputs from the DB when they run, so the one
+#   already queued serves the latest request as well.
+# * When a worker picks the task up it clears the marker (a request arriving
+#   now may carry newer state and is queued again) and takes an in-flight
+#   lock. If another run holds the lock, the task re-enqueues itself with a
+#   short delay instead of running concurrently.
+# * With dedupe_countdown the task is debounced: the first request schedules
+#   a run that many seconds out and requests arriving meanwhile are folded
+#   into it, so a burst of triggers costs one run on the latest state.
+#
+# Redis problems never block work: without a reachable Redis every call is
+# enqueued and run as before.
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Optional
+
+import redis
+from prometheus_client import Counter
+
+from ..celery_worker import CELERY_BROKER_URL
+from .dispatch import DispatchTask, is_local
+from .tracing import registry
+
+logger = logging.getLogger(__name__)
+
+DEDUPE_TTL = int(os.environ.get("TASK_DEDUPE_TTL_SECONDS", "3600"))
+LOCK_RETRY_DELAY = int(os.environ.get("TASK_LOCK_RETRY_SECONDS", "5"))
+DEFAULT_LOCK_TTL = 600
+KEY_PREFIX = "task-dedupe:"
+
+TASKS_DEDUPLICATED = Counter(
+    "task_enqueues_deduplicated_total", "Task enqueues dropped as duplicates (reason=debounced: runs saved by debouncing)",
+    ["task", "reason"], registry=registry
+)
+
+class _MemoryStore:
+    """The few Redis calls used here, in memory, for the in-process task backend."""
+
+    def __init__(self):
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _live(self, key):
+        value, expires = self._values.get(key, (None, 0))
+        if value is not None and expires < time.monotonic():
+            del self._values[key]
+            return None
+        return value
+
+    def set(self, key, value, nx=False, ex=None):
+        with self._lock:
+            if nx and self._live(key) is not None:
+                return None
+            self._values[key] = (str(value).encode(), time.monotonic() + (ex or DEDUPE_TTL))
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            return 1 if self._values.pop(key, None) else 0
+
+    def eval(self, script, numkeys, key, token):
+        # Only ever called with _RELEASE_LOCK
+        with self._lock:
+            if self._live(key) == token.encode():
+                del self._values[key]
+                return 1
+            return 0
+
+_client = None
+
+def get_redis():
+    """
+    Shared client on the broker's Redis, an in-memory store for
+    TASK_BACKEND=local, or None if the broker is not Redis.
+    """
+    global _client
+    if _client is None:
+        if is_local():
+            _client = _MemoryStore()
+        elif CELERY_BROKER_URL.startswith(("redis://", "rediss://")):
+            _client = redis.Redis.from_url(CELERY_BROKER_URL, socket_timeout=0.5, socket_connect_timeout=0.5)
+    return _client
+
+# Only compare-and-delete our own lock, never one a later run has taken over
+_RELEASE_LOCK = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class DedupedTask(DispatchTask):
+    abstract = True
+    dedupe_key: Optional[str] = None
+    dedupe_countdown: int = 0
+
+    def _key(self, args) -> Optional[str]:
+        if not self.dedupe_key:
+            return None
+        return KEY_PREFIX + self.dedupe_key.format(*(args or ()))
+
+    def apply_async(self, args=None, kwargs=None, **options):
+        key = self._key(args)
+        if self.dedupe_countdown and "countdown" not in options and "eta" not in options:
+            options["countdown"] = self.dedupe_countdown
+        client = get_redis() if key else None
+        marked = False
+        if client is not None:
+            try:
+                ttl = DEDUPE_TTL + int(options.get("countdown") or 0)
+                if not client.set(f"{key}:queued", "1", nx=True, ex=ttl):
+                    TASKS_DEDUPLICATED.labels(self.name, "debounced" if self.dedupe_countdown else "queued").inc()
+                    logger.info(f"Skipping {self.name}{tuple(args or ())}: already queued.")
+                    return None
+                marked = True
+            except redis.RedisError as e:
+                logger.warning(f"Task dedupe unavailable, enqueueing {self.name} anyway: {e}")
+        try:
+            return super().apply_async(args, kwargs, **options)
+        except Exception:
+            # Nothing was queued: a marker left behind would drop every retry until it expires
+            if marked:
+                try:
+                    client.delete(f"{key}:queued")
+                except redis.RedisError as e:
+                    logger.warning(f"Could not clear queued marker {key}: {e}")
+            raise
+
+    def __call__(self, *args, **kwargs):
+        key = self._key(args)
+        client = get_redis() if key else None
+        if client is None:
+            return super().__call__(*args, **kwargs)
+
+        token = uuid.uuid4().hex
+        try:
+            client.delete(f"{key}:queued")
+            locked = client.set(f"{key}:lock", token, nx=True, ex=int(self.time_limit or DEFAULT_LOCK_TTL))
+        except redis.RedisError as e:
+            logger.warning(f"Task dedupe unavailable, running {self.name} unlocked: {e}")
+            return super().__call__(*args, **kwargs)
+
+        if not locked:
+            TASKS_DEDUPLICATED.labels(self.name, "running").inc()
+            logger.info(f"{self.name}{args} is already running. Re-queueing in {LOCK_RETRY_DELAY}s.")
+            self.apply_async(args, kwargs, countdown=LOCK_RETRY_DELAY)
+            return None
+        try:
+            return super().__call__(*args, **kwargs)
+        finally:
+            try:
+                client.eval(_RELEASE_LOCK, 1, f"{key}:lock", token)
+            except redis.RedisError as e:
+                # The lock expires on its own
+                logger.warning(f"Could not release task lock {key}: {e}")
@@ -0,0 +1,101 @@
+# --- Celery task metrics ---
+# Signal handlers that record, for every task: time spent waiting in the
+# queue, run time, retries, failures by exception type and how many are
+# running right now; completions also feed the queue signals
+# (queue_signals.py). The metrics share the pipeline registry in tracing.py,
+# so the API's /metrics shows the publishing side and each worker serves
+# its own on TASK_METRICS_PORT.
+#
+# Prefork workers run tasks in child processes. Set PROMETHEUS_MULTIPROC_DIR
+# (an empty, writable directory per worker) to aggregate the children;
+# without it only the worker's own process is visible.
+import logging
+import os
+import time
+from datetime import datetime
+
+from celery.signals import (
+    before_task_publish, task_failure, task_postrun, task_prerun, task_retry, worker_init
+)
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+
+from .queue_signals import record_completion
+from .tracing import metrics_registry, registry
+
+logger = logging.getLogger(__name__)
+
+TASK_METRICS_PORT = int(os.environ.get("TASK_METRICS_PORT", "9808"))  # 0 disables the worker exporter
+
+_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+TASK_QUEUE_WAIT = Histogram(
+    "celery_task_queue_wait_seconds", "Time from publish (or ETA) until a worker started the task",
+    ["task", "queue"], registry=registry, buckets=_BUCKETS
+)
+TASK_RUNTIME = Histogram(
+    "celery_task_runtime_seconds", "Task run time",
+    ["task", "state"], registry=registry, buckets=_BUCKETS
+)
+TASK_FAILURES = Counter("celery_task_failures_total", "Failed tasks", ["task", "exception"], registry=registry)
+TASK_RETRIES = Counter("celery_task_retries_total", "Task retries", ["task"], registry=registry)
+TASKS_PUBLISHED = Counter("celery_tasks_published_total", "Tasks sent to the broker", ["task"], registry=registry)
+TASKS_IN_FLIGHT = Gauge(
+    "celery_tasks_in_flight", "Tasks currently running",
+    ["task"], registry=registry, multiprocess_mode="livesum"
+)
+
+_started = {}
+
+@before_task_publish.connect
+def _on_publish(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers.setdefault("published_at", time.time())
+    TASKS_PUBLISHED.labels(sender or "unknown").inc()
+
+@task_prerun.connect
+def _on_prerun(task_id=None, task=None, **kwargs):
+    now = time.time()
+    _started[task_id] = time.perf_counter()
+    TASKS_IN_FLIGHT.labels(task.name).inc()
+
+    request = task.request
+    published_at = getattr(request, "published_at", None)
+    if published_at is None:
+        return
+    ready_at = float(published_at)
+    if request.eta:
+        # Countdowns are intentional delays, not queueing
+        try:
+            ready_at = max(ready_at, datetime.fromisoformat(str(request.eta)).timestamp())
+        except ValueError:
+            pass
+    queue = (request.delivery_info or {}).get("routing_key") or "unknown"
+    TASK_QUEUE_WAIT.labels(task.name, queue).observe(max(0.0, now - ready_at))
+
+@task_postrun.connect
+def _on_postrun(task_id=None, task=None, state=None, **kwargs):
+    started = _started.pop(task_id, None)
+    TASKS_IN_FLIGHT.labels(task.name).dec()
+    if started is not None:
+        runtime = time.perf_counter() - started
+        TASK_RUNTIME.labels(task.name, state or "UNKNOWN").observe(runtime)
+        # Throughput across all workers, for the queue signals (autoscaling)
+        record_completion(task.name, runtime)
+
+@task_failure.connect
+def _on_failure(sender=None, exception=None, **kwargs):
+    TASK_FAILURES.labels(getattr(sender, "name", "unknown"), type(exception).__name__).inc()
+
+@task_retry.connect
+def _on_retry(sender=None, **kwargs):
+    TASK_RETRIES.labels(getattr(sender, "name", "unknown")).inc()
+
+@worker_init.connect
+def _start_exporter(**kwargs):
+    if not TASK_METRICS_PORT:
+        return
+    try:
+        start_http_server(TASK_METRICS_PORT, registry=metrics_registry())
+        logger.info(f"Task metrics exporter listening on :{TASK_METRICS_PORT}")
+    except OSError as e:
+        logger.warning(f"Could not start task metrics exporter on :{TASK_METRICS_PORT}: {e}")
@@ -0,0 +1,175 @@
+import json
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+from prometheus_client import CollectorRegistry, Counter, Histogram, generate_latest, multiprocess
+
+logger = logging.getLogger(__name__)
+
+# --- Metrics (one registry for all pipeline spans) ---
+registry = CollectorRegistry()
+
+SPAN_SECONDS = Histogram(
+    "pipeline_span_seconds", "Wall time of a pipeline node or stage",
+    ["pipeline", "span"], registry=registry,
+    buckets=(0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+)
+SPAN_ERRORS = Counter("pipeline_span_errors_total", "Spans that raised", ["pipeline", "span"], registry=registry)
+LLM_TOKENS = Counter("pipeline_llm_tokens_total", "LLM tokens", ["pipeline", "span", "kind"], registry=registry)
+CACHE_LOOKUPS = Counter("pipeline_cache_lookups_total", "Cache lookups", ["pipeline", "span", "result"], registry=registry)
+RETRIES = Counter("pipeline_retries_total", "Retried calls", ["pipeline", "span"], registry=registry)
+
+def metrics_registry() -> CollectorRegistry:
+    """
+    The registry to expose: this process's, or, with PROMETHEUS_MULTIPROC_DIR
+    set (prefork workers, multi-process uvicorn), the aggregate of all of them.
+    """
+    if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        return registry
+    aggregate = CollectorRegistry()
+    multiprocess.MultiProcessCollector(aggregate)
+    return aggregate
+
+def export_metrics() -> bytes:
+    """Prometheus text exposition of all pipeline metrics."""
+    return generate_latest(metrics_registry())
+
+# --- Traces ---
+class Trace:
+    """All spans recorded for one pipeline run (e.g. one submission evaluation)."""
+
+    def __init__(self, name: str, tags: dict):
+        self.name = name
+        self.tags = tags
+        self.spans = []
+        self._started = time.perf_counter()
+        self.total_ms = None
+
+    def to_dict(self) -> dict:
+        return {"name": self.name, "tags": self.tags, "total_ms": self.total_ms, "spans": self.spans}
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[dict]] = ContextVar("current_span", default=None)
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+@contextmanager
+def start_trace(name: str, **tags):
+    """
+    Starts a trace for one pipeline run. Tags (submission_id, coursework_id, ...)
+    are attached to the trace; spans opened inside are recorded on it.
+    """
+    trace = Trace(name, {k: v for k, v in tags.items() if v is not None})
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.total_ms = round((time.perf_counter() - trace._started) * 1000, 2)
+        _current_trace.reset(token)
+        logger.info(f"Trace {json.dumps(trace.to_dict(), default=str)}")
+
+def add_trace_tags(**tags):
+    trace = current_trace()
+    if trace:
+        trace.tags.update({k: v for k, v in tags.items() if v is not None})
+
+@contextmanager
+def span(name: str, kind: str = "stage"):
+    """Times a block. Works without an active trace, then only metrics are recorded."""
+    trace = current_trace()
+    pipeline = trace.name if trace else "none"
+    record = {
+        "name": name,
+        "kind": kind,
+        "offset_ms": round((time.perf_counter() - trace._started) * 1000, 2) if trace else None,
+        "duration_ms": None,
+        "prompt_tokens": 0,
+        "completion_tokens": 0,
+        "cache_hits": 0,
+        "cache_misses": 0,
+        "retries": 0,
+        "error": None,
+    }
+    started = time.perf_counter()
+    token = _current_span.set(record)
+    try:
+        yield record
+    except Exception as e:
+        record["error"] = type(e).__name__
+        SPAN_ERRORS.labels(pipeline, name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - started
+        _current_span.reset(token)
+        record["duration_ms"] = round(elapsed * 1000, 2)
+        SPAN_SECONDS.labels(pipeline, name).observe(elapsed)
+        if record["prompt_tokens"]:
+            LLM_TOKENS.labels(pipeline, name, "prompt").inc(record["prompt_tokens"])
+        if record["completion_tokens"]:
+            LLM_TOKENS.labels(pipeline, name, "completion").inc(record["completion_tokens"])
+        if record["cache_hits"]:
+            CACHE_LOOKUPS.labels(pipeline, name, "hit").inc(record["cache_hits"])
+        if record["cache_misses"]:
+            CACHE_LOOKUPS.labels(pipeline, name, "miss").inc(record["cache_misses"])
+        if record["retries"]:
+            RETRIES.labels(pipeline, name).inc(record["retries"])
+        if trace:
+            trace.spans.append(record)
+
+def traced_node(name: str, kind: str = "node"):
+    """Decorator for LangGraph nodes and other pipeline functions."""
+    def decorator(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, kind=kind):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def record_tokens(prompt_tokens: int = 0, completion_tokens: int = 0):
+    record = _current_span.get()
+    if record is not None:
+        record["prompt_tokens"] += prompt_tokens or 0
+        record["completion_tokens"] += completion_tokens or 0
+
+def record_cache(hit: bool):
+    record = _current_span.get()
+    if record is not None:
+        record["cache_hits" if hit else "cache_misses"] += 1
+
+def record_retry():
+    record = _current_span.get()
+    if record is not None:
+        record["retries"] += 1
+
+# --- LangChain integration ---
+class TracingCallbackHandler(BaseCallbackHandler):
+    """Feeds token usage and retries of chain invocations into the current span."""
+
+    def on_llm_end(self, response, **kwargs):
+        usage = (response.llm_output or {}).get("token_usage") or {}
+        prompt_tokens = usage.get("prompt_tokens", 0)
+        completion_tokens = usage.get("completion_tokens", 0)
+        if not usage:
+            for generations in response.generations:
+                for generation in generations:
+                    metadata = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                    prompt_tokens += metadata.get("input_tokens", 0)
+                    completion_tokens += metadata.get("output_tokens", 0)
+        record_tokens(prompt_tokens, completion_tokens)
+
+    def on_retry(self, retry_state, **kwargs):
+        record_retry()
+
+_callback_handler = TracingCallbackHandler()
+
+def llm_config() -> dict:
+    """RunnableConfig to pass to `chain.invoke(..., config=llm_config())`."""
+    return {"callbacks": [_callback_handler]}
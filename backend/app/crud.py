@@ -1,7 +1,10 @@
+from sqlalchemy import case
 from sqlalchemy.orm import Session, joinedload
+from sqlalchemy.exc import IntegrityError
+from collections import Counter
 from . import models, schemas, auth
 from datetime import datetime, timezone
-from typing import List, Optional
+from typing import Dict, List, Optional, Sequence
 
 # --- User Functions (from M3.5) ---
 def get_user_by_email(db: Session, email: str):
@@ -73,7 +76,9 @@ def create_coursework(db: Session, coursework: schemas.CourseworkCreate, classro
         classroom_id=classroom_id,
         concept_tags=coursework.concept_tags  # <-- FIX: Added this line
     )
-    db.add(db_coursework); db.commit(); db.refresh(db_coursework)
+    db.add(db_coursework)
+    acquire_object_refs(db, coursework_object_keys(db_coursework))
+    db.commit(); db.refresh(db_coursework)
     
     for question_in in coursework.questions or []:
         db_question = models.Question(
@@ -98,6 +103,10 @@ def create_coursework(db: Session, coursework: schemas.CourseworkCreate, classro
 
 def delete_coursework(db: Session, coursework: models.Coursework):
     """Deletes a coursework item. Cascades are handled by the DB relationship."""
+    # Files of the coursework and of its (cascade-deleted) submissions lose a reference
+    keys = coursework_object_keys(coursework)
+    keys += [s.submission_file_url for s in coursework.submissions if s.submission_file_url]
+    release_object_refs(db, keys)
     db.delete(coursework)
     db.commit()
 
@@ -148,11 +157,11 @@ def get_submission_by_student_and_coursework(db: Session, student_id: int, cours
         models.Submission.coursework_id == coursework_id
     ).first()
 
-def create_quiz_submission(db: Session, submission: schemas.QuizSubmissionCreate, coursework_id: int, student_id: int):
+def create_quiz_submission(db: Session, submission: schemas.QuizSubmissionCreate, coursework_id: int, student_id: int, status: str = "SUBMITTED"):
     db_submission = models.Submission(
         coursework_id=coursework_id,
         student_id=student_id,
-        status="SUBMITTED"
+        status=status
     )
     db.add(db_submission)
     db.commit()
@@ -170,15 +179,17 @@ def create_quiz_submission(db: Session, submission: schemas.QuizSubmissionCreate
     db.refresh(db_submission)
     return db_submission
 
-def create_essay_submission(db: Session, submission: schemas.EssaySubmissionCreate, coursework_id: int, student_id: int):
+def create_essay_submission(db: Session, submission: schemas.EssaySubmissionCreate, coursework_id: int, student_id: int, status: str = "SUBMITTED"):
     db_submission = models.Submission(
         coursework_id=coursework_id,
         student_id=student_id,
         submission_text=submission.submission_text,
         submission_file_url=submission.submission_file_url,
-        status="SUBMITTED"
+        status=status
     )
     db.add(db_submission)
+    if submission.submission_file_url:
+        acquire_object_refs(db, [submission.submission_file_url])
     db.commit()
     db.refresh(db_submission)
     return db_submission
@@ -225,6 +236,47 @@ def approve_submission(db: Session, submission_id: int, approval_data: schemas.S
     })
     db.commit()
 
+def get_teacher_submission_students(
+    db: Session, teacher_id: int, submission_ids: Optional[List[int]] = None,
+    coursework_id: Optional[int] = None, status: Optional[str] = None
+) -> List[tuple]:
+    """(submission_id, student_id) pairs in the teacher's classrooms matching the filters."""
+    query = db.query(models.Submission.id, models.Submission.student_id).join(
+        models.Coursework, models.Submission.coursework_id == models.Coursework.id
+    ).join(
+        models.Classroom, models.Coursework.classroom_id == models.Classroom.id
+    ).filter(models.Classroom.teacher_id == teacher_id)
+    if submission_ids is not None:
+        query = query.filter(models.Submission.id.in_(submission_ids))
+    if coursework_id is not None:
+        query = query.filter(models.Submission.coursework_id == coursework_id)
+    if status is not None:
+        query = query.filter(models.Submission.status == status)
+    return query.all()
+
+def bulk_approve_submissions(db: Session, submission_ids: List[int], overrides: Dict[int, schemas.SubmissionApproval]) -> int:
+    """
+    approve_submission for many submissions in one UPDATE. Submissions with
+    an entry in `overrides` get its score/feedback; the rest keep theirs.
+    """
+    if not submission_ids:
+        return 0
+    values = {"status": "GRADED"}
+    if overrides:
+        values["teacher_override_score"] = case(
+            {sid: o.teacher_override_score for sid, o in overrides.items()},
+            value=models.Submission.id, else_=models.Submission.teacher_override_score
+        )
+        values["teacher_feedback"] = case(
+            {sid: o.teacher_feedback for sid, o in overrides.items()},
+            value=models.Submission.id, else_=models.Submission.teacher_feedback
+        )
+    updated = db.query(models.Submission).filter(
+        models.Submission.id.in_(submission_ids)
+    ).update(values, synchronize_session=False)
+    db.commit()
+    return updated
+
 def get_gradebook_data(db: Session, classroom_id: int):
     # 1. Get all coursework for the class, ordered
     courseworks = db.query(models.Coursework).filter(
@@ -328,4 +380,218 @@ def is_teacher_and_student_in_same_class(db: Session, teacher_id: int, student_i
         models.Enrollment.classroom_id.in_(teacher_classrooms)
     ).first()
     
-    return enrollment is not None
\ No newline at end of file
+    return enrollment is not None
+
+# --- AI Quiz Generation Jobs ---
+
+def create_quiz_generation_job(db: Session, request: schemas.QuizGenerationRequest, teacher_id: int):
+    db_job = models.QuizGenerationJob(
+        teacher_id=teacher_id,
+        request=request.model_dump(),
+        num_questions=request.num_questions,
+        questions=[],
+        status="PENDING"
+    )
+    db.add(db_job); db.commit(); db.refresh(db_job)
+    return db_job
+
+def get_quiz_generation_job(db: Session, job_id: int):
+    return db.query(models.QuizGenerationJob).get(job_id)
+
+def update_quiz_generation_job(db: Session, job_id: int, status: str, error: Optional[str] = None):
+    db.query(models.QuizGenerationJob).filter(models.QuizGenerationJob.id == job_id).update({
+        "status": status,
+        "error": error
+    })
+    db.commit()
+
+def append_quiz_generation_questions(db: Session, job_id: int, questions: List[schemas.QuestionCreate]):
+    """Publishes a finished batch so pollers can pick it up immediately."""
+    db_job = db.query(models.QuizGenerationJob).get(job_id)
+    db_job.questions.extend(q.model_dump() for q in questions)
+    db.commit()
+
+# --- Pipeline Traces ---
+
+def save_pipeline_trace(db: Session, trace):
+    """Persists a finished core.tracing.Trace."""
+    db_trace = models.PipelineTrace(
+        name=trace.name,
+        submission_id=trace.tags.get("submission_id"),
+        coursework_id=trace.tags.get("coursework_id"),
+        tags=trace.tags,
+        spans=trace.spans,
+        total_ms=trace.total_ms
+    )
+    db.add(db_trace); db.commit()
+    return db_trace
+
+def get_traces_for_submission(db: Session, submission_id: int):
+    return db.query(models.PipelineTrace).filter(
+        models.PipelineTrace.submission_id == submission_id
+    ).order_by(models.PipelineTrace.created_at).all()
+
+# --- Direct-to-storage Upload Sessions ---
+
+def create_upload_session(db: Session, upload: schemas.UploadSessionCreate, user_id: int, object_key: str, expires_at: datetime):
+    db_session = models.UploadSession(
+        user_id=user_id,
+        purpose=upload.purpose,
+        object_key=object_key,
+        filename=upload.filename,
+        content_type=upload.content_type,
+        expected_size=upload.size,
+        expires_at=expires_at,
+        status="PENDING"
+    )
+    db.add(db_session); db.commit(); db.refresh(db_session)
+    return db_session
+
+def get_upload_session(db: Session, session_id: int):
+    return db.query(models.UploadSession).get(session_id)
+
+def update_upload_session(db: Session, session_id: int, status: str, size: Optional[int] = None, error: Optional[str] = None, only_from: Optional[Sequence[str]] = None, object_key: Optional[str] = None):
+    """Sets a session's status; with `only_from`, only if it is currently in one of those statuses."""
+    values = {"status": status, "error": error}
+    if size is not None:
+        values["size"] = size
+    if object_key is not None:
+        values["object_key"] = object_key
+    query = db.query(models.UploadSession).filter(models.UploadSession.id == session_id)
+    if only_from is not None:
+        query = query.filter(models.UploadSession.status.in_(only_from))
+    updated = query.update(values, synchronize_session=False)
+    db.commit()
+    return updated == 1
+
+def claim_upload_session(db: Session, session_id: int) -> bool:
+    """Marks an upload as SUBMITTED so it backs one submission; False if it was not ready or already used."""
+    return update_upload_session(db, session_id, "SUBMITTED", only_from=("UPLOADED", "READY"))
+
+# --- Stored Objects (reference counting) ---
+
+def register_stored_object(db: Session, key: str, sha256: Optional[str] = None, size: Optional[int] = None, content_type: Optional[str] = None):
+    """
+    Records an uploaded object, or refreshes last_seen_at if it already exists
+    (a deduplicated upload), so garbage collection leaves it alone until the
+    uploader has had time to reference it.
+    """
+    now = datetime.now(timezone.utc)
+    # Update first: if garbage collection is deleting the row this waits for it,
+    # then finds no row and inserts a fresh one instead of refreshing a deleted one
+    refreshed = db.query(models.StoredObject).filter(models.StoredObject.key == key).update(
+        {"last_seen_at": now}, synchronize_session=False
+    )
+    if refreshed:
+        db.commit()
+        return
+    db.add(models.StoredObject(key=key, sha256=sha256, size=size, content_type=content_type, last_seen_at=now))
+    try:
+        db.commit()
+    except IntegrityError:
+        # A concurrent upload of the same bytes registered it first
+        db.rollback()
+        db.query(models.StoredObject).filter(models.StoredObject.key == key).update({"last_seen_at": now})
+        db.commit()
+
+def coursework_object_keys(coursework: models.Coursework) -> List[str]:
+    keys = [coursework.rubric_file_url] if coursework.rubric_file_url else []
+    return keys + [key for key in (coursework.material_file_urls or []) if key]
+
+def _adjust_object_refs(db: Session, keys: List[str], delta: int):
+    # Keys without a row (objects from before reference counting) are left untouched
+    for key, count in Counter(keys).items():
+        values = {"ref_count": models.StoredObject.ref_count + delta * count}
+        if delta < 0:
+            values["last_seen_at"] = datetime.now(timezone.utc)
+        db.query(models.StoredObject).filter(models.StoredObject.key == key).update(
+            values, synchronize_session=False
+        )
+
+def acquire_object_refs(db: Session, keys: List[str]):
+    """Counts new references to stored objects. Commits with the caller's transaction."""
+    _adjust_object_refs(db, keys, +1)
+
+def release_object_refs(db: Session, keys: List[str]):
+    """Drops references; objects reaching zero become GC candidates after the grace period."""
+    _adjust_object_refs(db, keys, -1)
+
+def _orphaned(query, seen_before: datetime):
+    return query.filter(
+        models.StoredObject.ref_count <= 0,
+        models.StoredObject.last_seen_at < seen_before
+    )
+
+def get_orphaned_objects(db: Session, seen_before: datetime):
+    return _orphaned(db.query(models.StoredObject), seen_before).all()
+
+def delete_orphaned_object(db: Session, key: str, seen_before: datetime) -> bool:
+    """
+    Deletes an object's row if it is still orphaned, without committing. The
+    DELETE holds the row until the caller commits, so a concurrent reference or
+    re-upload waits for the bytes to be removed (and then registers a new row).
+    False if the object was referenced or uploaded again since it was listed.
+    """
+    query = db.query(models.StoredObject).filter(models.StoredObject.key == key)
+    return _orphaned(query, seen_before).delete(synchronize_session=False) == 1
+
+# --- Admission control ---
+def get_deferred_submissions(db: Session, limit: int):
+    """Oldest submissions whose grading was deferred, with their coursework type."""
+    return db.query(models.Submission.id, models.Coursework.coursework_type).join(
+        models.Coursework, models.Submission.coursework_id == models.Coursework.id
+    ).filter(
+        models.Submission.status == "DEFERRED"
+    ).order_by(models.Submission.id).limit(limit).all()
+
+def release_deferred_submissions(db: Session, submission_ids: List[int]) -> List[int]:
+    """Moves deferred submissions back to SUBMITTED; returns the ids that were still deferred."""
+    if not submission_ids:
+        return []
+    still_deferred = [
+        sid for (sid,) in db.query(models.Submission.id).filter(
+            models.Submission.id.in_(submission_ids),
+            models.Submission.status == "DEFERRED"
+        )
+    ]
+    db.query(models.Submission).filter(
+        models.Submission.id.in_(still_deferred)
+    ).update({models.Submission.status: "SUBMITTED"}, synchronize_session=False)
+    db.commit()
+    return still_deferred
+
+# --- Precomputed Classroom Summaries ---
+def get_classroom_ids(db: Session) -> List[int]:
+    return [cid for (cid,) in db.query(models.Classroom.id).order_by(models.Classroom.id)]
+
+def get_classroom_ids_for_submissions(db: Session, submission_ids: List[int]) -> List[int]:
+    if not submission_ids:
+        return []
+    rows = db.query(models.Coursework.classroom_id).join(
+        models.Submission, models.Submission.coursework_id == models.Coursework.id
+    ).filter(models.Submission.id.in_(submission_ids)).distinct()
+    return sorted(cid for (cid,) in rows)
+
+def get_classroom_summary(db: Session, classroom_id: int, kind: str) -> Optional[models.ClassroomSummary]:
+    return db.query(models.ClassroomSummary).filter(
+        models.ClassroomSummary.classroom_id == classroom_id,
+        models.ClassroomSummary.kind == kind
+    ).first()
+
+def save_classroom_summary(db: Session, classroom_id: int, kind: str, data, compute_ms: Optional[float] = None) -> models.ClassroomSummary:
+    """Inserts or replaces the summary of this kind for the classroom."""
+    values = {"data": data, "compute_ms": compute_ms, "computed_at": datetime.now(timezone.utc)}
+    db_summary = get_classroom_summary(db, classroom_id, kind)
+    if db_summary is None:
+        db.add(models.ClassroomSummary(classroom_id=classroom_id, kind=kind, **values))
+        try:
+            db.commit()
+            return get_classroom_summary(db, classroom_id, kind)
+        except IntegrityError:
+            # The scheduler and an on-demand request computed it at the same time
+            db.rollback()
+            db_summary = get_classroom_summary(db, classroom_id, kind)
+    for field, value in values.items():
+        setattr(db_summary, field, value)
+    db.commit()
+    return db_summary
\ No newline at end of file
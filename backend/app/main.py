@@ -1,12 +1,19 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from .core.storage import check_minio_bucket
+import time
+from .core.storage import check_storage
+from .core.tracing import export_metrics
+from .core.queue_signals import export_queue_signals, queue_signals
+from prometheus_client import CONTENT_TYPE_LATEST
+from .agents.prompt_registry import warm_up as warm_up_prompts
+from .core.dispatch import start_local_scheduler
+from .celery_worker import BEAT_SCHEDULE
 
 from . import models, schemas, crud, auth
 from .database import SessionLocal, engine
-from .api import classrooms, coursework, student
+from .api import classrooms, coursework, student, uploads, files
 
 models.Base.metadata.create_all(bind=engine)
 app = FastAPI()
@@ -14,7 +21,10 @@ app = FastAPI()
 @app.on_event("startup")
 def on_startup():
     print("Application starting up...")
-    check_minio_bucket()
+    check_storage()
+    warm_up_prompts()
+    # With TASK_BACKEND=local, periodic tasks run in this process
+    start_local_scheduler(BEAT_SCHEDULE)
 
 origins = ["http://localhost:3000"]
 app.add_middleware(
@@ -23,7 +33,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Submission-ID"],
+    expose_headers=["X-Submission-ID", "X-Summary-Computed-At", "X-Summary-Age", "X-Summary-Stale"],
 )
 
 def get_db():
@@ -37,6 +47,8 @@ def get_db():
 app.include_router(classrooms.router)
 app.include_router(coursework.router)
 app.include_router(student.router)
+app.include_router(uploads.router)
+app.include_router(files.router)
 
 # --- Auth Endpoints (from M3.5) ---
 @app.post("/api/auth/register", status_code=status.HTTP_201_CREATED)
@@ -87,6 +99,16 @@ def login_for_access_token(user_login: schemas.UserLogin, db: Session = Depends(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
+@app.get("/metrics", include_in_schema=False, dependencies=[Depends(auth.require_ops_token)])
+def metrics():
+    """Prometheus scrape endpoint: pipeline spans, caches, task publishing and queue signals."""
+    return Response(export_metrics() + export_queue_signals(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/ops/queues", include_in_schema=False, dependencies=[Depends(auth.require_ops_token)])
+def ops_queues():
+    """Queue depth, age, throughput and drain projections (read by scripts/autoscaler.py)."""
+    return {"generated_at": time.time(), "queues": queue_signals()}
+
 @app.get("/")
 def read_root():
     return {"message": "Welcome to the A-LMS Backend! Coursework module is active."}
\ No newline at end of file
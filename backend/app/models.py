@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Float, Text, JSON
+from sqlalchemy import Column, Integer, String, ForeignKey, Boolean, DateTime, Float, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from .database import Base
 import secrets
@@ -151,4 +151,67 @@ class RemedialOption(Base):
     option_text = Column(Text, nullable=False)
     is_correct = Column(Boolean, default=False, nullable=False)
     
-    question = relationship("RemedialQuestion", back_populates="options")
\ No newline at end of file
+    question = relationship("RemedialQuestion", back_populates="options")
+
+# --- AI Quiz Generation Jobs ---
+class QuizGenerationJob(Base):
+    __tablename__ = "quiz_generation_jobs"
+    id = Column(Integer, primary_key=True, index=True)
+    teacher_id = Column(Integer, ForeignKey("users.id"))
+    status = Column(String, default="PENDING", nullable=False) # PENDING, RUNNING, COMPLETED, FAILED
+    request = Column(JSON, nullable=False) # The original QuizGenerationRequest
+    num_questions = Column(Integer, nullable=False)
+    questions = Column(MutableList.as_mutable(JSON), nullable=False, default=[]) # Grows batch by batch
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# --- Pipeline Traces (per-node timings for one pipeline run) ---
+class PipelineTrace(Base):
+    __tablename__ = "pipeline_traces"
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, index=True, nullable=False) # e.g. ai_evaluation, planner
+    submission_id = Column(Integer, index=True, nullable=True)
+    coursework_id = Column(Integer, index=True, nullable=True)
+    tags = Column(JSON, nullable=True)
+    spans = Column(JSON, nullable=False, default=[])
+    total_ms = Column(Float, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# --- Direct-to-storage Upload Sessions ---
+class UploadSession(Base):
+    __tablename__ = "upload_sessions"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    purpose = Column(String, nullable=False) # submission, rubric, material
+    object_key = Column(String, unique=True, nullable=False)
+    filename = Column(String, nullable=False)
+    content_type = Column(String, nullable=True)
+    expected_size = Column(Integer, nullable=False) # Declared by the client when the session is opened
+    size = Column(Integer, nullable=True) # Confirmed from storage
+    status = Column(String, default="PENDING", nullable=False) # PENDING, UPLOADED, READY, SUBMITTED, FAILED, EXPIRED
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(DateTime(timezone=True), nullable=False)
+
+# --- Stored Objects (content-addressed uploads and their reference counts) ---
+class StoredObject(Base):
+    __tablename__ = "stored_objects"
+    key = Column(String, primary_key=True) # objects/sha256/<hash>.<ext>, or an upload-session key
+    sha256 = Column(String, index=True, nullable=True) # Unknown for direct uploads until parsed
+    size = Column(Integer, nullable=True)
+    content_type = Column(String, nullable=True)
+    ref_count = Column(Integer, default=0, nullable=False) # Coursework and submission columns pointing at it
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_seen_at = Column(DateTime(timezone=True), server_default=func.now()) # Last upload or release; GC grace starts here
+
+# --- Precomputed Classroom Summaries (refreshed on a schedule, served as-is) ---
+class ClassroomSummary(Base):
+    __tablename__ = "classroom_summaries"
+    __table_args__ = (UniqueConstraint("classroom_id", "kind"),)
+    id = Column(Integer, primary_key=True, index=True)
+    classroom_id = Column(Integer, ForeignKey("classrooms.id"), index=True, nullable=False)
+    kind = Column(String, nullable=False) # analytics, gradebook, mastery
+    data = Column(JSON, nullable=False) # The endpoint's response body
+    compute_ms = Column(Float, nullable=True)
+    computed_at = Column(DateTime(timezone=True), nullable=False)
\ No newline at end of file
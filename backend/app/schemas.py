@@ -168,15 +168,39 @@ class QuizGenerationRequest(BaseModel):
     topic: Optional[str] = None # Optional now
     material_file_urls: List[str] # --- NEW ---
     num_questions: int; difficulty: str
+    concept_tags: Optional[List[str]] = None # Focus retrieval on these concepts
+    page_ranges: Optional[str] = None # e.g. "45-80, 102"; PDF materials are only read on these pages
 
 class QuizGenerationResponse(BaseModel):
     questions: List[QuestionCreate]
+
+class QuizGenerationJobDisplay(BaseModel):
+    id: int; status: str; num_questions: int
+    questions: List[QuestionCreate] = []
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
     
 # --- NEW: Schema for Teacher Approval (Req #2) ---
 class SubmissionApproval(BaseModel):
     teacher_override_score: Optional[float] = None # Score between 0.0 and 1.0
     teacher_feedback: Optional[str] = None
 
+class SubmissionOverride(SubmissionApproval):
+    submission_id: int
+
+class BulkApprovalRequest(BaseModel):
+    # Either every PENDING_REVIEW submission of a coursework, or explicit ids
+    coursework_id: Optional[int] = None
+    submission_ids: Optional[List[int]] = None
+    overrides: List[SubmissionOverride] = [] # Per-submission score/feedback; others keep theirs
+
+class BulkApprovalResult(BaseModel):
+    approved: int; students: int
+    submission_ids: List[int]
+
 class DSKGNode(BaseModel):
     concept: str
     score: float
@@ -189,3 +213,41 @@ class DSKGProfileResponse(BaseModel):
 class CourseworkForStudentList(CourseworkDisplay):
     submission_id: Optional[int] = None
 
+
+
+class TraceSpanDisplay(BaseModel):
+    name: str; kind: str
+    offset_ms: Optional[float] = None; duration_ms: Optional[float] = None
+    prompt_tokens: int = 0; completion_tokens: int = 0
+    cache_hits: int = 0; cache_misses: int = 0; retries: int = 0
+    error: Optional[str] = None
+
+class PipelineTraceDisplay(BaseModel):
+    id: int; name: str
+    submission_id: Optional[int] = None; coursework_id: Optional[int] = None
+    tags: Optional[dict] = None
+    spans: List[TraceSpanDisplay]
+    total_ms: Optional[float] = None
+    created_at: Optional[datetime] = None
+    class Config:
+        from_attributes = True
+
+# --- Direct-to-storage Upload Sessions ---
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int # Bytes the client is about to upload
+    content_type: Optional[str] = None
+    purpose: str = "submission" # submission, rubric, material
+
+class UploadSessionDisplay(BaseModel):
+    id: int; purpose: str; object_key: str; filename: str
+    status: str
+    size: Optional[int] = None
+    error: Optional[str] = None
+    expires_at: Optional[datetime] = None
+    upload_url: Optional[str] = None # Presigned PUT URL, only returned when the session is opened
+    class Config:
+        from_attributes = True
+
+class UploadSubmissionCreate(BaseModel):
+    upload_session_id: int
\ No newline at end of file
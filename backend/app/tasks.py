@@ -1,31 +1,70 @@
 from .celery_worker import celery_app
+from celery.signals import worker_process_init
 from .database import SessionLocal
 from . import models, schemas, crud
 from .agents.evaluation_chain import evaluation_graph, get_text_from_url
 import logging
 import json
+import os
+from typing import List, Optional
 from .agents.quiz_grader import grade_quiz
-from .agents.dskg_agent import update_dskg_from_submission
+from .agents.submission_pipeline import run_post_approval_pipeline
 from .agents.planner_agent import run_planner
+from .agents.quiz_generator import load_quiz_context, generate_quiz_batches
+from .agents.prompt_registry import warm_up as warm_up_prompts
+from .agents.material_index import MATERIAL_INDEX_MAX_CHARS, get_material_index
+from .agents.classroom_summaries import refresh_classroom
+from .core.tracing import start_trace, span, add_trace_tags
+from .core.task_dedupe import DedupedTask
+from .core.admission import ADMISSION_DECISIONS, admission_state, queue_for
+from .core import task_metrics  # noqa: F401 (registers the Celery signal handlers)
+from .core.extraction import ExtractionError, UnsupportedFileType
+from .core.extraction_cache import extract_object_pages_cached, extract_object_text_cached
 logger = logging.getLogger(__name__)
 
+@worker_process_init.connect
+def _warm_up_worker(**kwargs):
+    # Build every prompt/structured chain once per worker process, not per task
+    warm_up_prompts()
+
+def _save_trace(db, trace):
+    """Persists a finished trace. Tracing must never fail the task itself."""
+    try:
+        crud.save_pipeline_trace(db, trace)
+    except Exception as e:
+        logger.warning(f"Could not save pipeline trace '{trace.name}': {e}")
+        db.rollback()
+
 # --- Task 1: Quiz Grader (No change in task logic) ---
 from .agents.quiz_grader import grade_quiz
-@celery_app.task
+@celery_app.task(base=DedupedTask, dedupe_key="grade:submission:{0}")
 def run_quiz_grading(submission_id: int):
     logger.info(f"--- Starting Quiz Grading for Submission {submission_id} ---")
     db = SessionLocal()
     try:
-        grade_quiz(db, submission_id)
+        with start_trace("quiz_grading", submission_id=submission_id) as trace:
+            with span("quiz_grading.grade"):
+                grade_quiz(db, submission_id)
+        _save_trace(db, trace)
+        _refresh_summaries(db, [submission_id])
     finally:
         db.close()
 
 # --- Task 2: Essay/File Grader (UPDATED) ---
-@celery_app.task
+@celery_app.task(base=DedupedTask, dedupe_key="evaluate:submission:{0}")
 def run_ai_evaluation(submission_id: int):
     logger.info(f"--- Starting AI Evaluation for Submission {submission_id} ---")
     
     db = SessionLocal()
+    try:
+        with start_trace("ai_evaluation", submission_id=submission_id) as trace:
+            _evaluate_submission(db, submission_id)
+        _save_trace(db, trace)
+        _refresh_summaries(db, [submission_id])
+    finally:
+        db.close()
+
+def _evaluate_submission(db, submission_id: int):
     try:
         submission = db.query(models.Submission).get(submission_id)
         if not submission:
@@ -33,12 +72,14 @@ def run_ai_evaluation(submission_id: int):
             return
 
         coursework = db.query(models.Coursework).get(submission.coursework_id)
+        add_trace_tags(coursework_id=coursework.id)
         
         # --- 1. Get Rubric Text ---
         rubric_text = ""
         if coursework.rubric_file_url:
             logger.info(f"Fetching rubric from URL: {coursework.rubric_file_url}")
-            rubric_text = get_text_from_url(coursework.rubric_file_url)
+            with span("extract.rubric", kind="extract"):
+                rubric_text = get_text_from_url(coursework.rubric_file_url)
         elif coursework.rubric:
             logger.info("Using JSON rubric.")
             rubric_text = json.dumps(coursework.rubric)
@@ -50,7 +91,8 @@ def run_ai_evaluation(submission_id: int):
         submission_text_content = ""
         if submission.submission_file_url:
             logger.info(f"Fetching submission from URL: {submission.submission_file_url}")
-            submission_text_content = get_text_from_url(submission.submission_file_url)
+            with span("extract.submission", kind="extract"):
+                submission_text_content = get_text_from_url(submission.submission_file_url)
             # Save extracted text for future viewing
             submission.submission_text = submission_text_content
         elif submission.submission_text:
@@ -86,10 +128,11 @@ def run_ai_evaluation(submission_id: int):
             total_score += item.score
             max_score += item.max_points
 
-        submission.ai_feedback = feedback_list
-        submission.score = float(total_score) / float(max_score) if max_score > 0 else 0.0
-        submission.status = "PENDING_REVIEW"
-        db.commit()
+        with span("db.save_results", kind="db"):
+            submission.ai_feedback = feedback_list
+            submission.score = float(total_score) / float(max_score) if max_score > 0 else 0.0
+            submission.status = "PENDING_REVIEW"
+            db.commit()
         
         logger.info(f"--- Finished AI Evaluation for Submission {submission_id}. Score: {submission.score} ---")
         
@@ -100,10 +143,8 @@ def run_ai_evaluation(submission_id: int):
         if submission_to_fail:
             submission_to_fail.status = "ERROR"
             db.commit()
-    finally:
-        db.close()
 
-@celery_app.task
+@celery_app.task(base=DedupedTask, dedupe_key="regrade:question:{0}")
 def regrade_quiz_submissions_for_question(question_id: int):
     logger.info(f"--- Starting Regrade for Question {question_id} ---")
     db = SessionLocal()
@@ -123,21 +164,17 @@ def regrade_quiz_submissions_for_question(question_id: int):
     finally:
         db.close()
 
-@celery_app.task
+@celery_app.task(base=DedupedTask, dedupe_key="dskg:submission:{0}")
 def run_dskg_update(submission_id: int):
     logger.info(f"--- Task: Starting DSKG Update for {submission_id} ---")
     db = SessionLocal()
     try:
-        submission = crud.get_submission_detail(db, submission_id)
-        if not submission:
-            logger.error(f"DSKG update failed: No submission {submission_id}")
-            return
-            
-        update_dskg_from_submission(db, submission_id)
-        
-        # --- CHAIN THE NEXT TASK ---
-        # After updating memory, run the planner
-        task_run_planner.delay(submission.student_id)
+        with start_trace("dskg_update", submission_id=submission_id) as trace:
+            result = run_post_approval_pipeline(db, [submission_id], task_run_planner.delay)
+            if result.snapshots:
+                snapshot = result.snapshots[0]
+                add_trace_tags(coursework_id=snapshot.coursework_id, student_id=snapshot.student_id)
+        _save_trace(db, trace)
         
     except Exception as e:
         logger.error(f"Error in DSKG update task: {e}", exc_info=True)
@@ -145,14 +182,206 @@ def run_dskg_update(submission_id: int):
         db.close()
 
 @celery_app.task
+def run_dskg_update_batch(submission_ids: List[int]):
+    """DSKG update for a bulk approval: one graph transaction, one planner trigger per student."""
+    logger.info(f"--- Task: Starting batched DSKG Update for {len(submission_ids)} submission(s) ---")
+    db = SessionLocal()
+    try:
+        with start_trace("dskg_update_batch", submissions=len(submission_ids)) as trace:
+            result = run_post_approval_pipeline(db, submission_ids, task_run_planner.delay)
+            add_trace_tags(students=len(result.planned_students))
+        _save_trace(db, trace)
+    except Exception as e:
+        logger.error(f"Error in batched DSKG update task: {e}", exc_info=True)
+    finally:
+        db.close()
+
+# Approving several of a student's submissions in a row triggers the planner
+# once per approval; runs within this window are folded into one
+PLANNER_DEBOUNCE_SECONDS = int(os.environ.get("PLANNER_DEBOUNCE_SECONDS", "60"))
+
+@celery_app.task(base=DedupedTask, dedupe_key="planner:student:{0}", dedupe_countdown=PLANNER_DEBOUNCE_SECONDS)
 def task_run_planner(student_id: int):
-    """Celery task wrapper for the planner agent."""
+    """
+    Celery task wrapper for the planner agent. Debounced per student: the run
+    happens PLANNER_DEBOUNCE_SECONDS after the first trigger and sees every
+    DSKG update made in the meantime.
+    """
     logger.info(f"--- Task: Starting Planner for Student {student_id} ---")
     db = SessionLocal()
     try:
         # Call the *actual* planner function from planner_agent.py
-        run_planner(db, student_id)
+        with start_trace("planner", student_id=student_id) as trace:
+            run_planner(db, student_id)
+        _save_trace(db, trace)
     except Exception as e:
         logger.error(f"Error in planner task: {e}", exc_info=True)
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
+
+@celery_app.task
+def run_quiz_generation(job_id: int):
+    """Generates a quiz batch by batch, publishing questions as they are produced."""
+    logger.info(f"--- Task: Starting Quiz Generation Job {job_id} ---")
+    db = SessionLocal()
+    try:
+        with start_trace("quiz_generation", job_id=job_id) as trace:
+            _generate_quiz_for_job(db, job_id)
+        _save_trace(db, trace)
+    finally:
+        db.close()
+
+def _generate_quiz_for_job(db, job_id: int):
+    try:
+        db_job = crud.get_quiz_generation_job(db, job_id)
+        if not db_job:
+            logger.error(f"Quiz generation failed: No job {job_id}")
+            return
+        request = schemas.QuizGenerationRequest(**db_job.request)
+        crud.update_quiz_generation_job(db, job_id, "RUNNING")
+
+        concepts = list(request.concept_tags or [])
+        if request.topic:
+            concepts.append(request.topic)
+        context_text = load_quiz_context(
+            request.material_file_urls, concepts, request.num_questions, request.page_ranges
+        )
+        if not context_text.strip():
+            crud.update_quiz_generation_job(
+                db, job_id, "FAILED", error="Could not extract text from any provided material files."
+            )
+            return
+
+        for batch in generate_quiz_batches(context_text, request.num_questions, request.difficulty):
+            crud.append_quiz_generation_questions(db, job_id, batch)
+            logger.info(f"Quiz generation job {job_id}: published {len(batch)} question(s).")
+
+        crud.update_quiz_generation_job(db, job_id, "COMPLETED")
+    except Exception as e:
+        logger.error(f"Error in quiz generation task: {e}", exc_info=True)
+        db.rollback()
+        crud.update_quiz_generation_job(db, job_id, "FAILED", error=str(e))
+
+# --- Direct-to-storage uploads ---
+@celery_app.task(base=DedupedTask, dedupe_key="extract:upload:{0}")
+def run_upload_extraction(session_id: int):
+    """
+    Parses a file the client uploaded straight to storage, so the text (and,
+    for course material, the chunk index) is cached before anyone needs it.
+    """
+    logger.info(f"--- Task: Extracting Upload Session {session_id} ---")
+    db = SessionLocal()
+    try:
+        upload = crud.get_upload_session(db, session_id)
+        if not upload:
+            logger.error(f"Upload extraction failed: No session {session_id}")
+            return
+        with start_trace("upload_extraction", upload_session_id=session_id) as trace:
+            if upload.purpose == "material":
+                # Materials are only ever read through the budgeted page store
+                with span("extract.upload", kind="extract"):
+                    extract_object_pages_cached(upload.object_key, max_chars=MATERIAL_INDEX_MAX_CHARS)
+                with span("material_index.build"):
+                    get_material_index(upload.object_key)
+            else:
+                with span("extract.upload", kind="extract"):
+                    extract_object_text_cached(upload.object_key)
+        _save_trace(db, trace)
+        _finish_upload(db, session_id, "READY")
+    except UnsupportedFileType as e:
+        # Only the header was sniffed at confirmation time; the full parse found it unusable
+        logger.warning(f"Upload session {session_id} rejected: {e}")
+        _finish_upload(db, session_id, "FAILED", error=str(e))
+    except ExtractionError as e:
+        logger.error(f"Upload session {session_id} extraction failed: {e}")
+        _finish_upload(db, session_id, "FAILED", error=str(e))
+    except Exception as e:
+        # Storage or index errors: do not leave the session UPLOADED forever
+        logger.error(f"Error extracting upload session {session_id}: {e}", exc_info=True)
+        db.rollback()
+        _finish_upload(db, session_id, "FAILED", error=str(e))
+    finally:
+        db.close()
+
+def _finish_upload(db, session_id: int, status: str, error: Optional[str] = None):
+    # A session submitted while this task ran stays SUBMITTED (grading extracts it again if needed)
+    crud.update_upload_session(db, session_id, status, error=error, only_from=("UPLOADED",))
+
+# --- Admission control ---
+ADMISSION_RELEASE_BATCH = int(os.environ.get("ADMISSION_RELEASE_BATCH", "100"))
+
+def grading_task_for(coursework_type: str):
+    """The task that grades a submission of this coursework type."""
+    return run_quiz_grading if coursework_type == "quiz" else run_ai_evaluation
+
+@celery_app.task(base=DedupedTask, dedupe_key="admission:release")
+def release_deferred_submissions():
+    """
+    Enqueues grading for submissions that admission control deferred, oldest
+    first, as far as each queue has headroom. Runs on the beat schedule.
+    """
+    db = SessionLocal()
+    try:
+        deferred = crud.get_deferred_submissions(db, ADMISSION_RELEASE_BATCH)
+        if not deferred:
+            return
+        state = admission_state(refresh=True)
+        headroom = {}
+        selected = {}
+        for submission_id, coursework_type in deferred:
+            task = grading_task_for(coursework_type)
+            queue = queue_for(task)
+            headroom.setdefault(queue, state.headroom(queue))
+            if headroom[queue] > 0:
+                headroom[queue] -= 1
+                selected[submission_id] = task
+
+        released = crud.release_deferred_submissions(db, list(selected))
+        for submission_id in released:
+            task = selected[submission_id]
+            task.delay(submission_id)
+            ADMISSION_DECISIONS.labels("released", queue_for(task)).inc()
+        logger.info(f"Admission control: released {len(released)} of {len(deferred)} deferred submission(s).")
+    except Exception as e:
+        logger.error(f"Error releasing deferred submissions: {e}", exc_info=True)
+    finally:
+        db.close()
+
+# --- Precomputed classroom summaries ---
+@celery_app.task(base=DedupedTask, dedupe_key="summaries:refresh")
+def refresh_classroom_summaries():
+    """Recomputes every classroom's dashboard summaries. Runs on the beat schedule."""
+    db = SessionLocal()
+    try:
+        with start_trace("classroom_summaries") as trace:
+            classroom_ids = crud.get_classroom_ids(db)
+            for classroom_id in classroom_ids:
+                refresh_classroom(db, classroom_id)
+            add_trace_tags(classrooms=len(classroom_ids))
+        _save_trace(db, trace)
+        logger.info(f"Refreshed summaries for {len(classroom_ids)} classroom(s) in {trace.total_ms:.0f} ms.")
+    except Exception as e:
+        logger.error(f"Error refreshing classroom summaries: {e}", exc_info=True)
+    finally:
+        db.close()
+
+# Every graded or approved submission asks for its classroom's summaries to
+# be refreshed; requests within this window are folded into one run
+SUMMARY_REFRESH_DEBOUNCE_SECONDS = int(os.environ.get("SUMMARY_REFRESH_DEBOUNCE_SECONDS", "15"))
+
+@celery_app.task(base=DedupedTask, dedupe_key="summaries:classroom:{0}", dedupe_countdown=SUMMARY_REFRESH_DEBOUNCE_SECONDS)
+def refresh_classroom_summary(classroom_id: int):
+    """Recomputes one classroom's summaries after grading or approval, or when a stale one was served."""
+    db = SessionLocal()
+    try:
+        refresh_classroom(db, classroom_id)
+    finally:
+        db.close()
+
+def _refresh_summaries(db, submission_ids: List[int]):
+    try:
+        for classroom_id in crud.get_classroom_ids_for_submissions(db, submission_ids):
+            refresh_classroom_summary.delay(classroom_id)
+    except Exception as e:
+        # The beat refresh catches up
+        logger.warning(f"Could not schedule summary refresh for submissions {submission_ids}: {e}")
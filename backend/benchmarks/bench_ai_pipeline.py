@@ -0,0 +1,125 @@
+"""
+Offline load benchmark for the AI pipeline.
+
+Drives essay grading, rubric parsing, quiz generation and remedial quiz
+generation against the record/replay model provider at a target request
+rate and reports end-to-end latency per workload.
+
+Run from the backend directory:
+    python -m benchmarks.bench_ai_pipeline --rps 20 --duration 30 --latency lognormal:-0.5:0.4
+"""
+import argparse
+import os
+import statistics
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+RECORDINGS = os.path.join(os.path.dirname(__file__), "recordings", "ai_pipeline.json")
+
+ESSAY = (
+    "Cellular respiration converts glucose into usable energy. In this essay I argue that "
+    "mitochondria are the most important organelle because nearly all ATP is produced there. "
+) * 20
+RUBRIC = "Thesis (10 pts): clear and arguable. Evidence (10 pts): relevant and cited. Grammar (5 pts)."
+CONTEXT = (
+    "Photosynthesis converts light energy into chemical energy stored in glucose. "
+    "Cellular respiration releases that energy as ATP inside the mitochondria. "
+) * 40
+
+def _workloads():
+    # Imported lazily so the provider env vars are set first
+    from app import schemas
+    from app.agents.evaluation_chain import evaluation_graph
+    from app.agents.planner_agent import generate_remedial_quiz
+    from app.agents.quiz_generator import generate_quiz
+    from app.api.coursework import parse_rubric_with_ai
+
+    return {
+        "essay_grading": lambda: evaluation_graph.invoke({
+            "submission_id": 0, "submission_text": ESSAY, "rubric_text": RUBRIC
+        }),
+        "rubric_parsing": lambda: parse_rubric_with_ai(
+            schemas.RubricParseRequest(raw_text=RUBRIC), current_user=None
+        ),
+        "quiz_generation": lambda: generate_quiz(CONTEXT, 5, "Medium"),
+        "remedial_generation": lambda: generate_remedial_quiz("cellular respiration"),
+    }
+
+def _percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+def run(workload_names, rps, duration, concurrency):
+    workloads = _workloads()
+    selected = {name: workloads[name] for name in workload_names}
+    latencies = {name: [] for name in selected}
+    errors = {name: 0 for name in selected}
+    lock = threading.Lock()
+
+    def _call(name, scheduled_at):
+        try:
+            selected[name]()
+            failed = False
+        except Exception as e:
+            print(f"[{name}] error: {e}", file=sys.stderr)
+            failed = True
+        # Measured from the scheduled start, so queueing inside the pool counts (open loop)
+        elapsed = time.perf_counter() - scheduled_at
+        with lock:
+            if failed:
+                errors[name] += 1
+            else:
+                latencies[name].append(elapsed)
+
+    names = list(selected)
+    interval = 1.0 / rps
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        sent = 0
+        while True:
+            scheduled_at = started + sent * interval
+            if scheduled_at - started >= duration:
+                break
+            delay = scheduled_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(_call, names[sent % len(names)], scheduled_at)
+            sent += 1
+    wall = time.perf_counter() - started
+
+    print(f"\nSent {sent} requests in {wall:.1f}s (target {rps} rps, {concurrency} workers)\n")
+    print(f"{'workload':<22}{'ok':>6}{'err':>6}{'rps':>8}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for name in names:
+        values = latencies[name]
+        if not values:
+            print(f"{name:<22}{0:>6}{errors[name]:>6}")
+            continue
+        print(
+            f"{name:<22}{len(values):>6}{errors[name]:>6}{len(values) / wall:>8.1f}"
+            f"{statistics.median(values) * 1000:>10.1f}{_percentile(values, 90) * 1000:>10.1f}"
+            f"{_percentile(values, 99) * 1000:>10.1f}{max(values) * 1000:>10.1f}"
+        )
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rps", type=float, default=10.0, help="Target request rate across all workloads")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds to generate load for")
+    parser.add_argument("--concurrency", type=int, default=32, help="Worker threads")
+    parser.add_argument("--latency", default="lognormal:-0.7:0.5", help="Replay latency distribution")
+    parser.add_argument("--recordings", default=RECORDINGS, help="Recorded structured outputs (JSON)")
+    parser.add_argument(
+        "--workloads", nargs="+",
+        default=["essay_grading", "rubric_parsing", "quiz_generation", "remedial_generation"]
+    )
+    args = parser.parse_args()
+
+    os.environ["LLM_PROVIDER"] = "replay"
+    os.environ["LLM_RECORDINGS_PATH"] = args.recordings
+    os.environ["LLM_REPLAY_LATENCY"] = args.latency
+    run(args.workloads, args.rps, args.duration, args.concurrency)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Micro-benchmark of per-call chain construction overhead.
+
+"before" rebuilds the prompt template and `with_structured_output` chain on
+every call (what the agents used to do); "after" fetches the shared chain
+from the prompt registry. Both then format the prompt, so the numbers show
+the hot-path overhead without any model latency.
+
+Run from the backend directory:
+    python -m benchmarks.bench_prompt_registry --iterations 2000
+"""
+import argparse
+import os
+import statistics
+import time
+
+SAMPLE_INPUTS = {
+    "rubric_grader": {"rubric": "Thesis (10 pts)", "submission": "An essay."},
+    "rubric_parser": {"raw_text": "Clarity (10 pts) and Grammar (5 pts)"},
+    "quiz_generation": {"num_questions": 5, "difficulty": "Medium", "context": "Cells.", "avoid": ""},
+    "remedial_quiz": {"concept": "photosynthesis"},
+}
+
+def _time_per_call(fn, iterations):
+    samples = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return statistics.median(samples) * 1e6, statistics.mean(samples) * 1e6
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=1000)
+    args = parser.parse_args()
+
+    # The real Gemini client is built (it converts the schema for tool calling) but never called
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    from langchain_core.prompts import ChatPromptTemplate
+    from app.agents import evaluation_chain, planner_agent, quiz_generator  # noqa: F401 (registers prompts)
+    from app.api import coursework  # noqa: F401 (registers the rubric parser)
+    from app.agents.llm_provider import get_llm
+    from app.agents.prompt_registry import _specs, get_chain, warm_up
+
+    llm = get_llm()
+    warm_up()
+
+    print(f"{'prompt':<18}{'before us':>12}{'after us':>12}{'speedup':>10}")
+    for name, spec in _specs.items():
+        inputs = SAMPLE_INPUTS[name]
+
+        def before():
+            prompt = ChatPromptTemplate.from_messages(spec.messages)
+            chain = prompt | llm.with_structured_output(spec.schema)
+            chain.first.invoke(inputs)
+
+        def after():
+            chain = get_chain(name)
+            chain.bound.first.invoke(inputs)
+
+        before_median, _ = _time_per_call(before, args.iterations)
+        after_median, _ = _time_per_call(after, args.iterations)
+        print(f"{name:<18}{before_median:>12.1f}{after_median:>12.1f}{before_median / after_median:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+Concurrency check for async upload handlers.
+
+Uploads several large DOCX rubrics to /api/coursework/upload-rubric at once
+while probing GET / every few milliseconds on the same event loop. If parsing
+ran on the loop, probe latency would jump to the parse time; with extraction
+in the process pool it should stay in the low milliseconds.
+
+Needs the configured object storage to be reachable (it backs the extraction
+cache); STORAGE_BACKEND=local needs nothing running. Run from the backend directory:
+    python -m benchmarks.bench_upload_concurrency --uploads 4 --paragraphs 20000
+"""
+import argparse
+import asyncio
+import io
+import os
+import statistics
+import time
+
+def _make_docx(paragraphs: int, seed: int) -> bytes:
+    import docx
+    document = docx.Document()
+    for i in range(paragraphs):
+        # Unique content per upload so the extraction cache does not short-circuit the parse
+        document.add_paragraph(f"Upload {seed} criterion {i}: evidence, structure and clarity ({i % 10} pts).")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+async def _probe(client, stop: asyncio.Event, interval: float, latencies: list):
+    while not stop.is_set():
+        started = time.perf_counter()
+        response = await client.get("/")
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+        await asyncio.sleep(interval)
+
+async def _upload(client, payload: bytes, index: int, durations: list):
+    started = time.perf_counter()
+    response = await client.post(
+        "/api/coursework/upload-rubric",
+        files={"file": (f"rubric-{index}.docx", payload, "application/octet-stream")}
+    )
+    durations.append(time.perf_counter() - started)
+    if response.status_code != 200:
+        print(f"upload {index} failed: {response.status_code} {response.text[:200]}")
+
+async def run(uploads: int, paragraphs: int, interval: float):
+    import httpx
+    from app import auth, models
+    from app.main import app
+
+    app.dependency_overrides[auth.get_teacher_user] = lambda: models.User(
+        id=0, email="bench@example.com", role="teacher", is_approved=True
+    )
+    payloads = [_make_docx(paragraphs, i) for i in range(uploads)]
+    print(f"{uploads} upload(s) of {len(payloads[0]) / 1e6:.1f} MB each")
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+        baseline = []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, interval, baseline))
+        await asyncio.sleep(1.0)
+        stop.set(); await probe
+
+        during, durations = [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(_probe(client, stop, interval, during))
+        await asyncio.gather(*(_upload(client, p, i, durations) for i, p in enumerate(payloads)))
+        stop.set(); await probe
+
+    def _fmt(values):
+        return (
+            f"n={len(values):<5} p50={statistics.median(values) * 1000:7.1f} ms  "
+            f"max={max(values) * 1000:7.1f} ms"
+        )
+    print(f"probe latency, idle:          {_fmt(baseline)}")
+    print(f"probe latency, while parsing: {_fmt(during)}")
+    print(f"upload duration:              {_fmt(durations)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--paragraphs", type=int, default=20000)
+    parser.add_argument("--interval", type=float, default=0.01, help="Seconds between probes")
+    args = parser.parse_args()
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    asyncio.run(run(args.uploads, args.paragraphs, args.interval))
+
+if __name__ == "__main__":
+    main()
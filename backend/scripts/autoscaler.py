@@ -0,0 +1,205 @@
+"""
+Reference autoscaler: starts and stops local Celery worker processes per
+queue from the queue signals (app/core/queue_signals.py, also served on
+/ops/queues).
+
+Each managed worker consumes one queue profile with the profile's
+concurrency (see app/celery_worker.py). Every --interval seconds, per queue:
+
+    workers = ceil(required_concurrency / profile concurrency)
+
+clamped to [--min, --max], where required_concurrency is the number of task
+slots that clears the current backlog within the queue's drain_sla. A queue
+with messages but no measured throughput yet gets one worker. Scaling up is
+immediate; scaling down waits until the lower target has held for
+--cooldown seconds and stops the newest worker with SIGTERM (Celery's warm
+shutdown lets running tasks finish). With --min 0 an idle queue runs no
+workers at all.
+
+With --url the signals come from a running API; /ops/queues needs the API's
+OPS_TOKEN, read from the environment here too.
+
+Run from the backend directory:
+    python -m scripts.autoscaler grading llm --max 6
+    OPS_TOKEN=... python -m scripts.autoscaler --all --url http://localhost:8000/ops/queues --dry-run
+"""
+import argparse
+import math
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+
+from scripts.run_worker import build_command
+
+METRICS_BASE_PORT = 9820 # Managed workers get METRICS_BASE_PORT + 100 * queue position + slot
+
+def read_signals(url: Optional[str]) -> dict:
+    if url:
+        import requests
+
+        token = os.environ.get("OPS_TOKEN")
+        headers = {"Authorization": f"Bearer {token}"} if token else {}
+        response = requests.get(url, headers=headers, timeout=5)
+        response.raise_for_status()
+        return response.json()["queues"]
+    from app.core.queue_signals import queue_signals
+
+    return queue_signals()
+
+class QueueScaler:
+    """The worker processes of one queue."""
+
+    def __init__(self, queue: str, position: int, args):
+        from app.celery_worker import QUEUE_PROFILES
+
+        self.queue = queue
+        self.position = position
+        self.concurrency = args.concurrency or QUEUE_PROFILES[queue]["concurrency"]
+        self.minimum, self.maximum = args.min, args.max
+        self.cooldown = args.cooldown
+        self.loglevel = args.loglevel
+        self.dry_run = args.dry_run
+        self.workers: List[subprocess.Popen] = []
+        self.stopping: List[subprocess.Popen] = [] # SIGTERM sent, finishing their tasks
+        self.planned = 0 # Stands in for len(workers) in --dry-run
+        self.started = 0 # Names and metrics ports are never reused while an old worker drains
+        self.lower_since: Optional[float] = None
+
+    @property
+    def running(self) -> int:
+        return self.planned if self.dry_run else len(self.workers)
+
+    def target(self, signals: dict) -> int:
+        depth = signals.get("depth")
+        if depth is None:
+            return self.running # Queue unreadable: hold
+        required = signals.get("required_concurrency")
+        if required is None:
+            wanted = 1 if depth > 0 else 0 # Nothing measured yet
+        else:
+            wanted = math.ceil(required / self.concurrency)
+            if depth > 0:
+                wanted = max(wanted, 1)
+        return max(self.minimum, min(self.maximum, wanted))
+
+    def reconcile(self, signals: dict, now: float):
+        self._reap()
+        target = self.target(signals)
+        if target > self.running:
+            self.lower_since = None
+            self._log(signals, f"scaling up {self.running} -> {target}")
+            while self.running < target:
+                self._start()
+        elif target < self.running:
+            if self.lower_since is None:
+                self.lower_since = now
+            if now - self.lower_since >= self.cooldown:
+                self._log(signals, f"scaling down {self.running} -> {self.running - 1}")
+                self._stop()
+                self.lower_since = now # One worker per cooldown
+        else:
+            self.lower_since = None
+
+    def _log(self, signals: dict, action: str):
+        drain = signals.get("projected_drain_seconds")
+        print(
+            f"[{time.strftime('%H:%M:%S')}] {self.queue}: depth={signals.get('depth')} "
+            f"oldest={_fmt(signals.get('oldest_age_seconds'))}s rate={_fmt(signals.get('throughput_per_second'))}/s "
+            f"drain={_fmt(drain)}s sla={signals.get('drain_sla_seconds')}s -> {action}",
+            flush=True
+        )
+
+    def _start(self):
+        if self.dry_run:
+            self.planned += 1
+            return
+        slot = self.started % 100
+        self.started += 1
+        command = build_command(self.queue, self.concurrency, loglevel=self.loglevel)
+        command[command.index("-n") + 1] = f"{self.queue}-{slot}@%h"
+        env = dict(
+            os.environ,
+            TASK_METRICS_PORT=str(METRICS_BASE_PORT + 100 * self.position + slot),
+            PROMETHEUS_MULTIPROC_DIR=tempfile.mkdtemp(prefix=f"celery-metrics-{self.queue}-"),
+        )
+        self.workers.append(subprocess.Popen(command, env=env))
+
+    def _stop(self):
+        if self.dry_run:
+            self.planned -= 1
+            return
+        worker = self.workers.pop()
+        worker.send_signal(signal.SIGTERM)
+        self.stopping.append(worker)
+
+    def _reap(self):
+        self.stopping = [w for w in self.stopping if w.poll() is None]
+        for worker in [w for w in self.workers if w.poll() is not None]:
+            print(f"{self.queue}: worker pid {worker.pid} exited with {worker.returncode}", flush=True)
+            self.workers.remove(worker)
+
+    def stop_all(self, timeout: float = 60):
+        for worker in self.workers:
+            worker.send_signal(signal.SIGTERM)
+        for worker in self.workers + self.stopping:
+            try:
+                worker.wait(timeout)
+            except subprocess.TimeoutExpired:
+                worker.kill()
+        self.workers, self.stopping = [], []
+
+def _fmt(value) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+def main():
+    from app.celery_worker import QUEUE_PROFILES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queues", nargs="*", help=f"Queues to manage ({', '.join(QUEUE_PROFILES)})")
+    parser.add_argument("--all", action="store_true", help="Manage every queue")
+    parser.add_argument("--url", help="Read signals from an API's /ops/queues instead of Redis directly")
+    parser.add_argument("--min", type=int, default=0, help="Fewest workers per queue")
+    parser.add_argument("--max", type=int, default=4, help="Most workers per queue")
+    parser.add_argument("--concurrency", type=int, help="Processes per worker (default: the profile's)")
+    parser.add_argument("--interval", type=float, default=10, help="Seconds between decisions")
+    parser.add_argument("--cooldown", type=float, default=120, help="Seconds a lower target must hold before scaling down")
+    parser.add_argument("--loglevel", default="info")
+    parser.add_argument("--dry-run", action="store_true", help="Print decisions without starting workers")
+    args = parser.parse_args()
+
+    queues = list(QUEUE_PROFILES) if args.all else args.queues
+    if not queues:
+        parser.error("pick one or more queues, or --all")
+    unknown = sorted(set(queues) - set(QUEUE_PROFILES))
+    if unknown:
+        parser.error(f"unknown queue(s): {', '.join(unknown)}")
+    scalers = [QueueScaler(queue, list(QUEUE_PROFILES).index(queue), args) for queue in queues]
+
+    # Stop the managed workers when we are stopped, too
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    try:
+        while True:
+            try:
+                signals = read_signals(args.url)
+            except Exception as e:
+                # Keep the current workers until the signals come back
+                print(f"Could not read queue signals: {e}", flush=True)
+                signals = {}
+            now = time.monotonic()
+            for scaler in scalers:
+                if scaler.queue in signals:
+                    scaler.reconcile(signals[scaler.queue], now)
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print("Stopping managed workers...", flush=True)
+        for scaler in scalers:
+            scaler.stop_all()
+
+if __name__ == "__main__":
+    main()
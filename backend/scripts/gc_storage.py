@@ -0,0 +1,98 @@
+"""
+Garbage-collects stored objects that nothing references any more.
+
+Uploads are registered in stored_objects and counted as coursework rubrics,
+course materials and submissions point at them. Objects at zero references
+whose last upload or release is older than the grace period (so a file just
+uploaded for a coursework that is still being created is kept) are deleted
+together with their material indexes (one per page range used). Each row is
+re-checked and deleted before its object, and committed only once the object
+is gone, so an upload or reference racing the collector either keeps the
+object or re-registers it. Objects stored before reference counting have no
+row and are never touched.
+
+Run from the backend directory:
+    python -m scripts.gc_storage --dry-run
+    python -m scripts.gc_storage --recount --grace-hours 24
+"""
+import argparse
+from collections import Counter
+from datetime import datetime, timedelta, timezone
+
+def recount_references(db) -> int:
+    """Recomputes every ref_count from the DB columns; repairs drift. Returns rows changed."""
+    from app import crud, models
+
+    counts = Counter()
+    for coursework in db.query(models.Coursework).all():
+        counts.update(crud.coursework_object_keys(coursework))
+    for (key,) in db.query(models.Submission.submission_file_url).filter(
+        models.Submission.submission_file_url.isnot(None)
+    ):
+        counts[key] += 1
+
+    changed = 0
+    for db_object in db.query(models.StoredObject).all():
+        if db_object.ref_count != counts[db_object.key]:
+            print(f"{db_object.key}: ref_count {db_object.ref_count} -> {counts[db_object.key]}")
+            db_object.ref_count = counts[db_object.key]
+            changed += 1
+    db.commit()
+    return changed
+
+def collect_garbage(db, grace: timedelta, dry_run: bool = False):
+    """Deletes orphaned objects. Returns (objects, bytes) removed."""
+    from app import crud
+    from app.agents.material_index import is_index_key_for
+    from app.core.storage import delete_object, list_objects
+
+    removed, freed = 0, 0
+    cutoff = datetime.now(timezone.utc) - grace
+    orphans = [(db_object.key, db_object.size or 0) for db_object in crud.get_orphaned_objects(db, cutoff)]
+    db.rollback()
+    for key, size in orphans:
+        print(f"{'would delete' if dry_run else 'deleting'} {key} ({size} bytes)")
+        if dry_run:
+            continue
+        # Row first: it stays locked, uncommitted, until the bytes are gone
+        if not crud.delete_orphaned_object(db, key, cutoff):
+            db.rollback()
+            print("  kept: referenced or uploaded again since it was listed")
+            continue
+        try:
+            # Sidecars such as <key>.index.json and <key>.pages-1-10.index.json. The
+            # prefix alone would also match <key>.pdf when the key has no extension
+            for sidecar, _ in list(list_objects(key + ".")):
+                if is_index_key_for(key, sidecar):
+                    delete_object(sidecar)
+            delete_object(key)
+        except Exception as e:
+            db.rollback()
+            print(f"  failed: {e}")
+            continue
+        db.commit()
+        removed += 1
+        freed += size
+    return removed, freed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--grace-hours", type=float, default=24, help="Keep unreferenced objects this long")
+    parser.add_argument("--recount", action="store_true", help="Recompute reference counts before collecting")
+    parser.add_argument("--dry-run", action="store_true", help="List what would be deleted")
+    args = parser.parse_args()
+
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        if args.recount:
+            print(f"Recount corrected {recount_references(db)} object(s).")
+        removed, freed = collect_garbage(db, timedelta(hours=args.grace_hours), dry_run=args.dry_run)
+    finally:
+        db.close()
+    if not args.dry_run:
+        print(f"Removed {removed} object(s), {freed} bytes.")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""
+One-time migration: rewrites legacy full-URL file references to object keys.
+
+Older rows stored presigned URLs (http://host/lms-uploads/<key>?X-Amz-...)
+instead of keys in coursework.rubric_file_url, coursework.material_file_urls
+and submissions.submission_file_url. The storage layer now only accepts keys.
+
+Run from the backend directory (safe to run more than once):
+    python -m scripts.normalize_storage_keys --dry-run
+    python -m scripts.normalize_storage_keys
+"""
+import argparse
+from urllib.parse import unquote, urlparse
+
+def legacy_url_to_key(value, bucket: str):
+    """Returns the object key for a legacy URL, or the value unchanged if it is already a key."""
+    if not value or not value.startswith(("http://", "https://")):
+        return value
+    path = unquote(urlparse(value).path)
+    bucket_prefix = f"/{bucket}/"
+    if path.startswith(bucket_prefix):
+        return path[len(bucket_prefix):]
+    # Virtual-host style URL, the bucket is in the hostname
+    return path.lstrip("/")
+
+def normalize(db, bucket: str, dry_run: bool = False) -> int:
+    from app import models
+
+    changed = 0
+    def _report(table, row_id, old, new):
+        nonlocal changed
+        changed += 1
+        print(f"{table} {row_id}: {old[:80]} -> {new}")
+
+    for coursework in db.query(models.Coursework).all():
+        key = legacy_url_to_key(coursework.rubric_file_url, bucket)
+        if key != coursework.rubric_file_url:
+            _report("coursework.rubric_file_url", coursework.id, coursework.rubric_file_url, key)
+            coursework.rubric_file_url = key
+        if coursework.material_file_urls:
+            keys = [legacy_url_to_key(url, bucket) for url in coursework.material_file_urls]
+            if keys != list(coursework.material_file_urls):
+                _report("coursework.material_file_urls", coursework.id, ", ".join(coursework.material_file_urls), ", ".join(keys))
+                coursework.material_file_urls = keys
+
+    for submission in db.query(models.Submission).filter(
+        models.Submission.submission_file_url.like("http%")
+    ).all():
+        key = legacy_url_to_key(submission.submission_file_url, bucket)
+        _report("submissions.submission_file_url", submission.id, submission.submission_file_url, key)
+        submission.submission_file_url = key
+
+    if dry_run:
+        db.rollback()
+    else:
+        db.commit()
+    return changed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dry-run", action="store_true", help="Print the changes without writing them")
+    args = parser.parse_args()
+
+    from app.core.storage_backends import MINIO_BUCKET
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        changed = normalize(db, MINIO_BUCKET, dry_run=args.dry_run)
+    finally:
+        db.close()
+    print(f"{'Would rewrite' if args.dry_run else 'Rewrote'} {changed} value(s).")
+
+if __name__ == "__main__":
+    main()
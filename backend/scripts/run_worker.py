@@ -0,0 +1,76 @@
+"""
+Starts a Celery worker for one queue profile (see app/celery_worker.py).
+
+Each profile consumes a single queue with its own concurrency and prefetch,
+so e.g. an essay backlog on "llm" never delays quiz scoring on "grading".
+Each worker serves task metrics on its own port (9808 + profile position,
+see --list). Run one worker per profile, from the backend directory:
+    python -m scripts.run_worker grading
+    python -m scripts.run_worker llm --concurrency 16
+    python -m scripts.run_worker --all        # single worker for all queues (development)
+    python -m scripts.run_worker --beat       # periodic tasks (exactly one per deployment)
+    python -m scripts.run_worker --list
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+METRICS_BASE_PORT = 9808
+
+def build_command(queue: str, concurrency: int = None, prefetch: int = None, loglevel: str = "info") -> list:
+    from app.celery_worker import QUEUE_PROFILES
+
+    profile = QUEUE_PROFILES[queue]
+    return [
+        sys.executable, "-m", "celery", "-A", "app.celery_worker", "worker",
+        "-Q", queue,
+        "-n", f"{queue}@%h",
+        "--concurrency", str(concurrency or profile["concurrency"]),
+        "--prefetch-multiplier", str(prefetch or profile["prefetch"]),
+        "--loglevel", loglevel,
+    ]
+
+def main():
+    from app.celery_worker import QUEUE_PROFILES, TASK_ROUTES
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("queue", nargs="?", choices=sorted(QUEUE_PROFILES), help="Queue profile to run")
+    parser.add_argument("--all", action="store_true", help="Consume every queue in one worker")
+    parser.add_argument("--concurrency", type=int, help="Override the profile's process count")
+    parser.add_argument("--prefetch", type=int, help="Override the profile's prefetch multiplier")
+    parser.add_argument("--loglevel", default="info")
+    parser.add_argument("--list", action="store_true", help="Show the profiles and their tasks")
+    parser.add_argument("--beat", action="store_true", help="Run the Celery beat scheduler instead of a worker")
+    args = parser.parse_args()
+
+    if args.beat:
+        command = [sys.executable, "-m", "celery", "-A", "app.celery_worker", "beat", "--loglevel", args.loglevel]
+        print(" ".join(command))
+        os.execv(command[0], command)
+
+    if args.list:
+        for position, (queue, profile) in enumerate(QUEUE_PROFILES.items()):
+            tasks = [name.rsplit(".", 1)[-1] for name, routed in TASK_ROUTES.items() if routed == queue]
+            print(f"{queue} (metrics :{METRICS_BASE_PORT + position}): {profile} -> {', '.join(tasks) or '(unrouted tasks)'}")
+        return
+    if args.all:
+        command = build_command("default", args.concurrency, args.prefetch, args.loglevel)
+        command[command.index("-Q") + 1] = ",".join(QUEUE_PROFILES)
+        command[command.index("-n") + 1] = "all@%h"
+    elif args.queue:
+        command = build_command(args.queue, args.concurrency, args.prefetch, args.loglevel)
+    else:
+        parser.error("pick a queue profile or --all")
+
+    # One metrics port per profile so several workers can share a host, and a
+    # multiprocess dir so the exporter sees the prefork children's metrics
+    profile_index = len(QUEUE_PROFILES) if args.all else list(QUEUE_PROFILES).index(args.queue)
+    os.environ.setdefault("TASK_METRICS_PORT", str(METRICS_BASE_PORT + profile_index))
+    os.environ.setdefault("PROMETHEUS_MULTIPROC_DIR", tempfile.mkdtemp(prefix="celery-metrics-"))
+
+    print(" ".join(command))
+    os.execv(command[0], command)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import os
+import sys
+import tempfile
+import uuid
+
+import pytest
+
+# The app reads its configuration at import time: point it at throwaway
+# local backends before any test imports it.
+_workdir = tempfile.mkdtemp(prefix="alms-tests-")
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("TASK_BACKEND", "local")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_workdir, 'test.db')}")
+os.environ.setdefault("STORAGE_BACKEND", "local")
+os.environ.setdefault("LOCAL_STORAGE_ROOT", os.path.join(_workdir, "storage"))
+os.environ.setdefault("STORAGE_SIGNING_KEY", "test-signing-key")
+os.environ.setdefault("LLM_PROVIDER", "replay")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+@pytest.fixture
+def db():
+    from app import models
+    from app.database import SessionLocal, engine
+
+    models.Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+
+@pytest.fixture
+def graded_quiz_submission(db):
+    from app import models
+
+    tag = uuid.uuid4().hex[:8]
+    teacher = models.User(email=f"teacher-{tag}@example.com", hashed_password="x", role="teacher", is_approved=True)
+    student = models.User(email=f"student-{tag}@example.com", hashed_password="x", role="student", is_approved=True)
+    classroom = models.Classroom(name="Results", owner=teacher)
+    question = models.Question(
+        question_text="2 + 2?", question_type="multiple_choice", score=1,
+        options=[models.Option(option_text="4", is_correct=True), models.Option(option_text="5")]
+    )
+    coursework = models.Coursework(name="Quiz 1", coursework_type="quiz", classroom=classroom, questions=[question])
+    submission = models.Submission(
+        coursework=coursework, student=student, status="GRADED", score=1.0,
+        answers=[models.SubmissionAnswer(question=question, selected_option_ids=[])]
+    )
+    db.add(submission); db.commit()
+    submission.answers[0].selected_option_ids = [question.options[0].id]
+    db.commit()
+    return submission
+
+@pytest.fixture
+def client_as():
+    from fastapi.testclient import TestClient
+    from app import auth
+    from app.main import app
+
+    def login(user):
+        app.dependency_overrides[auth.get_current_active_user] = lambda: user
+        return TestClient(app)
+    yield login
+    app.dependency_overrides.clear()
@@ -0,0 +1,41 @@
+import pytest
+
+from app import tasks
+
+@pytest.fixture
+def scheduled(monkeypatch):
+    """Classroom ids whose summary refresh was requested (nothing runs)."""
+    requested = []
+    monkeypatch.setattr(tasks.refresh_classroom_summary, "delay", requested.append)
+    monkeypatch.setattr(tasks.run_dskg_update, "delay", lambda *args: None)
+    monkeypatch.setattr(tasks.run_dskg_update_batch, "delay", lambda *args: None)
+    return requested
+
+def test_approval_refreshes_the_classroom(graded_quiz_submission, client_as, scheduled):
+    submission = graded_quiz_submission
+    teacher = submission.coursework.classroom.owner
+
+    response = client_as(teacher).patch(
+        f"/api/coursework/submissions/{submission.id}/approve", json={"teacher_override_score": 0.5}
+    )
+
+    assert response.status_code == 200, response.text
+    assert scheduled == [submission.coursework.classroom_id]
+
+def test_bulk_approval_refreshes_each_classroom_once(graded_quiz_submission, client_as, scheduled):
+    submission = graded_quiz_submission
+    teacher = submission.coursework.classroom.owner
+
+    response = client_as(teacher).post(
+        "/api/coursework/submissions/bulk-approve", json={"submission_ids": [submission.id]}
+    )
+
+    assert response.status_code == 200, response.text
+    assert scheduled == [submission.coursework.classroom_id]
+
+def test_grading_refreshes_the_classroom(graded_quiz_submission, scheduled):
+    submission = graded_quiz_submission
+
+    tasks.run_quiz_grading(submission.id)
+
+    assert scheduled == [submission.coursework.classroom_id]
@@ -0,0 +1,75 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.core import extraction
+from app.core.extraction import ExtractionBusy, ExtractionError
+
+def _sleep_then_return(seconds, value):
+    time.sleep(seconds)
+    return value
+
+def _sleep_then_return_path(seconds, value, max_chars):
+    # Stands in for _extract_path(path, max_pages, max_chars): the value rides in max_pages
+    return _sleep_then_return(seconds, value)
+
+@pytest.fixture
+def fresh_pool(monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_WORKERS", 2)
+    monkeypatch.setattr(extraction, "_pool", None)
+    monkeypatch.setattr(extraction, "_slots", extraction._WorkerSlots(2))
+    yield
+    if extraction._pool is not None:
+        extraction._pool.shutdown(wait=False, cancel_futures=True)
+
+def test_timeout_does_not_fail_other_extractions(fresh_pool):
+    results = {}
+
+    def victim():
+        try:
+            results["victim"] = extraction._run_in_pool(_sleep_then_return, (1.0, "victim ok"), 10)
+        except ExtractionError as e:
+            results["victim"] = e
+
+    thread = threading.Thread(target=victim)
+    thread.start()
+    time.sleep(0.2)  # The victim is running on the pool when the pool is recycled
+    with pytest.raises(ExtractionError, match="timed out"):
+        extraction._run_in_pool(_sleep_then_return, (30, "hog"), 0.3)
+    thread.join(15)
+
+    assert results["victim"] == "victim ok"
+
+def test_timeout_counts_parsing_not_waiting(fresh_pool):
+    results = {}
+
+    def occupy(name):
+        results[name] = extraction._run_in_pool(_sleep_then_return, (0.8, name), 5)
+
+    busy = [threading.Thread(target=occupy, args=(name,)) for name in ("first", "second")]
+    for thread in busy:
+        thread.start()
+    time.sleep(0.2)  # Both workers are parsing
+
+    # Waits ~0.6s for a worker, then parses for 0.3s: within its 0.5s timeout
+    assert extraction._run_in_pool(_sleep_then_return, (0.3, "queued"), 0.5) == "queued"
+    for thread in busy:
+        thread.join(5)
+    assert results == {"first": "first", "second": "second"}
+
+def test_requests_beyond_the_waiting_limit_are_turned_away(fresh_pool, monkeypatch):
+    monkeypatch.setattr(extraction, "EXTRACTION_MAX_WAITING", 1)
+    monkeypatch.setattr(extraction, "_extract_path", _sleep_then_return_path)
+
+    async def burst():
+        running = [asyncio.create_task(extraction.extract_spooled_async(0.6, "running")) for _ in range(2)]
+        await asyncio.sleep(0.1)
+        waiting = asyncio.create_task(extraction.extract_spooled_async(0.1, "waiting"))
+        await asyncio.sleep(0.1)
+        with pytest.raises(ExtractionBusy):
+            await extraction.extract_spooled_async(0.1, "rejected")
+        return await asyncio.gather(*running, waiting)
+
+    assert asyncio.run(burst()) == ["running", "running", "waiting"]
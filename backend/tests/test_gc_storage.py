@@ -0,0 +1,76 @@
+import io
+import uuid
+from datetime import datetime, timedelta, timezone
+
+from app import crud, models
+from app.api import coursework
+from app.core.storage import delete_object, get_object_info, put_object_bytes, store_content_addressed
+from scripts.gc_storage import collect_garbage
+
+def _orphan(db, key: str, age: timedelta = timedelta(days=2)):
+    put_object_bytes(key, b"orphaned bytes")
+    put_object_bytes(key + ".index.json", b"{}")
+    db.add(models.StoredObject(key=key, size=14, ref_count=0, last_seen_at=datetime.now(timezone.utc) - age))
+    db.commit()
+
+def test_collects_orphans_past_the_grace_period(db):
+    old, recent = f"gc-tests/{uuid.uuid4().hex}.pdf", f"gc-tests/{uuid.uuid4().hex}.pdf"
+    _orphan(db, old)
+    _orphan(db, recent, age=timedelta(minutes=5))
+
+    collect_garbage(db, timedelta(hours=24))
+
+    assert get_object_info(old) is None and get_object_info(old + ".index.json") is None
+    assert db.query(models.StoredObject).get(old) is None
+    assert get_object_info(recent) is not None
+    assert db.query(models.StoredObject).get(recent) is not None
+
+def test_object_referenced_after_listing_is_kept(db, monkeypatch):
+    key = f"gc-tests/{uuid.uuid4().hex}.pdf"
+    _orphan(db, key)
+    list_orphans = crud.get_orphaned_objects
+
+    def list_then_reference(db, seen_before):
+        orphans = list_orphans(db, seen_before)
+        crud.acquire_object_refs(db, [key])  # A coursework saved while GC runs
+        db.commit()
+        return orphans
+    monkeypatch.setattr(crud, "get_orphaned_objects", list_then_reference)
+
+    removed, _ = collect_garbage(db, timedelta(hours=24))
+
+    assert removed == 0
+    assert get_object_info(key) is not None
+    db.expire_all()
+    assert db.query(models.StoredObject).get(key).ref_count == 1
+
+def test_upload_deduplicated_to_a_collected_object_is_stored_again(db, monkeypatch):
+    payload = uuid.uuid4().bytes * 100
+    stored = store_content_addressed(io.BytesIO(payload), "bin", "application/octet-stream")
+    register = crud.register_stored_object
+
+    def collected_before_registering(db, key, *args, **kwargs):
+        delete_object(key)  # GC removed it between the dedupe check and the registration
+        register(db, key, *args, **kwargs)
+    monkeypatch.setattr(crud, "register_stored_object", collected_before_registering)
+
+    key = coursework.handle_file_upload_from_bytes(db, io.BytesIO(payload), "copy.bin", "application/octet-stream")
+
+    assert key == stored.key
+    assert get_object_info(key) is not None
+
+def test_only_the_objects_own_indexes_are_removed(db):
+    key = f"gc-tests/{uuid.uuid4().hex}"  # Extensionless content key
+    _orphan(db, key)
+    put_object_bytes(key + ".pages-1-3,9.index.json", b"{}")
+    # A different, referenced object whose key extends the orphan's
+    put_object_bytes(key + ".pdf", b"%PDF")
+    put_object_bytes(key + ".pdf.index.json", b"{}")
+
+    collect_garbage(db, timedelta(hours=24))
+
+    assert get_object_info(key) is None
+    assert get_object_info(key + ".index.json") is None
+    assert get_object_info(key + ".pages-1-3,9.index.json") is None
+    assert get_object_info(key + ".pdf") is not None
+    assert get_object_info(key + ".pdf.index.json") is not None
@@ -0,0 +1,21 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import auth
+from app.main import app
+
+client = TestClient(app)
+
+@pytest.mark.parametrize("path", ["/metrics", "/ops/queues"])
+def test_ops_endpoints_need_the_token(monkeypatch, path):
+    monkeypatch.setattr(auth, "OPS_TOKEN", "s3cret")
+
+    assert client.get(path).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer wrong"}).status_code == 401
+    assert client.get(path, headers={"Authorization": "Bearer s3cret"}).status_code == 200
+
+@pytest.mark.parametrize("path", ["/metrics", "/ops/queues"])
+def test_ops_endpoints_are_disabled_without_a_token(monkeypatch, path):
+    monkeypatch.setattr(auth, "OPS_TOKEN", None)
+
+    assert client.get(path, headers={"Authorization": "Bearer "}).status_code == 403
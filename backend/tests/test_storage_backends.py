@@ -0,0 +1,145 @@
+import io
+import os
+import socket
+import uuid
+from datetime import timedelta
+
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core import storage, storage_backends
+from app.core.storage_backends import LocalStorage, MinioStorage, StorageBackend
+
+def _minio_reachable() -> bool:
+    host, port = storage_backends.MINIO_ENDPOINT.split(":")
+    try:
+        socket.create_connection((host, int(port)), timeout=0.5).close()
+        return True
+    except OSError:
+        return False
+
+@pytest.fixture(params=["local", "minio"])
+def store(request):
+    """(backend, HTTP client that can follow its presigned links, key prefix for this test)."""
+    prefix = f"contract-tests/{uuid.uuid4().hex}/"
+    if request.param == "local":
+        if not isinstance(storage.storage_backend, LocalStorage):
+            pytest.skip("STORAGE_BACKEND is not local")
+        from app.main import app
+        backend, http = storage.storage_backend, TestClient(app)  # Local links are served by api/files.py
+    else:
+        if not _minio_reachable():
+            pytest.skip(f"MinIO is not reachable at {storage_backends.MINIO_ENDPOINT}")
+        backend, http = storage_backends.create_backend("minio"), httpx.Client()
+    backend.ensure_ready()
+    yield backend, http, prefix
+    for key, _ in list(backend.list_objects(prefix)):
+        backend.delete(key)
+    http.close()
+
+def test_backends_implement_the_interface():
+    assert issubclass(LocalStorage, StorageBackend) and issubclass(MinioStorage, StorageBackend)
+    with pytest.raises(TypeError):
+        StorageBackend()
+
+def test_put_get_stat_round_trip(store):
+    backend, _, prefix = store
+    key = prefix + "notes.txt"
+    payload = b"0123456789" * 10_000
+
+    backend.put_object(key, io.BytesIO(payload), "text/plain", metadata={"sha256": "abc"})
+
+    assert backend.get_bytes(key) == payload
+    assert backend.read_range(key, 5, 10) == payload[5:15]
+    with backend.open_stream(key) as stream:
+        assert stream.read(10) == payload[:10]
+    info = backend.stat(key)
+    assert info.size == len(payload)
+    assert info.content_type == "text/plain"
+    assert info.metadata.get("sha256") == "abc"
+
+def test_set_metadata_keeps_the_content_type(store):
+    backend, _, prefix = store
+    key = prefix + "doc.pdf"
+    backend.put_object(key, io.BytesIO(b"%PDF-1.4"), "application/pdf")
+
+    backend.set_metadata(key, {"sha256": "def"})
+
+    info = backend.stat(key)
+    assert info.content_type == "application/pdf"
+    assert info.metadata.get("sha256") == "def"
+
+def test_a_failed_put_leaves_nothing_behind(store):
+    backend, _, prefix = store
+    key = prefix + "too-big.pdf"
+
+    class TooBig:
+        chunks = [b"%PDF-1.4 "]
+        def read(self, size=-1):
+            if self.chunks:
+                return self.chunks.pop()
+            raise storage.UploadTooLarge("over the limit")
+
+    with pytest.raises(storage.UploadTooLarge):
+        backend.put_object(key, TooBig(), "application/pdf")
+
+    assert backend.stat(key) is None
+    assert list(backend.list_objects(prefix)) == []
+    if isinstance(backend, LocalStorage):
+        assert not os.path.exists(backend._meta_path(key))
+
+def test_copy_is_independent_of_its_source(store):
+    backend, _, prefix = store
+    source, key = prefix + "draft.pdf", prefix + "copy.pdf"
+    backend.put_object(source, io.BytesIO(b"%PDF-1.4 first"), "application/pdf", metadata={"sha256": "abc"})
+
+    backend.copy(source, key)
+    backend.put_object(source, io.BytesIO(b"replaced"), "text/plain")
+
+    assert backend.get_bytes(key) == b"%PDF-1.4 first"
+    info = backend.stat(key)
+    assert info.content_type == "application/pdf"
+    assert info.metadata.get("sha256") == "abc"
+
+def test_list_and_delete(store):
+    backend, _, prefix = store
+    for name in ("a/one.txt", "a/two.txt", "b/three.txt"):
+        backend.put_object(prefix + name, io.BytesIO(name.encode()), "text/plain")
+
+    assert sorted(key for key, _ in backend.list_objects(prefix + "a/")) == [prefix + "a/one.txt", prefix + "a/two.txt"]
+
+    backend.delete(prefix + "a/one.txt")
+    backend.delete(prefix + "a/missing.txt")
+
+    assert backend.get_bytes(prefix + "a/one.txt") is None
+    assert backend.stat(prefix + "a/one.txt") is None
+    assert [key for key, _ in backend.list_objects(prefix + "a/")] == [prefix + "a/two.txt"]
+
+def test_presigned_put_then_get(store):
+    backend, http, prefix = store
+    key = prefix + "upload.bin"
+    payload = b"presigned bytes"
+
+    put = http.put(backend.presigned_put_url(key, timedelta(minutes=5)), content=payload,
+                   headers={"Content-Type": "application/octet-stream"})
+    assert put.status_code == 200, put.text
+    get = http.get(backend.presigned_get_url(key, timedelta(minutes=5)))
+    assert get.status_code == 200
+    assert get.content == payload
+
+def test_batch_presigning_signs_only_cache_misses(monkeypatch):
+    prefix = f"contract-tests/{uuid.uuid4().hex}/"
+    signed = []
+    def sign(key, expires):
+        signed.append(key)
+        return f"https://files.example/{key}"
+    monkeypatch.setattr(storage.storage_backend, "presigned_get_url", sign)
+    cached = storage.get_presigned_url_for_key(prefix + "rubric.pdf")
+
+    urls = storage.get_presigned_urls_for_keys(
+        [prefix + "rubric.pdf", prefix + "notes.pdf", prefix + "notes.pdf", None, "http://legacy/url"]
+    )
+
+    assert urls == {prefix + "rubric.pdf": cached, prefix + "notes.pdf": f"https://files.example/{prefix}notes.pdf"}
+    assert signed == [prefix + "rubric.pdf", prefix + "notes.pdf"]
@@ -0,0 +1,33 @@
+from app import models
+from app.agents import submission_pipeline
+
+def _submission(db, coursework, status):
+    student = models.User(email=f"{status.lower()}-{coursework.id}@example.com", hashed_password="x", role="student", is_approved=True)
+    submission = models.Submission(coursework=coursework, student=student, status=status)
+    db.add(submission); db.commit()
+    return submission
+
+def test_pipeline_shares_one_snapshot_and_plans_every_graded_student(db, graded_quiz_submission, monkeypatch):
+    quiz = graded_quiz_submission.coursework
+    quiz.questions[0].concept_tags = ["addition"]
+    essay = models.Coursework(name="Essay 1", coursework_type="essay", classroom=quiz.classroom)
+    db.add(essay); db.commit()
+    # Graded without any concept scores, and not graded yet
+    unscored = _submission(db, essay, "GRADED")
+    pending = _submission(db, essay, "SUBMITTED")
+
+    loads, written, planned = [], [], []
+    load = submission_pipeline.load_submissions_for_dskg
+    monkeypatch.setattr(submission_pipeline, "load_submissions_for_dskg", lambda db, ids: loads.append(ids) or load(db, ids))
+    monkeypatch.setattr(submission_pipeline, "write_concept_scores", written.extend)
+
+    result = submission_pipeline.run_post_approval_pipeline(
+        db, [graded_quiz_submission.id, unscored.id, pending.id], planned.append
+    )
+
+    assert len(loads) == 1
+    assert {s.submission_id for s in result.snapshots} == {graded_quiz_submission.id, unscored.id, pending.id}
+    assert written == [(graded_quiz_submission.student_id, "addition", 1.0)]
+    assert planned == result.planned_students == sorted([graded_quiz_submission.student_id, unscored.student_id])
+    assert set(result.stage_ms) == {"load_snapshots", "dskg_write", "schedule_planner"}
+    assert all(ms >= 0 for ms in result.stage_ms.values())
@@ -0,0 +1,16 @@
+import pytest
+
+@pytest.mark.parametrize("viewer", ["student", "teacher"])
+def test_graded_quiz_result_includes_answers(graded_quiz_submission, client_as, viewer):
+    submission = graded_quiz_submission
+    user = submission.student if viewer == "student" else submission.coursework.classroom.owner
+
+    response = client_as(user).get(f"/api/coursework/submissions/{submission.id}/result")
+
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["final_score"] == 1.0
+    [answer] = body["answers"]
+    assert answer["question"]["question_text"] == "2 + 2?"
+    assert answer["selected_option_ids"] == [answer["question"]["options"][0]["id"]]
+    assert [option["is_correct"] for option in answer["question"]["options"]] == [True, False]
@@ -0,0 +1,27 @@
+import pytest
+
+from app import tasks
+from app.core import dispatch
+from app.core.task_dedupe import KEY_PREFIX, get_redis
+
+def test_failed_publish_clears_the_queued_marker(monkeypatch):
+    def broker_down(self, *args, **kwargs):
+        raise ConnectionError("broker unreachable")
+    monkeypatch.setattr(dispatch.DispatchTask, "apply_async", broker_down)
+
+    with pytest.raises(ConnectionError):
+        tasks.refresh_classroom_summary.delay(424242)
+
+    marker = f"{KEY_PREFIX}summaries:classroom:424242:queued"
+    assert get_redis().set(marker, "1", nx=True), "the marker outlived the failed publish"
+    get_redis().delete(marker)
+
+def test_duplicate_enqueue_is_dropped_while_queued(monkeypatch):
+    published = []
+    monkeypatch.setattr(dispatch.DispatchTask, "apply_async", lambda self, *args, **kwargs: published.append(args))
+
+    tasks.refresh_classroom_summary.delay(434343)
+    tasks.refresh_classroom_summary.delay(434343)
+
+    assert len(published) == 1
+    get_redis().delete(f"{KEY_PREFIX}summaries:classroom:434343:queued")
@@ -0,0 +1,62 @@
+from datetime import datetime, timedelta, timezone
+import uuid
+
+from app import crud, models, schemas, tasks
+from app.api import uploads
+from app.core.storage import get_object_bytes, get_object_info, put_object_bytes
+
+def _uploaded_session(db, object_key: str):
+    upload = crud.create_upload_session(
+        db, schemas.UploadSessionCreate(purpose="submission", filename="essay.pdf", size=10),
+        user_id=1, object_key=object_key, expires_at=datetime.now(timezone.utc) + timedelta(minutes=15)
+    )
+    crud.update_upload_session(db, upload.id, "UPLOADED", size=10)
+    return upload
+
+def test_unexpected_extraction_error_fails_the_session(db, monkeypatch):
+    upload = _uploaded_session(db, "uploads/test/broken.pdf")
+
+    def storage_down(object_key, **limits):
+        raise ConnectionError("storage unreachable")
+    monkeypatch.setattr(tasks, "extract_object_text_cached", storage_down)
+
+    tasks.run_upload_extraction(upload.id)
+
+    db.expire_all()
+    upload = crud.get_upload_session(db, upload.id)
+    assert upload.status == "FAILED"
+    assert "storage unreachable" in upload.error
+
+def test_an_upload_is_submitted_once(db):
+    upload = _uploaded_session(db, "uploads/test/once.pdf")
+
+    assert crud.claim_upload_session(db, upload.id)
+    assert not crud.claim_upload_session(db, upload.id)
+
+def test_extraction_finishing_late_keeps_a_submitted_session(db, monkeypatch):
+    upload = _uploaded_session(db, "uploads/test/late.pdf")
+    crud.claim_upload_session(db, upload.id)
+    monkeypatch.setattr(tasks, "extract_object_text_cached", lambda object_key, **limits: "text")
+
+    tasks.run_upload_extraction(upload.id)
+
+    db.expire_all()
+    assert crud.get_upload_session(db, upload.id).status == "SUBMITTED"
+
+def test_a_confirmed_upload_cannot_be_replaced_through_its_put_url(db, client_as, monkeypatch):
+    student = models.User(email=f"uploader-{uuid.uuid4().hex[:8]}@example.com", hashed_password="x", role="student", is_approved=True)
+    db.add(student); db.commit()
+    monkeypatch.setattr(tasks.run_upload_extraction, "delay", lambda session_id: None)
+    client = client_as(student)
+    content = b"plain text essay"
+
+    opened = client.post("/api/uploads/sessions", json={"filename": "essay.txt", "size": len(content)}).json()
+    put_object_bytes(opened["object_key"], content, "text/plain")
+    confirmed = client.post(f"/api/uploads/sessions/{opened['id']}/complete").json()
+    # The client PUTs again while its URL is still valid
+    put_object_bytes(opened["object_key"], b"%PDF-1.7 something else entirely", "application/pdf")
+
+    assert confirmed["status"] == "UPLOADED"
+    assert confirmed["object_key"].startswith(uploads.CHECKED_PREFIX)
+    assert get_object_bytes(confirmed["object_key"]) == content
+    assert get_object_info(confirmed["object_key"]) == (len(content), "text/plain")
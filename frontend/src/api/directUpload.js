@@ -0,0 +1,24 @@
+import axios from 'axios';
+import apiClient from './apiClient';
+
+// Uploads a file straight to object storage through a presigned PUT URL,
+// then confirms it with the backend. Resolves to the confirmed upload session
+// ({ id, object_key, status, ... }); its object_key is used like a file_key.
+export const uploadDirect = async (file, purpose) => {
+  const { data: session } = await apiClient.post('/api/uploads/sessions', {
+    filename: file.name,
+    size: file.size,
+    content_type: file.type || 'application/octet-stream',
+    purpose,
+  });
+
+  // Plain axios: the storage URL carries its own signature, not our bearer token
+  await axios.put(session.upload_url, file, {
+    headers: { 'Content-Type': file.type || 'application/octet-stream' },
+  });
+
+  const { data: confirmed } = await apiClient.post(`/api/uploads/sessions/${session.id}/complete`);
+  return confirmed;
+};
+
+export default uploadDirect;
@@ -99,6 +99,7 @@ const AnalyticsCard = ({ data }) => {
 const ClassAnalyticsPage = () => {
   const { classroomId } = useParams();
   const [analyticsData, setAnalyticsData] = useState([]);
+  const [computedAt, setComputedAt] = useState(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -107,6 +108,8 @@ const ClassAnalyticsPage = () => {
       try {
         const response = await apiClient.get(`/api/classrooms/${classroomId}/analytics`);
         setAnalyticsData(response.data);
+        // Analytics are precomputed periodically; show how current they are
+        setComputedAt(response.headers['x-summary-computed-at'] || null);
       } catch (error) {
         console.error("Failed to fetch class analytics:", error);
       } finally {
@@ -122,6 +125,11 @@ const ClassAnalyticsPage = () => {
     <div>
       <button onClick={() => navigate(`/classroom/${classroomId}`)}>Back to Classroom</button>
       <h2>Classroom Analytics</h2>
+      {computedAt && (
+        <p style={{ color: '#666', fontSize: '0.9em' }}>
+          Last updated {new Date(computedAt).toLocaleString()}
+        </p>
+      )}
       {analyticsData.length === 0 ? (
         <p>No analytics data available for this classroom yet.</p>
       ) : (
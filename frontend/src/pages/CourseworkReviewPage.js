@@ -7,6 +7,7 @@ const CourseworkReviewPage = () => {
   const [submissions, setSubmissions] = useState([]);
   const [coursework, setCoursework] = useState(null); // <-- ADD THIS STATE
   const [loading, setLoading] = useState(true);
+  const [approving, setApproving] = useState(false);
   const navigate = useNavigate();
 
   useEffect(() => {
@@ -29,6 +30,24 @@ const CourseworkReviewPage = () => {
     fetchData();
   }, [courseworkId]);
 
+  const pendingCount = submissions.filter(sub => sub.status === 'PENDING_REVIEW').length;
+
+  const handleApproveAll = async () => {
+    if (!window.confirm(`Approve and publish all ${pendingCount} submissions pending review?`)) return;
+    setApproving(true);
+    try {
+      const response = await apiClient.post('/api/coursework/submissions/bulk-approve', {
+        coursework_id: parseInt(courseworkId)
+      });
+      const approved = new Set(response.data.submission_ids);
+      setSubmissions(submissions.map(sub => approved.has(sub.id) ? { ...sub, status: 'GRADED' } : sub));
+      alert(`${response.data.approved} submissions approved and published.`);
+    } catch (error) {
+      alert('Bulk approval failed: ' + error.response?.data?.detail);
+    }
+    setApproving(false);
+  };
+
   if (loading) return <p>Loading submissions...</p>;
 
   return (
@@ -42,6 +61,9 @@ const CourseworkReviewPage = () => {
       >
         Back to Classroom
       </button>
+      <button onClick={handleApproveAll} disabled={approving || pendingCount === 0}>
+        {approving ? 'Approving...' : `Approve All Pending (${pendingCount})`}
+      </button>
       
       <table>
         {/* ... (rest of your table is correct) ... */}
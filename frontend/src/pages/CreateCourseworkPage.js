@@ -1,6 +1,7 @@
 import React, { useState } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import apiClient from '../api/apiClient';
+import { uploadDirect } from '../api/directUpload';
 
 // --- Rubric Component ---
 const RubricBuilder = ({ rubric, setRubric, onRubricUrlChange }) => {
@@ -26,13 +27,9 @@ const RubricBuilder = ({ rubric, setRubric, onRubricUrlChange }) => {
   const handleUpload = async () => {
     if (!file) return;
     setUploading(true);
-    const formData = new FormData();
-    formData.append('file', file);
     try {
-      const response = await apiClient.post('/api/coursework/upload-file', formData, {
-        headers: { 'Content-Type': 'multipart/form-data' }
-      });
-      onRubricUrlChange(response.data.file_key);
+      const upload = await uploadDirect(file, 'rubric');
+      onRubricUrlChange(upload.object_key);
       alert('Rubric file uploaded successfully.');
     } catch (error) {
       alert('File upload failed: ' + error.response?.data?.detail);
@@ -75,6 +72,7 @@ const QuizBuilder = ({ questions, setQuestions, materialUrls }) => {
   const [aiTopic, setAiTopic] = useState('');
   const [aiNum, setAiNum] = useState(5);
   const [aiDifficulty, setAiDifficulty] = useState('Medium');
+  const [aiPages, setAiPages] = useState('');
   const [isGenerating, setIsGenerating] = useState(false);
 
   const handleQuestionChange = (qIndex, field, value) => {
@@ -114,13 +112,30 @@ const QuizBuilder = ({ questions, setQuestions, materialUrls }) => {
     }
     setIsGenerating(true);
     try {
-      const response = await apiClient.post('/api/coursework/generate-quiz-from-files', {
+      const response = await apiClient.post('/api/coursework/generate-quiz-jobs', {
         material_file_urls: materialUrls,
         topic: aiTopic,
         num_questions: parseInt(aiNum),
-        difficulty: aiDifficulty
+        difficulty: aiDifficulty,
+        page_ranges: aiPages || null
       });
-      setQuestions([...questions, ...response.data.questions]);
+      // Poll the job and append questions as each batch is generated
+      const jobId = response.data.id;
+      let received = 0;
+      let job = response.data;
+      while (job.status === 'PENDING' || job.status === 'RUNNING') {
+        await new Promise(resolve => setTimeout(resolve, 2000));
+        const poll = await apiClient.get(`/api/coursework/generate-quiz-jobs/${jobId}?offset=${received}`);
+        job = poll.data;
+        const batch = job.questions;
+        if (batch.length > 0) {
+          received += batch.length;
+          setQuestions(prev => [...prev, ...batch]);
+        }
+      }
+      if (job.status === 'FAILED') {
+        alert('AI generation failed: ' + job.error);
+      }
     } catch (error) {
       alert('AI generation failed: ' + error.response?.data?.detail);
     }
@@ -132,6 +147,7 @@ const QuizBuilder = ({ questions, setQuestions, materialUrls }) => {
       <h3>AI Quiz Generator</h3>
       <input type="text" placeholder="Topic (optional)" value={aiTopic} onChange={e => setAiTopic(e.target.value)} />
       <input type="number" value={aiNum} onChange={e => setAiNum(e.target.value)} />
+      <input type="text" placeholder="Pages, e.g. 45-80 (optional)" value={aiPages} onChange={e => setAiPages(e.target.value)} />
       <select value={aiDifficulty} onChange={e => setAiDifficulty(e.target.value)}>
         <option value="Easy">Easy</option>
         <option value="Medium">Medium</option>
@@ -199,12 +215,8 @@ const CreateCourseworkPage = () => {
     const urls = [];
     try {
       for (let f of materialFiles) {
-        const formData = new FormData();
-        formData.append('file', f);
-        const response = await apiClient.post('/api/coursework/upload-file', formData, {
-          headers: { 'Content-Type': 'multipart/form-data' }
-        });
-        urls.push(response.data.file_key);
+        const upload = await uploadDirect(f, 'material');
+        urls.push(upload.object_key);
       }
       setMaterialUrls(urls);
       alert('Material files uploaded successfully.');
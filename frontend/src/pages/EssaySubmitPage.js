@@ -1,6 +1,7 @@
 import React, { useState, useEffect } from 'react';
 import { useParams, useNavigate } from 'react-router-dom';
 import apiClient from '../api/apiClient';
+import { uploadDirect } from '../api/directUpload';
 
 const EssaySubmitPage = () => {
   const { courseworkId } = useParams();
@@ -43,14 +44,12 @@ const EssaySubmitPage = () => {
     }
     setLoading(true);
 
-    const formData = new FormData();
-    formData.append('file', file);
-
     try {
+      // The file goes straight to storage; the API only receives the session id
+      const upload = await uploadDirect(file, 'submission');
       const response = await apiClient.post(
-        `/api/coursework/${courseworkId}/submit-file`,
-        formData,
-        { headers: { 'Content-Type': 'multipart/form-data' } }
+        `/api/coursework/${courseworkId}/submit-upload`,
+        { upload_session_id: upload.id }
       );
 
       alert('Submission successful! Your assignment is being graded.');
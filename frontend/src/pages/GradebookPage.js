@@ -5,6 +5,7 @@ import apiClient from '../api/apiClient';
 const GradebookPage = () => {
   const { classroomId } = useParams();
   const [gradebook, setGradebook] = useState(null);
+  const [computedAt, setComputedAt] = useState(null);
   const [loading, setLoading] = useState(true);
   const navigate = useNavigate();
 
@@ -13,6 +14,8 @@ const GradebookPage = () => {
       try {
         const response = await apiClient.get(`/api/classrooms/${classroomId}/gradebook`);
         setGradebook(response.data);
+        // The gradebook is precomputed; show how current it is
+        setComputedAt(response.headers['x-summary-computed-at'] || null);
       } catch (error) {
         console.error("Failed to fetch gradebook:", error);
       } finally {
@@ -62,6 +65,11 @@ const GradebookPage = () => {
       <h2>Gradebook</h2>
       <button onClick={() => navigate(`/classroom/${classroomId}`)}>Back to Classroom</button>
       <button onClick={exportToCSV} style={{ marginLeft: '10px' }}>Export to CSV</button>
+      {computedAt && (
+        <p style={{ color: '#666', fontSize: '0.9em' }}>
+          Last updated {new Date(computedAt).toLocaleString()}
+        </p>
+      )}
       
       <table style={{ width: '100%', borderCollapse: 'collapse', marginTop: '20px' }}>
         <thead>
@@ -126,7 +126,7 @@ const SubmissionResultPage = () => {
         setSubmission(response.data);
 
         // Stop polling if grading is done or errored
-        if (!['SUBMITTED', 'GRADING'].includes(response.data.status)) {
+        if (!['DEFERRED', 'SUBMITTED', 'GRADING'].includes(response.data.status)) {
           setLoading(false);
           return true; // stop polling
         }